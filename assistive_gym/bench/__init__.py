@@ -0,0 +1,114 @@
+import sys, time, json, resource, subprocess
+import numpy as np
+
+# Metrics compared against a baseline. True if higher values are better.
+METRICS = {
+    'import_time': False,
+    'make_time': False,
+    'first_reset_time': False,
+    'reset_p50': False,
+    'reset_p90': False,
+    'reset_p99': False,
+    'reset_ik_calls': False,
+    'steps_per_sec': True,
+    'peak_rss_mb': False,
+}
+
+IMPORT_CODE = '''
+import time, resource, json
+start = time.time()
+import assistive_gym
+print(json.dumps({'import_time': time.time() - start, 'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0}))
+'''
+
+MAKE_CODE = '''
+import time, resource, json, gym
+import assistive_gym
+start = time.time()
+env = gym.make(%r)
+print(json.dumps({'make_time': time.time() - start, 'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0}))
+'''
+
+ENV_CODE = '''
+import json
+from assistive_gym.bench import run_env
+print(json.dumps(run_env(%r, resets=%d, steps=%d, seed=%d, env_kwargs=%r)))
+'''
+
+def registered_env_ids():
+    import gym, assistive_gym
+    return [spec.id for spec in gym.envs.registry.all() if 'assistive_gym' in str(getattr(spec, 'entry_point', ''))]
+
+def run_code(code):
+    # Every measurement runs in a fresh interpreter so that import, load and memory costs are not hidden by earlier runs
+    output = subprocess.check_output([sys.executable, '-c', code]).decode()
+    return json.loads(output.strip().splitlines()[-1])
+
+def measure_import():
+    return run_code(IMPORT_CODE)
+
+def measure_make(env_id):
+    return run_code(MAKE_CODE % env_id)
+
+def measure_env(env_id, resets=20, steps=500, seed=0, env_kwargs={}):
+    return run_code(ENV_CODE % (env_id, resets, steps, seed, env_kwargs))
+
+def run_env(env_id, resets=20, steps=500, seed=0, env_kwargs={}):
+    import gym, pybullet as p
+    import assistive_gym
+    start = time.time()
+    env = gym.make(env_id, **env_kwargs)
+    make_time = time.time() - start
+    env.seed(seed)
+    env.action_space.seed(seed)
+
+    # The first reset builds the scene from scratch, so it is reported separately
+    start = time.time()
+    env.reset()
+    first_reset_time = time.time() - start
+    reset_times = []
+    reset_ik_calls = []
+    for _ in range(resets):
+        start = time.time()
+        env.reset()
+        reset_times.append(time.time() - start)
+        reset_ik_calls.append(env.unwrapped.util.ik_calls)
+    bodies = p.getNumBodies(physicsClientId=env.unwrapped.id)
+
+    step_time = 0
+    for _ in range(steps):
+        action = env.action_space.sample()
+        start = time.time()
+        observation, reward, done, info = env.step(action)
+        step_time += time.time() - start
+        if done:
+            env.reset()
+    max_bodies = p.getNumBodies(physicsClientId=env.unwrapped.id)
+    env.close()
+
+    return {'env_id': env_id, 'make_time': make_time, 'first_reset_time': first_reset_time,
+            'reset_p50': float(np.percentile(reset_times, 50)) if reset_times else None,
+            'reset_p90': float(np.percentile(reset_times, 90)) if reset_times else None,
+            'reset_p99': float(np.percentile(reset_times, 99)) if reset_times else None,
+            'reset_ik_calls': float(np.mean(reset_ik_calls)) if reset_ik_calls else None,
+            'steps_per_sec': steps / step_time if step_time > 0 else None,
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+            'bodies_after_reset': bodies, 'bodies_after_steps': max_bodies}
+
+def compare(results, baseline, threshold=0.1):
+    '''
+    Return a list of human readable regressions of results relative to baseline, where a regression is a change of more than threshold (relative) in the wrong direction.
+    '''
+    regressions = []
+    pairs = [('import', results.get('import', {}), baseline.get('import', {}))]
+    pairs += [(env_id, metrics, baseline.get('envs', {}).get(env_id, {})) for env_id, metrics in results.get('envs', {}).items()]
+    for name, metrics, reference in pairs:
+        for metric, higher_is_better in METRICS.items():
+            value = metrics.get(metric)
+            old = reference.get(metric)
+            if value is None or old is None or old == 0:
+                continue
+            change = (value - old) / old
+            if (higher_is_better and change < -threshold) or (not higher_is_better and change > threshold):
+                regressions.append('%s %s: %.4g -> %.4g (%+.1f%%)' % (name, metric, old, value, change*100))
+    return regressions
@@ -0,0 +1,47 @@
+import sys, json, argparse
+
+from . import registered_env_ids, measure_import, measure_env, compare
+
+parser = argparse.ArgumentParser(prog='python -m assistive_gym.bench', description='Assistive Gym Benchmark')
+parser.add_argument('--envs', nargs='+', default=None,
+                    help='Environments to benchmark (default: all Assistive Gym environments)')
+parser.add_argument('--resets', type=int, default=20,
+                    help='Number of timed resets per environment, after the first one (default: 20)')
+parser.add_argument('--steps', type=int, default=500,
+                    help='Number of timed steps with random actions per environment (default: 500)')
+parser.add_argument('--seed', type=int, default=0,
+                    help='Random seed for the environments and actions (default: 0)')
+parser.add_argument('--env-kwargs', type=json.loads, default={},
+                    help='JSON dict of keyword arguments passed to gym.make, e.g. \'{"fast_reset": true}\'')
+parser.add_argument('--output', default=None,
+                    help='Write the results as JSON to this file')
+parser.add_argument('--baseline', default=None,
+                    help='JSON results of an earlier run to compare against')
+parser.add_argument('--threshold', type=float, default=0.1,
+                    help='Relative change that counts as a regression when comparing against a baseline (default: 0.1)')
+args = parser.parse_args()
+
+env_ids = args.envs if args.envs is not None else registered_env_ids()
+
+results = {'resets': args.resets, 'steps': args.steps, 'seed': args.seed, 'env_kwargs': args.env_kwargs, 'envs': {}}
+results['import'] = measure_import()
+print('%-32s %8.3f s %8.1f MB' % ('import assistive_gym', results['import']['import_time'], results['import']['peak_rss_mb']))
+print('%-32s %8s %8s %8s %8s %8s %8s %10s %8s %6s' % ('Environment', 'Make', 'Reset 1', 'p50', 'p90', 'p99', 'IK/reset', 'Steps/s', 'RSS MB', 'Bodies'))
+for env_id in env_ids:
+    r = measure_env(env_id, resets=args.resets, steps=args.steps, seed=args.seed, env_kwargs=args.env_kwargs)
+    results['envs'][env_id] = r
+    print('%-32s %7.2fs %7.2fs %7.3fs %7.3fs %7.3fs %8.1f %10.1f %8.1f %6d' % (env_id, r['make_time'], r['first_reset_time'], r['reset_p50'] or 0, r['reset_p90'] or 0, r['reset_p99'] or 0, r['reset_ik_calls'] or 0, r['steps_per_sec'] or 0, r['peak_rss_mb'], r['bodies_after_steps']))
+
+if args.output is not None:
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+if args.baseline is not None:
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, threshold=args.threshold)
+    for regression in regressions:
+        print('REGRESSION', regression)
+    if regressions:
+        sys.exit(1)
+    print('No regressions above %.0f%% compared to %s' % (args.threshold*100, args.baseline))
@@ -6,35 +6,35 @@ import pybullet as p
 from .env import AssistiveEnv
 
 class ArmManipulationEnv(AssistiveEnv):
-    def __init__(self, robot_type='pr2', human_control=False):
-        super(ArmManipulationEnv, self).__init__(robot_type=robot_type, task='arm_manipulation', human_control=human_control, frame_skip=5, time_step=0.02, action_robot_len=14, action_human_len=(10 if human_control else 0), obs_robot_len=45, obs_human_len=(42 if human_control else 0))
+    def __init__(self, robot_type='pr2', human_control=False, **kwargs):
+        super(ArmManipulationEnv, self).__init__(robot_type=robot_type, task='arm_manipulation', human_control=human_control, frame_skip=5, time_step=0.02, action_robot_len=14, action_human_len=(10 if human_control else 0), obs_robot_len=45, obs_human_len=(42 if human_control else 0), **kwargs)
 
     def step(self, action):
-        self.take_step(action, robot_arm='both', gains=self.config('robot_gains'), forces=self.config('robot_forces'), human_gains=0.05, human_forces=2)
+        self.take_step(action, robot_arm='both', gains=self.params.robot_gains, forces=self.params.robot_forces, human_gains=0.05, human_forces=2)
 
         tool_left_force, tool_right_force, total_force_on_human, tool_left_force_on_human, tool_right_force_on_human = self.get_total_force()
-        end_effector_velocity = np.linalg.norm(p.getLinkState(self.robot, 78 if self.robot_type=='pr2' else 24 if self.robot_type=='sawyer' else 54 if self.robot_type=='baxter' else 9 if self.robot_type=='jaco' else 7, computeForwardKinematics=True, computeLinkVelocity=True, physicsClientId=self.id)[6])
-        end_effector_velocity += np.linalg.norm(p.getLinkState(self.robot, 55 if self.robot_type=='pr2' else 24 if self.robot_type=='sawyer' else 31 if self.robot_type=='baxter' else 9 if self.robot_type=='jaco' else 7, computeForwardKinematics=True, computeLinkVelocity=True, physicsClientId=self.id)[6])
+        end_effector_velocity = np.linalg.norm(self.state_cache.link_velocity(self.robot, 78 if self.robot_type=='pr2' else 24 if self.robot_type=='sawyer' else 54 if self.robot_type=='baxter' else 9 if self.robot_type=='jaco' else 7))
+        end_effector_velocity += np.linalg.norm(self.state_cache.link_velocity(self.robot, 55 if self.robot_type=='pr2' else 24 if self.robot_type=='sawyer' else 31 if self.robot_type=='baxter' else 9 if self.robot_type=='jaco' else 7))
         obs = self._get_obs([tool_left_force, tool_right_force], [total_force_on_human, tool_left_force_on_human, tool_right_force_on_human])
 
         # Get human preferences
         preferences_score = self.human_preferences(end_effector_velocity=end_effector_velocity, arm_manipulation_tool_forces_on_human=[tool_left_force_on_human, tool_right_force_on_human], arm_manipulation_total_force_on_human=total_force_on_human)
 
-        tool_left_pos = np.array(p.getLinkState(self.robot, 78 if self.robot_type=='pr2' else 24 if self.robot_type=='sawyer' else 54 if self.robot_type=='baxter' else 9 if self.robot_type=='jaco' else 7, computeForwardKinematics=True, physicsClientId=self.id)[0])
-        tool_right_pos = np.array(p.getLinkState(self.robot, 55 if self.robot_type=='pr2' else 24 if self.robot_type=='sawyer' else 31 if self.robot_type=='baxter' else 9 if self.robot_type=='jaco' else 7, computeForwardKinematics=True, physicsClientId=self.id)[0])
-        elbow_pos = np.array(p.getLinkState(self.human, 7, computeForwardKinematics=True, physicsClientId=self.id)[0])
-        hand_pos = np.array(p.getLinkState(self.human, 9, computeForwardKinematics=True, physicsClientId=self.id)[0])
-        waist_pos = np.array(p.getLinkState(self.human, 24, computeForwardKinematics=True, physicsClientId=self.id)[0])
-        hips_pos = np.array(p.getLinkState(self.human, 27, computeForwardKinematics=True, physicsClientId=self.id)[0])
+        tool_left_pos = self.state_cache.link_pos(self.robot, 78 if self.robot_type=='pr2' else 24 if self.robot_type=='sawyer' else 54 if self.robot_type=='baxter' else 9 if self.robot_type=='jaco' else 7)
+        tool_right_pos = self.state_cache.link_pos(self.robot, 55 if self.robot_type=='pr2' else 24 if self.robot_type=='sawyer' else 31 if self.robot_type=='baxter' else 9 if self.robot_type=='jaco' else 7)
+        elbow_pos = self.state_cache.link_pos(self.human, 7)
+        hand_pos = self.state_cache.link_pos(self.human, 9)
+        waist_pos = self.state_cache.link_pos(self.human, 24)
+        hips_pos = self.state_cache.link_pos(self.human, 27)
         reward_distance_robot_left = -np.linalg.norm(tool_left_pos - elbow_pos) # Penalize distances away from human hand
         reward_distance_robot_right = -np.linalg.norm(tool_right_pos - hand_pos) # Penalize distances away from human hand
         reward_distance_human = -np.linalg.norm(elbow_pos - waist_pos) - np.linalg.norm(hand_pos - hips_pos) # Penalize distances between human hand and waist
         reward_action = -np.sum(np.square(action)) # Penalize actions
 
         if self.robot_type in ['sawyer', 'jaco', 'kinova_gen3']:
-            reward = self.config('distance_human_weight')*reward_distance_human + 2*self.config('distance_end_effector_weight')*reward_distance_robot_left + self.config('action_weight')*reward_action + preferences_score
+            reward = self.params.distance_human_weight*reward_distance_human + 2*self.params.distance_end_effector_weight*reward_distance_robot_left + self.params.action_weight*reward_action + preferences_score
         else:
-            reward = self.config('distance_human_weight')*reward_distance_human + self.config('distance_end_effector_weight')*reward_distance_robot_left + self.config('distance_end_effector_weight')*reward_distance_robot_right + self.config('action_weight')*reward_action + preferences_score
+            reward = self.params.distance_human_weight*reward_distance_human + self.params.distance_end_effector_weight*reward_distance_robot_left + self.params.distance_end_effector_weight*reward_distance_robot_right + self.params.action_weight*reward_action + preferences_score
 
         if self.task_success == 0 or reward_distance_human > self.task_success:
             self.task_success = reward_distance_human
@@ -42,7 +42,7 @@ class ArmManipulationEnv(AssistiveEnv):
         if self.gui and total_force_on_human > 0:
             print('Task success:', self.task_success, 'Total force on human:', total_force_on_human, 'Tool force on human:', tool_left_force_on_human, tool_right_force_on_human)
 
-        info = {'total_force_on_human': total_force_on_human, 'task_success': int(self.task_success >= self.config('task_success_threshold')), 'action_robot_len': self.action_robot_len, 'action_human_len': self.action_human_len, 'obs_robot_len': self.obs_robot_len, 'obs_human_len': self.obs_human_len}
+        info = {'total_force_on_human': total_force_on_human, 'task_success': int(self.task_success >= self.params.task_success_threshold), 'action_robot_len': self.action_robot_len, 'action_human_len': self.action_human_len, 'obs_robot_len': self.obs_robot_len, 'obs_human_len': self.obs_human_len, 'reset_ik_calls': self.util.ik_calls}
         done = False
 
         return obs, reward, done, info
@@ -70,23 +70,21 @@ class ArmManipulationEnv(AssistiveEnv):
         return tool_left_force, tool_right_force, total_force_on_human, tool_left_force_on_human, tool_right_force_on_human
 
     def _get_obs(self, forces, forces_human):
-        torso_pos = np.array(p.getLinkState(self.robot, 15 if self.robot_type == 'pr2' else 0, computeForwardKinematics=True, physicsClientId=self.id)[0])
-        tool_left_pos, tool_left_orient = p.getLinkState(self.robot, 78 if self.robot_type=='pr2' else 24 if self.robot_type=='sawyer' else 54 if self.robot_type=='baxter' else 9 if self.robot_type=='jaco' else 7, computeForwardKinematics=True, physicsClientId=self.id)[:2]
-        tool_right_pos, tool_right_orient = p.getLinkState(self.robot, 55 if self.robot_type=='pr2' else 24 if self.robot_type=='sawyer' else 31 if self.robot_type=='baxter' else 9 if self.robot_type=='jaco' else 7, computeForwardKinematics=True, physicsClientId=self.id)[:2]
-        robot_joint_states = p.getJointStates(self.robot, jointIndices=self.robot_both_arm_joint_indices, physicsClientId=self.id)
-        robot_joint_positions = np.array([x[0] for x in robot_joint_states])
-        robot_pos, robot_orient = p.getBasePositionAndOrientation(self.robot, physicsClientId=self.id)
+        torso_pos = self.state_cache.link_pos(self.robot, 15 if self.robot_type == 'pr2' else 0)
+        tool_left_pos, tool_left_orient = self.state_cache.link_pos_orient(self.robot, 78 if self.robot_type=='pr2' else 24 if self.robot_type=='sawyer' else 54 if self.robot_type=='baxter' else 9 if self.robot_type=='jaco' else 7)
+        tool_right_pos, tool_right_orient = self.state_cache.link_pos_orient(self.robot, 55 if self.robot_type=='pr2' else 24 if self.robot_type=='sawyer' else 31 if self.robot_type=='baxter' else 9 if self.robot_type=='jaco' else 7)
+        robot_joint_positions = self.state_cache.joint_positions(self.robot, self.robot_both_arm_joint_indices)
+        robot_pos, robot_orient = self.state_cache.base_pos_orient(self.robot)
         if self.human_control:
-            human_pos = np.array(p.getBasePositionAndOrientation(self.human, physicsClientId=self.id)[0])
-            human_joint_states = p.getJointStates(self.human, jointIndices=self.human_controllable_joint_indices, physicsClientId=self.id)
-            human_joint_positions = np.array([x[0] for x in human_joint_states])
+            human_pos = self.state_cache.base_pos_orient(self.human)[0]
+            human_joint_positions = self.state_cache.joint_positions(self.human, self.human_controllable_joint_indices)
 
         # Human shoulder, elbow, and wrist joint locations
-        shoulder_pos, shoulder_orient = p.getLinkState(self.human, 5, computeForwardKinematics=True, physicsClientId=self.id)[:2]
-        elbow_pos, elbow_orient = p.getLinkState(self.human, 7, computeForwardKinematics=True, physicsClientId=self.id)[:2]
-        wrist_pos, wrist_orient = p.getLinkState(self.human, 9, computeForwardKinematics=True, physicsClientId=self.id)[:2]
-        waist_pos = np.array(p.getLinkState(self.human, 24, computeForwardKinematics=True, physicsClientId=self.id)[0])
-        hips_pos = np.array(p.getLinkState(self.human, 27, computeForwardKinematics=True, physicsClientId=self.id)[0])
+        shoulder_pos, shoulder_orient = self.state_cache.link_pos_orient(self.human, 5)
+        elbow_pos, elbow_orient = self.state_cache.link_pos_orient(self.human, 7)
+        wrist_pos, wrist_orient = self.state_cache.link_pos_orient(self.human, 9)
+        waist_pos = self.state_cache.link_pos(self.human, 24)
+        hips_pos = self.state_cache.link_pos(self.human, 27)
         shoulder_pos, elbow_pos, wrist_pos, waist_pos, hips_pos = np.array(shoulder_pos), np.array(elbow_pos), np.array(wrist_pos), np.array(waist_pos), np.array(hips_pos)
 
         robot_obs = np.concatenate([tool_left_pos-torso_pos, tool_left_orient, tool_right_pos-torso_pos, tool_right_orient, robot_joint_positions, shoulder_pos-torso_pos, elbow_pos-torso_pos, wrist_pos-torso_pos, waist_pos-torso_pos, hips_pos-torso_pos, forces]).ravel()
@@ -98,6 +96,7 @@ class ArmManipulationEnv(AssistiveEnv):
         return np.concatenate([robot_obs, human_obs]).ravel()
 
     def reset(self):
+        self.setup_episode()
         self.setup_timing()
         self.task_success = 0
         self.human, self.bed, self.robot, self.robot_lower_limits, self.robot_upper_limits, self.human_lower_limits, self.human_upper_limits, self.robot_right_arm_joint_indices, self.robot_left_arm_joint_indices, self.gender = self.world_creation.create_new_world(furniture_type='bed', static_human_base=False, human_impairment='no_tremor', print_joints=False, gender='random')
@@ -206,5 +205,6 @@ class ArmManipulationEnv(AssistiveEnv):
         # Enable rendering
         p.configureDebugVisualizer(p.COV_ENABLE_RENDERING, 1, physicsClientId=self.id)
 
+        self.state_cache.invalidate()
         return self._get_obs([0, 0], [0, 0, 0])
 
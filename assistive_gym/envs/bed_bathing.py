@@ -6,14 +6,15 @@ import pybullet as p
 from .env import AssistiveEnv
 
 class BedBathingEnv(AssistiveEnv):
-    def __init__(self, robot_type='pr2', human_control=False):
-        super(BedBathingEnv, self).__init__(robot_type=robot_type, task='bed_bathing', human_control=human_control, frame_skip=5, time_step=0.02, action_robot_len=7, action_human_len=(10 if human_control else 0), obs_robot_len=24, obs_human_len=(28 if human_control else 0))
+    def __init__(self, robot_type='pr2', human_control=False, **kwargs):
+        super(BedBathingEnv, self).__init__(robot_type=robot_type, task='bed_bathing', human_control=human_control, frame_skip=5, time_step=0.02, action_robot_len=7, action_human_len=(10 if human_control else 0), obs_robot_len=24, obs_human_len=(28 if human_control else 0), **kwargs)
+        self.state_attributes += ['targets_active', 'targets_pos_world']
 
     def step(self, action):
-        self.take_step(action, robot_arm='left', gains=self.config('robot_gains'), forces=self.config('robot_forces'), human_gains=0.05)
+        self.take_step(action, robot_arm='left', gains=self.params.robot_gains, forces=self.params.robot_forces, human_gains=0.05)
 
         total_force, tool_force, tool_force_on_human, total_force_on_human, new_contact_points = self.get_total_force()
-        end_effector_velocity = np.linalg.norm(p.getLinkState(self.tool, 1, computeForwardKinematics=True, computeLinkVelocity=True, physicsClientId=self.id)[6])
+        end_effector_velocity = np.linalg.norm(self.state_cache.link_velocity(self.tool, 1))
         obs = self._get_obs([tool_force], [total_force_on_human, tool_force_on_human])
 
         # Get human preferences
@@ -23,12 +24,12 @@ class BedBathingEnv(AssistiveEnv):
         reward_action = -np.sum(np.square(action)) # Penalize actions
         reward_new_contact_points = new_contact_points # Reward new contact points on a person
 
-        reward = self.config('distance_weight')*reward_distance + self.config('action_weight')*reward_action + self.config('wiping_reward_weight')*reward_new_contact_points + preferences_score
+        reward = self.params.distance_weight*reward_distance + self.params.action_weight*reward_action + self.params.wiping_reward_weight*reward_new_contact_points + preferences_score
 
         if self.gui and tool_force_on_human > 0:
             print('Task success:', self.task_success, 'Force at tool on human:', tool_force_on_human, reward_new_contact_points)
 
-        info = {'total_force_on_human': total_force_on_human, 'task_success': int(self.task_success >= (self.total_target_count*self.config('task_success_threshold'))), 'action_robot_len': self.action_robot_len, 'action_human_len': self.action_human_len, 'obs_robot_len': self.obs_robot_len, 'obs_human_len': self.obs_human_len}
+        info = {'total_force_on_human': total_force_on_human, 'task_success': int(self.task_success >= (self.total_target_count*self.params.task_success_threshold)), 'action_robot_len': self.action_robot_len, 'action_human_len': self.action_human_len, 'obs_robot_len': self.obs_robot_len, 'obs_human_len': self.obs_human_len, 'reset_ik_calls': self.util.ik_calls}
         done = False
 
         return obs, reward, done, info
@@ -59,49 +60,30 @@ class BedBathingEnv(AssistiveEnv):
                 if linkB < 0 or linkB > p.getNumJoints(self.human, physicsClientId=self.id):
                     continue
 
-                indices_to_delete = []
-                for i, (target_pos_world, target) in enumerate(zip(self.targets_pos_upperarm_world, self.targets_upperarm)):
-                    if np.linalg.norm(contact_position - target_pos_world) < 0.025:
-                        # The robot made contact with a point on the person's arm
-                        new_contact_points += 1
-                        self.task_success += 1
-                        p.resetBasePositionAndOrientation(target, [1000, 1000, 1000], [0, 0, 0, 1], physicsClientId=self.id)
-                        indices_to_delete.append(i)
-                self.targets_pos_on_upperarm = [t for i, t in enumerate(self.targets_pos_on_upperarm) if i not in indices_to_delete]
-                self.targets_upperarm = [t for i, t in enumerate(self.targets_upperarm) if i not in indices_to_delete]
-                self.targets_pos_upperarm_world = [t for i, t in enumerate(self.targets_pos_upperarm_world) if i not in indices_to_delete]
-
-                indices_to_delete = []
-                for i, (target_pos_world, target) in enumerate(zip(self.targets_pos_forearm_world, self.targets_forearm)):
-                    if np.linalg.norm(contact_position - target_pos_world) < 0.025:
-                        # The robot made contact with a point on the person's arm
-                        new_contact_points += 1
-                        self.task_success += 1
-                        p.resetBasePositionAndOrientation(target, [1000, 1000, 1000], [0, 0, 0, 1], physicsClientId=self.id)
-                        indices_to_delete.append(i)
-                self.targets_pos_on_forearm = [t for i, t in enumerate(self.targets_pos_on_forearm) if i not in indices_to_delete]
-                self.targets_forearm = [t for i, t in enumerate(self.targets_forearm) if i not in indices_to_delete]
-                self.targets_pos_forearm_world = [t for i, t in enumerate(self.targets_pos_forearm_world) if i not in indices_to_delete]
+                # Targets on the person's arm that the robot made contact with
+                reached = self.targets_active & (np.linalg.norm(self.targets_pos_world - contact_position, axis=-1) < 0.025)
+                new_contact_points += int(np.sum(reached))
+                self.task_success += int(np.sum(reached))
+                self.targets_active[reached] = False
+                if self.target_markers:
+                    for i in np.flatnonzero(reached):
+                        self.move_marker(self.target_markers[i], [1000, 1000, 1000])
 
         return total_force, tool_force, tool_force_on_human, total_force_on_human, new_contact_points
 
     def _get_obs(self, forces, forces_human):
-        torso_pos = np.array(p.getLinkState(self.robot, 15 if self.robot_type == 'pr2' else 0, computeForwardKinematics=True, physicsClientId=self.id)[0])
-        state = p.getLinkState(self.tool, 1, computeForwardKinematics=True, physicsClientId=self.id)
-        tool_pos = np.array(state[0])
-        tool_orient = np.array(state[1]) # Quaternions
-        robot_joint_states = p.getJointStates(self.robot, jointIndices=self.robot_left_arm_joint_indices, physicsClientId=self.id)
-        robot_joint_positions = np.array([x[0] for x in robot_joint_states])
-        robot_pos, robot_orient = p.getBasePositionAndOrientation(self.robot, physicsClientId=self.id)
+        torso_pos = self.state_cache.link_pos(self.robot, 15 if self.robot_type == 'pr2' else 0)
+        tool_pos, tool_orient = self.state_cache.link_pos_orient(self.tool, 1) # Quaternions
+        robot_joint_positions = self.state_cache.joint_positions(self.robot, self.robot_left_arm_joint_indices)
+        robot_pos, robot_orient = self.state_cache.base_pos_orient(self.robot)
         if self.human_control:
-            human_pos = np.array(p.getBasePositionAndOrientation(self.human, physicsClientId=self.id)[0])
-            human_joint_states = p.getJointStates(self.human, jointIndices=self.human_controllable_joint_indices, physicsClientId=self.id)
-            human_joint_positions = np.array([x[0] for x in human_joint_states])
+            human_pos = self.state_cache.base_pos_orient(self.human)[0]
+            human_joint_positions = self.state_cache.joint_positions(self.human, self.human_controllable_joint_indices)
 
         # Human shoulder, elbow, and wrist joint locations
-        shoulder_pos, shoulder_orient = p.getLinkState(self.human, 5, computeForwardKinematics=True, physicsClientId=self.id)[:2]
-        elbow_pos, elbow_orient = p.getLinkState(self.human, 7, computeForwardKinematics=True, physicsClientId=self.id)[:2]
-        wrist_pos, wrist_orient = p.getLinkState(self.human, 9, computeForwardKinematics=True, physicsClientId=self.id)[:2]
+        shoulder_pos, shoulder_orient = self.state_cache.link_pos_orient(self.human, 5)
+        elbow_pos, elbow_orient = self.state_cache.link_pos_orient(self.human, 7)
+        wrist_pos, wrist_orient = self.state_cache.link_pos_orient(self.human, 9)
 
         robot_obs = np.concatenate([tool_pos-torso_pos, tool_orient, robot_joint_positions, shoulder_pos-torso_pos, elbow_pos-torso_pos, wrist_pos-torso_pos, forces]).ravel()
         if self.human_control:
@@ -112,6 +94,7 @@ class BedBathingEnv(AssistiveEnv):
         return np.concatenate([robot_obs, human_obs]).ravel()
 
     def reset(self):
+        self.setup_episode()
         self.setup_timing()
         self.task_success = 0
         self.contact_points_on_arm = {}
@@ -199,6 +182,7 @@ class BedBathingEnv(AssistiveEnv):
             self.world_creation.set_gripper_open_position(self.robot, position=0.0125, left=True, set_instantly=True)
             self.tool = self.world_creation.init_tool(self.robot, mesh_scale=[0.001]*3, pos_offset=[0, 0.1175, 0], orient_offset=p.getQuaternionFromEuler([np.pi/2.0, 0, np.pi/2.0], physicsClientId=self.id), maximal=False)
 
+        self.state_cache.invalidate()
         self.generate_targets()
 
         # Enable rendering
@@ -218,29 +202,24 @@ class BedBathingEnv(AssistiveEnv):
         self.targets_pos_on_upperarm = self.util.capsule_points(p1=np.array([0, 0, 0]), p2=np.array([0, 0, -self.upperarm_length]), radius=self.upperarm_radius, distance_between_points=0.03)
         self.targets_pos_on_forearm = self.util.capsule_points(p1=np.array([0, 0, 0]), p2=np.array([0, 0, -self.forearm_length]), radius=self.forearm_radius, distance_between_points=0.03)
 
-        sphere_collision = -1
-        sphere_visual = p.createVisualShape(shapeType=p.GEOM_SPHERE, radius=0.01, rgbaColor=[0, 1, 1, 1], physicsClientId=self.id)
-        self.targets_upperarm = []
-        self.targets_forearm = []
-        for _ in range(len(self.targets_pos_on_upperarm)):
-            self.targets_upperarm.append(p.createMultiBody(baseMass=0.0, baseCollisionShapeIndex=sphere_collision, baseVisualShapeIndex=sphere_visual, basePosition=[0, 0, 0], useMaximalCoordinates=False, physicsClientId=self.id))
-        for _ in range(len(self.targets_pos_on_forearm)):
-            self.targets_forearm.append(p.createMultiBody(baseMass=0.0, baseCollisionShapeIndex=sphere_collision, baseVisualShapeIndex=sphere_visual, basePosition=[0, 0, 0], useMaximalCoordinates=False, physicsClientId=self.id))
-        self.total_target_count = len(self.targets_upperarm) + len(self.targets_forearm)
+        # All target points in one contiguous array, expressed in the frame of the limb they are on
+        self.targets_pos_on_arm = np.concatenate([np.reshape(self.targets_pos_on_upperarm, (-1, 3)), np.reshape(self.targets_pos_on_forearm, (-1, 3))])
+        self.targets_limb = np.array([self.upperarm]*len(self.targets_pos_on_upperarm) + [self.forearm]*len(self.targets_pos_on_forearm))
+        self.targets_active = np.ones(len(self.targets_pos_on_arm), dtype=bool)
+        self.total_target_count = len(self.targets_pos_on_arm)
+
+        self.target_markers = []
         self.update_targets()
+        self.target_markers = self.create_markers(self.targets_pos_world, rgba=[0, 1, 1, 1])
 
     def update_targets(self):
-        upperarm_pos, upperarm_orient = p.getLinkState(self.human, self.upperarm, computeForwardKinematics=True, physicsClientId=self.id)[:2]
-        self.targets_pos_upperarm_world = []
-        for target_pos_on_arm, target in zip(self.targets_pos_on_upperarm, self.targets_upperarm):
-            target_pos = np.array(p.multiplyTransforms(upperarm_pos, upperarm_orient, target_pos_on_arm, [0, 0, 0, 1], physicsClientId=self.id)[0])
-            self.targets_pos_upperarm_world.append(target_pos)
-            p.resetBasePositionAndOrientation(target, target_pos, [0, 0, 0, 1], physicsClientId=self.id)
-
-        forearm_pos, forearm_orient = p.getLinkState(self.human, self.forearm, computeForwardKinematics=True, physicsClientId=self.id)[:2]
-        self.targets_pos_forearm_world = []
-        for target_pos_on_arm, target in zip(self.targets_pos_on_forearm, self.targets_forearm):
-            target_pos = np.array(p.multiplyTransforms(forearm_pos, forearm_orient, target_pos_on_arm, [0, 0, 0, 1], physicsClientId=self.id)[0])
-            self.targets_pos_forearm_world.append(target_pos)
-            p.resetBasePositionAndOrientation(target, target_pos, [0, 0, 0, 1], physicsClientId=self.id)
-
+        # Rigidly transform every target point with the pose of its limb at once
+        upperarm_pos, upperarm_orient = self.state_cache.link_pos_orient(self.human, self.upperarm)
+        forearm_pos, forearm_orient = self.state_cache.link_pos_orient(self.human, self.forearm)
+        upperarm = self.targets_limb == self.upperarm
+        rotations = np.where(upperarm[:, None, None], np.reshape(p.getMatrixFromQuaternion(upperarm_orient, physicsClientId=self.id), (3, 3)), np.reshape(p.getMatrixFromQuaternion(forearm_orient, physicsClientId=self.id), (3, 3)))
+        self.targets_pos_world = np.einsum('nij,nj->ni', rotations, self.targets_pos_on_arm) + np.where(upperarm[:, None], upperarm_pos, forearm_pos)
+        if self.gui and self.target_markers:
+            # The marker spheres are only for visualization
+            for i in np.flatnonzero(self.targets_active):
+                self.move_marker(self.target_markers[i], self.targets_pos_world[i])
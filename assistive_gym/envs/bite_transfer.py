@@ -8,11 +8,11 @@ from .env import AssistiveEnv
 
 class BiteTransferEnv(AssistiveEnv):
 
-    def __init__(self, robot_type='panda', human_control=False, width=256, height=256):
+    def __init__(self, robot_type='panda', human_control=False, width=256, height=256, **kwargs):
         super(BiteTransferEnv, self).__init__(robot_type=robot_type, task='bite_transfer', human_control=human_control,
                                               frame_skip=10, time_step=0.01, action_robot_len=7,
                                               action_human_len=(4 if human_control else 0), obs_robot_len=25,
-                                              obs_human_len=(23 if human_control else 0))
+                                              obs_human_len=(23 if human_control else 0), **kwargs)
         self.foods = ['strawberry.urdf', 'carrot.urdf']
 
         self.fov = 60
@@ -32,7 +32,7 @@ class BiteTransferEnv(AssistiveEnv):
     # TODO
     def step(self, action, ret_images=False):
         # actually step in the environment
-        self.take_step(action, robot_arm='right', gains=self.config('robot_gains'), forces=self.config('robot_forces'),
+        self.take_step(action, robot_arm='right', gains=self.params.robot_gains, forces=self.params.robot_forces,
                        human_gains=0.0005)
 
         end_effector_velocity = np.linalg.norm(p.getBaseVelocity(self.drop_fork, physicsClientId=self.id)[0])
@@ -102,6 +102,7 @@ class BiteTransferEnv(AssistiveEnv):
             self.fig.canvas.draw()
 
     def reset(self, ret_images=False):
+        self.setup_episode()
         self.setup_timing()
         self.task_success = 0
         self.human, self.wheelchair, self.robot, self.robot_lower_limits, self.robot_upper_limits, self.human_lower_limits, self.human_upper_limits, self.robot_right_arm_joint_indices, self.robot_left_arm_joint_indices, self.gender = self.world_creation.create_new_world(
@@ -17,8 +17,8 @@ from .bite_transfer import BiteTransferEnv
 #         super(FeedingJacoEnv, self).__init__(robot_type='jaco', human_control=False)
 
 class BiteTransferPandaEnv(BiteTransferEnv):
-    def __init__(self):
-        super(BiteTransferPandaEnv, self).__init__(robot_type='panda', human_control=False)
+    def __init__(self, **kwargs):
+        super(BiteTransferPandaEnv, self).__init__(robot_type='panda', human_control=False, **kwargs)
 #
 # class FeedingPR2HumanEnv(FeedingEnv):
 #     def __init__(self):
@@ -37,6 +37,6 @@ class BiteTransferPandaEnv(BiteTransferEnv):
 #         super(FeedingJacoHumanEnv, self).__init__(robot_type='jaco', human_control=True)
 #
 class BiteTransferPandaHumanEnv(BiteTransferEnv):
-    def __init__(self):
-        super(BiteTransferPandaHumanEnv, self).__init__(robot_type='panda', human_control=True)
+    def __init__(self, **kwargs):
+        super(BiteTransferPandaHumanEnv, self).__init__(robot_type='panda', human_control=True, **kwargs)
 
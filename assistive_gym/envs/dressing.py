@@ -6,19 +6,20 @@ import pybullet as p
 from .env import AssistiveEnv
 
 class DressingEnv(AssistiveEnv):
-    def __init__(self, robot_type='pr2', human_control=False):
-        super(DressingEnv, self).__init__(robot_type=robot_type, task='dressing', human_control=human_control, frame_skip=10, time_step=0.01, action_robot_len=7, action_human_len=(10 if human_control else 0), obs_robot_len=24, obs_human_len=(28 if human_control else 0))
+    def __init__(self, robot_type='pr2', human_control=False, **kwargs):
+        super(DressingEnv, self).__init__(robot_type=robot_type, task='dressing', human_control=human_control, frame_skip=10, time_step=0.01, action_robot_len=7, action_human_len=(10 if human_control else 0), obs_robot_len=24, obs_human_len=(28 if human_control else 0), **kwargs)
+        self.state_attributes += ['forearm_in_sleeve', 'upperarm_in_sleeve']
 
     def step(self, action):
-        self.take_step(action, robot_arm='left', gains=self.config('robot_gains'), forces=self.config('robot_forces'), human_gains=0.0025, step_sim=False)
+        self.take_step(action, robot_arm='left', gains=self.params.robot_gains, forces=self.params.robot_forces, human_gains=0.0025, step_sim=False)
 
         # Update robot position
         forces_torques = []
         for _ in range(self.frame_skip):
             # Force the cloth attachment to stay at the end effector
-            state = p.getLinkState(self.robot, 76 if self.robot_type=='pr2' else 19 if self.robot_type=='sawyer' else 48 if self.robot_type=='baxter' else 8, computeForwardKinematics=True, physicsClientId=self.id)
-            p.resetBasePositionAndOrientation(self.cloth_attachment, np.array(state[0]), [0, 0, 0, 1], physicsClientId=self.id)
-            p.stepSimulation(physicsClientId=self.id)
+            end_effector_pos = self.state_cache.link_pos(self.robot, 76 if self.robot_type=='pr2' else 19 if self.robot_type=='sawyer' else 48 if self.robot_type=='baxter' else 8)
+            p.resetBasePositionAndOrientation(self.cloth_attachment, end_effector_pos, [0, 0, 0, 1], physicsClientId=self.id)
+            self.step_simulation()
         self.record_video_frame()
 
         x, y, z, cx, cy, cz, fx, fy, fz = p.getSoftBodyData(self.cloth, physicsClientId=self.id)
@@ -41,7 +42,7 @@ class DressingEnv(AssistiveEnv):
                 contact_positions_temp.append(c)
         forces = np.array(forces_temp)
         contact_positions = np.array(contact_positions_temp)
-        end_effector_velocity = np.linalg.norm(p.getLinkState(self.robot, 76 if self.robot_type=='pr2' else 19 if self.robot_type=='sawyer' else 48 if self.robot_type=='baxter' else 8, computeForwardKinematics=True, computeLinkVelocity=True, physicsClientId=self.id)[6])
+        end_effector_velocity = np.linalg.norm(self.state_cache.link_velocity(self.robot, 76 if self.robot_type=='pr2' else 19 if self.robot_type=='sawyer' else 48 if self.robot_type=='baxter' else 8))
 
         reward_action = -np.sum(np.square(action)) # Penalize actions
         if self.upperarm_in_sleeve:
@@ -55,11 +56,11 @@ class DressingEnv(AssistiveEnv):
         # Get human preferences
         preferences_score = self.human_preferences(end_effector_velocity=end_effector_velocity, dressing_forces=forces)
 
-        end_effector_pos = np.array(p.getLinkState(self.robot, 76 if self.robot_type=='pr2' else 19 if self.robot_type=='sawyer' else 48 if self.robot_type=='baxter' else 8, computeForwardKinematics=True, physicsClientId=self.id)[0])
-        shoulder_pos = np.array(p.getLinkState(self.human, 15, computeForwardKinematics=True, physicsClientId=self.id)[0])
-        elbow_pos, elbow_orient = p.getLinkState(self.human, 17, computeForwardKinematics=True, physicsClientId=self.id)[:2]
+        end_effector_pos = self.state_cache.link_pos(self.robot, 76 if self.robot_type=='pr2' else 19 if self.robot_type=='sawyer' else 48 if self.robot_type=='baxter' else 8)
+        shoulder_pos = self.state_cache.link_pos(self.human, 15)
+        elbow_pos, elbow_orient = self.state_cache.link_pos_orient(self.human, 17)
 
-        reward = self.config('dressing_reward_weight')*reward_dressing + self.config('action_weight')*reward_action + preferences_score
+        reward = self.params.dressing_reward_weight*reward_dressing + self.params.action_weight*reward_action + preferences_score
 
         cloth_force_sum = np.sum(np.linalg.norm(forces, axis=-1))
         ft = [cloth_force_sum]
@@ -75,28 +76,24 @@ class DressingEnv(AssistiveEnv):
             print('Task success:', self.task_success, 'Average forces on arm:', cloth_force_sum)
 
         total_force_on_human = robot_force_on_human + cloth_force_sum
-        info = {'total_force_on_human': total_force_on_human, 'task_success': int(self.task_success >= self.config('task_success_threshold')), 'action_robot_len': self.action_robot_len, 'action_human_len': self.action_human_len, 'obs_robot_len': self.obs_robot_len, 'obs_human_len': self.obs_human_len}
+        info = {'total_force_on_human': total_force_on_human, 'task_success': int(self.task_success >= self.params.task_success_threshold), 'action_robot_len': self.action_robot_len, 'action_human_len': self.action_human_len, 'obs_robot_len': self.obs_robot_len, 'obs_human_len': self.obs_human_len, 'reset_ik_calls': self.util.ik_calls}
         done = False
 
         return obs, reward, done, info
 
     def _get_obs(self, forces, forces_human):
-        torso_pos = np.array(p.getLinkState(self.robot, 15 if self.robot_type == 'pr2' else 0, computeForwardKinematics=True, physicsClientId=self.id)[0])
-        state = p.getLinkState(self.robot, 76 if self.robot_type=='pr2' else 19 if self.robot_type=='sawyer' else 48 if self.robot_type=='baxter' else 8, computeForwardKinematics=True, physicsClientId=self.id)
-        tool_pos = np.array(state[0])
-        tool_orient = np.array(state[1]) # Quaternions
-        robot_joint_states = p.getJointStates(self.robot, jointIndices=self.robot_left_arm_joint_indices, physicsClientId=self.id)
-        robot_joint_positions = np.array([x[0] for x in robot_joint_states])
-        robot_pos, robot_orient = p.getBasePositionAndOrientation(self.robot, physicsClientId=self.id)
+        torso_pos = self.state_cache.link_pos(self.robot, 15 if self.robot_type == 'pr2' else 0)
+        tool_pos, tool_orient = self.state_cache.link_pos_orient(self.robot, 76 if self.robot_type=='pr2' else 19 if self.robot_type=='sawyer' else 48 if self.robot_type=='baxter' else 8) # Quaternions
+        robot_joint_positions = self.state_cache.joint_positions(self.robot, self.robot_left_arm_joint_indices)
+        robot_pos, robot_orient = self.state_cache.base_pos_orient(self.robot)
         if self.human_control:
-            human_pos = np.array(p.getBasePositionAndOrientation(self.human, physicsClientId=self.id)[0])
-            human_joint_states = p.getJointStates(self.human, jointIndices=self.human_controllable_joint_indices, physicsClientId=self.id)
-            human_joint_positions = np.array([x[0] for x in human_joint_states])
+            human_pos = self.state_cache.base_pos_orient(self.human)[0]
+            human_joint_positions = self.state_cache.joint_positions(self.human, self.human_controllable_joint_indices)
 
         # Human shoulder, elbow, and wrist joint locations
-        shoulder_pos, shoulder_orient = p.getLinkState(self.human, 15, computeForwardKinematics=True, physicsClientId=self.id)[:2]
-        elbow_pos, elbow_orient = p.getLinkState(self.human, 17, computeForwardKinematics=True, physicsClientId=self.id)[:2]
-        wrist_pos, wrist_orient = p.getLinkState(self.human, 19, computeForwardKinematics=True, physicsClientId=self.id)[:2]
+        shoulder_pos, shoulder_orient = self.state_cache.link_pos_orient(self.human, 15)
+        elbow_pos, elbow_orient = self.state_cache.link_pos_orient(self.human, 17)
+        wrist_pos, wrist_orient = self.state_cache.link_pos_orient(self.human, 19)
 
         robot_obs = np.concatenate([tool_pos-torso_pos, tool_orient, robot_joint_positions, shoulder_pos-torso_pos, elbow_pos-torso_pos, wrist_pos-torso_pos, forces]).ravel()
         if self.human_control:
@@ -107,6 +104,7 @@ class DressingEnv(AssistiveEnv):
         return np.concatenate([robot_obs, human_obs]).ravel()
 
     def reset(self):
+        self.setup_episode()
         self.setup_timing()
         self.task_success = 0
         self.forearm_in_sleeve = False
@@ -208,5 +206,6 @@ class DressingEnv(AssistiveEnv):
 
         p.setGravity(0, 0, -9.81, physicsClientId=self.id)
 
+        self.state_cache.invalidate()
         return self._get_obs([0], [0, 0])
 
@@ -1,34 +1,34 @@
 from .dressing import DressingEnv
 
 class DressingPR2Env(DressingEnv):
-    def __init__(self):
-        super(DressingPR2Env, self).__init__(robot_type='pr2', human_control=False)
+    def __init__(self, **kwargs):
+        super(DressingPR2Env, self).__init__(robot_type='pr2', human_control=False, **kwargs)
 
 class DressingBaxterEnv(DressingEnv):
-    def __init__(self):
-        super(DressingBaxterEnv, self).__init__(robot_type='baxter', human_control=False)
+    def __init__(self, **kwargs):
+        super(DressingBaxterEnv, self).__init__(robot_type='baxter', human_control=False, **kwargs)
 
 class DressingSawyerEnv(DressingEnv):
-    def __init__(self):
-        super(DressingSawyerEnv, self).__init__(robot_type='sawyer', human_control=False)
+    def __init__(self, **kwargs):
+        super(DressingSawyerEnv, self).__init__(robot_type='sawyer', human_control=False, **kwargs)
 
 class DressingJacoEnv(DressingEnv):
-    def __init__(self):
-        super(DressingJacoEnv, self).__init__(robot_type='jaco', human_control=False)
+    def __init__(self, **kwargs):
+        super(DressingJacoEnv, self).__init__(robot_type='jaco', human_control=False, **kwargs)
 
 class DressingPR2HumanEnv(DressingEnv):
-    def __init__(self):
-        super(DressingPR2HumanEnv, self).__init__(robot_type='pr2', human_control=True)
+    def __init__(self, **kwargs):
+        super(DressingPR2HumanEnv, self).__init__(robot_type='pr2', human_control=True, **kwargs)
 
 class DressingBaxterHumanEnv(DressingEnv):
-    def __init__(self):
-        super(DressingBaxterHumanEnv, self).__init__(robot_type='baxter', human_control=True)
+    def __init__(self, **kwargs):
+        super(DressingBaxterHumanEnv, self).__init__(robot_type='baxter', human_control=True, **kwargs)
 
 class DressingSawyerHumanEnv(DressingEnv):
-    def __init__(self):
-        super(DressingSawyerHumanEnv, self).__init__(robot_type='sawyer', human_control=True)
+    def __init__(self, **kwargs):
+        super(DressingSawyerHumanEnv, self).__init__(robot_type='sawyer', human_control=True, **kwargs)
 
 class DressingJacoHumanEnv(DressingEnv):
-    def __init__(self):
-        super(DressingJacoHumanEnv, self).__init__(robot_type='jaco', human_control=True)
+    def __init__(self, **kwargs):
+        super(DressingJacoHumanEnv, self).__init__(robot_type='jaco', human_control=True, **kwargs)
 
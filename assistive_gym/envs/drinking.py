@@ -4,24 +4,27 @@ import numpy as np
 import pybullet as p
 
 from .env import AssistiveEnv
+from .particles import ParticlePool
 
 class DrinkingEnv(AssistiveEnv):
-    def __init__(self, robot_type='pr2', human_control=False):
-        super(DrinkingEnv, self).__init__(robot_type=robot_type, task='drinking', human_control=human_control, frame_skip=25, time_step=0.004, action_robot_len=7, action_human_len=(4 if human_control else 0), obs_robot_len=25, obs_human_len=(23 if human_control else 0))
+    def __init__(self, robot_type='pr2', human_control=False, **kwargs):
+        super(DrinkingEnv, self).__init__(robot_type=robot_type, task='drinking', human_control=human_control, frame_skip=25, time_step=0.004, action_robot_len=7, action_human_len=(4 if human_control else 0), obs_robot_len=25, obs_human_len=(23 if human_control else 0), **kwargs)
+        self.state_attributes += ['waters']
+        self.water_pool = ParticlePool(radius=0.005, mass=0.001, rgba=[0.25, 0.5, 1, 1])
 
     def step(self, action):
-        self.take_step(action, robot_arm='right', gains=self.config('robot_gains'), forces=self.config('robot_forces'), human_gains=0.0005)
+        self.take_step(action, robot_arm='right', gains=self.params.robot_gains, forces=self.params.robot_forces, human_gains=0.0005)
 
         robot_force_on_human, cup_force_on_human = self.get_total_force()
         total_force_on_human = robot_force_on_human + cup_force_on_human
         reward_water, water_mouth_velocities, water_hit_human_reward = self.get_water_rewards()
-        end_effector_velocity = np.linalg.norm(p.getBaseVelocity(self.cup, physicsClientId=self.id)[0])
+        end_effector_velocity = np.linalg.norm(self.state_cache.base_velocity(self.cup)[0])
         obs = self._get_obs([cup_force_on_human], [robot_force_on_human, cup_force_on_human])
 
         # Get human preferences
         preferences_score = self.human_preferences(end_effector_velocity=end_effector_velocity, total_force_on_human=robot_force_on_human, tool_force_at_target=cup_force_on_human, food_hit_human_reward=water_hit_human_reward, food_mouth_velocities=water_mouth_velocities)
 
-        cup_pos, cup_orient = p.getBasePositionAndOrientation(self.cup, physicsClientId=self.id)
+        cup_pos, cup_orient = self.state_cache.base_pos_orient(self.cup)
         cup_pos, cup_orient = p.multiplyTransforms(cup_pos, cup_orient, [0, 0.06, 0], p.getQuaternionFromEuler([np.pi/2.0, 0, 0], physicsClientId=self.id), physicsClientId=self.id)
         cup_top_center_pos, _ = p.multiplyTransforms(cup_pos, cup_orient, self.cup_top_center_offset, [0, 0, 0, 1], physicsClientId=self.id)
         reward_distance = -np.linalg.norm(self.target_pos - np.array(cup_top_center_pos)) # Penalize distances between top of cup and mouth
@@ -30,12 +33,12 @@ class DrinkingEnv(AssistiveEnv):
         cup_euler = p.getEulerFromQuaternion(cup_orient, physicsClientId=self.id)
         reward_tilt = -abs(cup_euler[0] + np.pi/2) if self.robot_type == 'jaco' else -abs(cup_euler[0] - np.pi/2)
 
-        reward = self.config('distance_weight')*reward_distance + self.config('action_weight')*reward_action + self.config('cup_tilt_weight')*reward_tilt + self.config('drinking_reward_weight')*reward_water + preferences_score
+        reward = self.params.distance_weight*reward_distance + self.params.action_weight*reward_action + self.params.cup_tilt_weight*reward_tilt + self.params.drinking_reward_weight*reward_water + preferences_score
 
         if self.gui and reward_water != 0:
             print('Task success:', self.task_success, 'Water reward:', reward_water)
 
-        info = {'total_force_on_human': total_force_on_human, 'task_success': int(self.task_success >= self.total_water_count*self.config('task_success_threshold')), 'action_robot_len': self.action_robot_len, 'action_human_len': self.action_human_len, 'obs_robot_len': self.obs_robot_len, 'obs_human_len': self.obs_human_len}
+        info = {'total_force_on_human': total_force_on_human, 'task_success': int(self.task_success >= self.total_water_count*self.params.task_success_threshold), 'action_robot_len': self.action_robot_len, 'action_human_len': self.action_human_len, 'obs_robot_len': self.obs_robot_len, 'obs_human_len': self.obs_human_len, 'reset_ik_calls': self.util.ik_calls}
         done = False
 
         return obs, reward, done, info
@@ -62,48 +65,42 @@ class DrinkingEnv(AssistiveEnv):
             p.resetBasePositionAndOrientation(self.cup_top_center, top_center_pos, [0, 0, 0, 1], physicsClientId=self.id)
             p.resetBasePositionAndOrientation(self.cup_bottom_center, bottom_center_pos, [0, 0, 0, 1], physicsClientId=self.id)
             p.resetBasePositionAndOrientation(self.cup_cylinder, cup_pos, cup_orient, physicsClientId=self.id)
-        water_reward = 0
-        water_hit_human_reward = 0
-        water_mouth_velocities = []
-        waters_to_remove = []
-        for w in self.waters:
-            water_pos, water_orient = p.getBasePositionAndOrientation(w, physicsClientId=self.id)
-            if not self.util.points_in_cylinder(top_center_pos, bottom_center_pos, 0.05, np.array(water_pos)):
-                distance_to_mouth = np.linalg.norm(self.target_pos - water_pos)
-                if distance_to_mouth < 0.03: # hard
-                # if distance_to_mouth < 0.05: # easy
-                    # Delete particle and give robot a reward
-                    water_reward += 10
-                    self.task_success += 1
-                    p.resetBasePositionAndOrientation(w, self.np_random.uniform(1000, 2000, size=3), [0, 0, 0, 1], physicsClientId=self.id)
-                    water_velocity = np.linalg.norm(p.getBaseVelocity(w, physicsClientId=self.id)[0])
-                    water_mouth_velocities.append(water_velocity)
-                    waters_to_remove.append(w)
-                    continue
-                elif water_pos[-1] < 0.5:
-                    # Delete particle and give robot a penalty for spilling water
-                    water_reward -= 1
-                    waters_to_remove.append(w)
-                    continue
-                if len(p.getContactPoints(bodyA=w, bodyB=self.human, physicsClientId=self.id)) > 0:
-                    # Record that this water particle just hit the person, so that we can penalize the robot
-                    waters_to_remove.append(w)
-                    water_hit_human_reward -= 1
-        self.waters = [w for w in self.waters if w not in waters_to_remove]
+        indices = self.waters.active_indices()
+        if len(indices) == 0:
+            return 0, [], 0
+        water_pos = self.waters.positions(indices)
+        # Only particles that have left the cup are checked
+        outside = ~self.util.points_in_cylinder(top_center_pos, bottom_center_pos, 0.05, water_pos)
+        distance_to_mouth = np.linalg.norm(self.target_pos - water_pos, axis=-1)
+        # Delete particles that entered the mouth and give robot a reward
+        mouth = outside & (distance_to_mouth < 0.03) # hard
+        # mouth = outside & (distance_to_mouth < 0.05) # easy
+        water_reward = 10*int(np.sum(mouth))
+        self.task_success += int(np.sum(mouth))
+        water_mouth_velocities = list(self.waters.speeds(indices[mouth]))
+        # Delete particles that were spilled and give robot a penalty
+        spilled = outside & ~mouth & (water_pos[:, -1] < 0.5)
+        water_reward -= int(np.sum(spilled))
+        # Delete particles that hit the person, so that we can penalize the robot
+        hit = outside & ~mouth & ~spilled & self.waters.contacts(self.human)[indices]
+        water_hit_human_reward = -int(np.sum(hit))
+        # Drunk particles leave the scene. Draw the far away positions they used to be moved to, so the random stream stays the same.
+        self.np_random.uniform(1000, 2000, size=(int(np.sum(mouth)), 3))
+        self.waters.remove(indices[mouth], park_bodies=True)
+        # Spilled particles and those that hit the person stay in the scene as colliding bodies
+        self.waters.remove(indices[spilled | hit])
         return water_reward, water_mouth_velocities, water_hit_human_reward
 
     def _get_obs(self, forces, forces_human):
-        torso_pos = np.array(p.getLinkState(self.robot, 15 if self.robot_type == 'pr2' else 0, computeForwardKinematics=True, physicsClientId=self.id)[0])
-        tool_pos, tool_orient = p.getBasePositionAndOrientation(self.cup, physicsClientId=self.id)
-        robot_joint_states = p.getJointStates(self.robot, jointIndices=self.robot_right_arm_joint_indices, physicsClientId=self.id)
-        robot_joint_positions = np.array([x[0] for x in robot_joint_states])
-        robot_pos, robot_orient = p.getBasePositionAndOrientation(self.robot, physicsClientId=self.id)
+        torso_pos = self.state_cache.link_pos(self.robot, 15 if self.robot_type == 'pr2' else 0)
+        tool_pos, tool_orient = self.state_cache.base_pos_orient(self.cup)
+        robot_joint_positions = self.state_cache.joint_positions(self.robot, self.robot_right_arm_joint_indices)
+        robot_pos, robot_orient = self.state_cache.base_pos_orient(self.robot)
         if self.human_control:
-            human_pos = np.array(p.getBasePositionAndOrientation(self.human, physicsClientId=self.id)[0])
-            human_joint_states = p.getJointStates(self.human, jointIndices=self.human_controllable_joint_indices, physicsClientId=self.id)
-            human_joint_positions = np.array([x[0] for x in human_joint_states])
+            human_pos = self.state_cache.base_pos_orient(self.human)[0]
+            human_joint_positions = self.state_cache.joint_positions(self.human, self.human_controllable_joint_indices)
 
-        head_pos, head_orient = p.getLinkState(self.human, 23, computeForwardKinematics=True, physicsClientId=self.id)[:2]
+        head_pos, head_orient = self.state_cache.link_pos_orient(self.human, 23)
 
         robot_obs = np.concatenate([tool_pos-torso_pos, tool_orient, tool_pos - self.target_pos, robot_joint_positions, head_pos-torso_pos, head_orient, forces]).ravel()
         if self.human_control:
@@ -113,10 +110,16 @@ class DrinkingEnv(AssistiveEnv):
 
         return np.concatenate([robot_obs, human_obs]).ravel()
 
+    def after_set_state(self):
+        self.waters.restore()
+
     def reset(self):
+        self.setup_episode()
         self.setup_timing()
         self.task_success = 0
         self.human, self.wheelchair, self.robot, self.robot_lower_limits, self.robot_upper_limits, self.human_lower_limits, self.human_upper_limits, self.robot_right_arm_joint_indices, self.robot_left_arm_joint_indices, self.gender = self.world_creation.create_new_world(furniture_type='wheelchair', static_human_base=True, human_impairment='random', print_joints=False, gender='random')
+        # Particle bodies become part of the fast reset snapshot, so they have to exist before any task bodies are added
+        self.water_pool.prepare(self.world_creation, 64)
         self.robot_lower_limits = self.robot_lower_limits[self.robot_right_arm_joint_indices]
         self.robot_upper_limits = self.robot_upper_limits[self.robot_right_arm_joint_indices]
         self.reset_robot_joints()
@@ -145,9 +148,7 @@ class DrinkingEnv(AssistiveEnv):
         head_pos, head_orient = p.getLinkState(self.human, 23, computeForwardKinematics=True, physicsClientId=self.id)[:2]
         target_pos, target_orient = p.multiplyTransforms(head_pos, head_orient, self.mouth_pos, [0, 0, 0, 1], physicsClientId=self.id)
         self.target_pos = np.array(target_pos)
-        sphere_collision = -1
-        sphere_visual = p.createVisualShape(shapeType=p.GEOM_SPHERE, radius=0.01, rgbaColor=[0, 1, 0, 1], physicsClientId=self.id)
-        self.target = p.createMultiBody(baseMass=0.0, baseCollisionShapeIndex=sphere_collision, baseVisualShapeIndex=sphere_visual, basePosition=self.target_pos, useMaximalCoordinates=False, physicsClientId=self.id)
+        self.target = self.create_marker(self.target_pos, rgba=[0, 1, 0, 1])
 
         target_pos = np.array([-0.2, -0.5, 1]) + self.np_random.uniform(-0.05, 0.05, size=3)
         if self.robot_type == 'pr2':
@@ -185,21 +186,13 @@ class DrinkingEnv(AssistiveEnv):
         # Generate water
         cup_pos, cup_orient = p.getBasePositionAndOrientation(self.cup, physicsClientId=self.id)
         cup_pos = np.array(cup_pos)
-        water_radius = 0.005
-        water_collision = p.createCollisionShape(p.GEOM_SPHERE, radius=water_radius, physicsClientId=self.id)
-        water_visual = -1
-        water_mass = 0.001
-        water_count = 4*4*8
-        water_count = 4*4*4
+        water_radius = self.water_pool.radius
         batch_positions = []
         for i in range(4):
             for j in range(4):
                 for k in range(4):
                     batch_positions.append(np.array([i*2*water_radius-0.02, j*2*water_radius-0.02, k*2*water_radius+0.075]) + cup_pos)
-        last_water_id = p.createMultiBody(baseMass=water_mass, baseCollisionShapeIndex=water_collision, baseVisualShapeIndex=water_visual, basePosition=[0, 0, 0], useMaximalCoordinates=False, batchPositions=batch_positions, physicsClientId=self.id)
-        self.waters = list(range(last_water_id-water_count+1, last_water_id+1))
-        for w in self.waters:
-            p.changeVisualShape(w, -1, rgbaColor=[0.25, 0.5, 1, 1], physicsClientId=self.id)
+        self.waters = self.water_pool.reset(self.world_creation, batch_positions)
         self.total_water_count = len(self.waters)
 
         # Enable rendering
@@ -209,9 +202,12 @@ class DrinkingEnv(AssistiveEnv):
         for _ in range(100):
             p.stepSimulation(physicsClientId=self.id)
 
+        self.state_cache.invalidate()
         return self._get_obs([0], [0, 0])
 
     def display_cup_points(self):
+        if not self.markers_enabled():
+            return
         sphere_collision = -1
         sphere_visual = p.createVisualShape(shapeType=p.GEOM_SPHERE, radius=0.01, rgbaColor=[0, 1, 1, 1], physicsClientId=self.id)
         cup_pos, cup_orient = p.getBasePositionAndOrientation(self.cup, physicsClientId=self.id)
@@ -226,8 +222,8 @@ class DrinkingEnv(AssistiveEnv):
         self.cup_cylinder = p.createMultiBody(baseMass=0.0, baseCollisionShapeIndex=cylinder_collision, baseVisualShapeIndex=cylinder_visual, basePosition=cup_pos, baseOrientation=cup_orient, useMaximalCoordinates=False, physicsClientId=self.id)
 
     def update_targets(self):
-        head_pos, head_orient = p.getLinkState(self.human, 23, computeForwardKinematics=True, physicsClientId=self.id)[:2]
+        head_pos, head_orient = self.state_cache.link_pos_orient(self.human, 23)
         target_pos, target_orient = p.multiplyTransforms(head_pos, head_orient, self.mouth_pos, [0, 0, 0, 1], physicsClientId=self.id)
         self.target_pos = np.array(target_pos)
-        p.resetBasePositionAndOrientation(self.target, self.target_pos, [0, 0, 0, 1], physicsClientId=self.id)
+        self.move_marker(self.target, self.target_pos)
 
@@ -1,34 +1,34 @@
 from .drinking import DrinkingEnv
 
 class DrinkingPR2Env(DrinkingEnv):
-    def __init__(self):
-        super(DrinkingPR2Env, self).__init__(robot_type='pr2', human_control=False)
+    def __init__(self, **kwargs):
+        super(DrinkingPR2Env, self).__init__(robot_type='pr2', human_control=False, **kwargs)
 
 class DrinkingBaxterEnv(DrinkingEnv):
-    def __init__(self):
-        super(DrinkingBaxterEnv, self).__init__(robot_type='baxter', human_control=False)
+    def __init__(self, **kwargs):
+        super(DrinkingBaxterEnv, self).__init__(robot_type='baxter', human_control=False, **kwargs)
 
 class DrinkingSawyerEnv(DrinkingEnv):
-    def __init__(self):
-        super(DrinkingSawyerEnv, self).__init__(robot_type='sawyer', human_control=False)
+    def __init__(self, **kwargs):
+        super(DrinkingSawyerEnv, self).__init__(robot_type='sawyer', human_control=False, **kwargs)
 
 class DrinkingJacoEnv(DrinkingEnv):
-    def __init__(self):
-        super(DrinkingJacoEnv, self).__init__(robot_type='jaco', human_control=False)
+    def __init__(self, **kwargs):
+        super(DrinkingJacoEnv, self).__init__(robot_type='jaco', human_control=False, **kwargs)
 
 class DrinkingPR2HumanEnv(DrinkingEnv):
-    def __init__(self):
-        super(DrinkingPR2HumanEnv, self).__init__(robot_type='pr2', human_control=True)
+    def __init__(self, **kwargs):
+        super(DrinkingPR2HumanEnv, self).__init__(robot_type='pr2', human_control=True, **kwargs)
 
 class DrinkingBaxterHumanEnv(DrinkingEnv):
-    def __init__(self):
-        super(DrinkingBaxterHumanEnv, self).__init__(robot_type='baxter', human_control=True)
+    def __init__(self, **kwargs):
+        super(DrinkingBaxterHumanEnv, self).__init__(robot_type='baxter', human_control=True, **kwargs)
 
 class DrinkingSawyerHumanEnv(DrinkingEnv):
-    def __init__(self):
-        super(DrinkingSawyerHumanEnv, self).__init__(robot_type='sawyer', human_control=True)
+    def __init__(self, **kwargs):
+        super(DrinkingSawyerHumanEnv, self).__init__(robot_type='sawyer', human_control=True, **kwargs)
 
 class DrinkingJacoHumanEnv(DrinkingEnv):
-    def __init__(self):
-        super(DrinkingJacoHumanEnv, self).__init__(robot_type='jaco', human_control=True)
+    def __init__(self, **kwargs):
+        super(DrinkingJacoHumanEnv, self).__init__(robot_type='jaco', human_control=True, **kwargs)
 
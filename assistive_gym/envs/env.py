@@ -1,18 +1,27 @@
-import os, time, datetime, configparser
+import os, time, copy, datetime
 import gym
 from gym import spaces
 from gym.utils import seeding
 import numpy as np
 import pybullet as p
 # import cv2
-from keras.models import load_model
 from screeninfo import get_monitors
 
 from .util import Util
 from .world_creation import WorldCreation
+from .reset_pool import ResetPool
+from .placement_cache import PlacementCache
+from .ik_cache import IKCache
+from .ik_backends import NumpyDLSIK
+from .placement import PlacementEngine, PlacementSearch, body_state
+from .human_limits import load_limits_oracle
+from .state_cache import StateCache
+from .profiler import Profiler
+from .params import make_params
+from .manipulability import joint_limited_weights, jlwki_scores
 
 class AssistiveEnv(gym.Env):
-    def __init__(self, robot_type='pr2', task='scratch_itch', human_control=False, frame_skip=5, time_step=0.02, action_robot_len=7, action_human_len=0, obs_robot_len=30, obs_human_len=0):
+    def __init__(self, robot_type='pr2', task='scratch_itch', human_control=False, frame_skip=5, time_step=0.02, action_robot_len=7, action_human_len=0, obs_robot_len=30, obs_human_len=0, fast_reset=False, reset_pool_size=0, reset_pool_workers=1, placement_cache=None, placement_cache_tolerance=0.01, placement_cache_size=10000, placement_workers=0, placement_strategy='fixed', placement_full_successes=5, placement_patience=20, ik_cache_size=0, ik_cache_tolerance=0.01, ik_backend='pybullet', collision_mode='step', human_limits_oracle='keras', config_overrides=None, headless=False, profile=None):
         # Start the bullet physics server
         self.id = p.connect(p.DIRECT)
         # print('Physics server ID:', self.id)
@@ -28,8 +37,9 @@ class AssistiveEnv(gym.Env):
         self.action_space = spaces.Box(low=np.array([-1.0]*(self.action_robot_len+self.action_human_len)), high=np.array([1.0]*(self.action_robot_len+self.action_human_len)), dtype=np.float32)
         self.observation_space = spaces.Box(low=np.array([-1.0]*(self.obs_robot_len+self.obs_human_len)), high=np.array([1.0]*(self.obs_robot_len+self.obs_human_len)), dtype=np.float32)
 
-        self.configp = configparser.ConfigParser()
-        self.configp.read(os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'config.ini'))
+        # config.ini is parsed once per process. Tasks read their parameters as attributes of self.params in step().
+        self.config_sections = make_params(task, config_overrides)
+        self.params = self.config_sections.get(task)
         # Human preference weights
         self.C_v = self.config('velocity_weight', 'human_preferences')
         self.C_f = self.config('force_nontarget_weight', 'human_preferences')
@@ -42,12 +52,48 @@ class AssistiveEnv(gym.Env):
         # Execute actions at 10 Hz by default. A new action every 0.1 seconds
         self.frame_skip = frame_skip
         self.time_step = time_step
+        # Restore the static scene from a saved snapshot on reset instead of rebuilding it
+        self.fast_reset = fast_reset
+        # Precompute episode start states in background worker processes
+        self.reset_pool_size = reset_pool_size
+        self.reset_pool_workers = reset_pool_workers
+        self.reset_pool = None
+        # Reuse robot base placements across episodes and runs, stored in the given npz file
+        self.placement_cache = None if placement_cache is None else PlacementCache(placement_cache, tolerance=placement_cache_tolerance, max_entries=placement_cache_size)
+        # Evaluate robot base pose candidates in this many worker processes, each with its own copy of the scene
+        self.placement_workers = placement_workers
+        self.placement_engine = None
+        # How long the base pose search runs: all attempts ('fixed'), until placement_full_successes poses reach every goal ('first_n'),
+        # or until the best pose has not improved for placement_patience attempts ('adaptive')
+        if placement_strategy not in ['fixed', 'first_n', 'adaptive']:
+            raise ValueError('Unknown placement search strategy: %s' % placement_strategy)
+        self.placement_strategy = placement_strategy
+        self.placement_full_successes = placement_full_successes
+        self.placement_patience = placement_patience
+        # Warm start IK from converged solutions of nearby targets. Disabled when the size is 0.
+        self.ik_cache = None if ik_cache_size <= 0 else IKCache(tolerance=ik_cache_tolerance, max_entries=ik_cache_size)
+        # IK solver used by Util.ik: pybullet's calculateInverseKinematics, or batched damped least squares in NumPy on the URDF kinematic chain
+        if ik_backend not in ['pybullet', 'numpy']:
+            raise ValueError('Unknown IK backend: %s' % ik_backend)
+        self.ik_backend = ik_backend
+        # Check IK solutions for collisions by stepping the simulation ('step') or by querying contacts of the posed robot without dynamics ('query')
+        if collision_mode not in ['step', 'query']:
+            raise ValueError('Unknown collision mode: %s' % collision_mode)
+        self.collision_mode = collision_mode
+        # Never create visual-only marker bodies (targets, debug points) unless a GUI is attached
+        self.headless = headless
+        # Keyword arguments used to build identical copies of this env (e.g. for reset pool workers)
+        self.env_kwargs = dict(fast_reset=fast_reset, placement_cache=placement_cache, placement_cache_tolerance=placement_cache_tolerance, placement_cache_size=placement_cache_size, placement_strategy=placement_strategy, placement_full_successes=placement_full_successes, placement_patience=placement_patience, ik_cache_size=ik_cache_size, ik_cache_tolerance=ik_cache_tolerance, ik_backend=ik_backend, collision_mode=collision_mode, human_limits_oracle=human_limits_oracle, config_overrides=config_overrides, headless=headless)
 
         self.setup_timing()
         self.seed(1001)
 
-        self.world_creation = WorldCreation(self.id, robot_type=robot_type, task=task, time_step=self.time_step, np_random=self.np_random, config=self.config)
-        self.util = Util(self.id, self.np_random)
+        self.world_creation = WorldCreation(self.id, robot_type=robot_type, task=task, time_step=self.time_step, np_random=self.np_random, config=self.config, snapshot=self.fast_reset)
+        self.util = Util(self.id, self.np_random, ik_cache=self.ik_cache, ik_backend=self.make_ik_backend(), collision_mode=self.collision_mode)
+        # Link, base and joint states shared by step(), _get_obs() and update_targets() until the next physics step
+        self.state_cache = StateCache(self.id)
+        # Python-side task state that get_state captures along with the pybullet world. Tasks add their own attributes.
+        self.state_attributes = ['iteration', 'task_success', 'target_pos', 'target_human_joint_positions', 'right_arm_previous_valid_pose', 'left_arm_previous_valid_pose']
 
         self.record_video = False
         self.video_writer = None
@@ -60,14 +106,43 @@ class AssistiveEnv(gym.Env):
             # self.width = 3840
             # self.height = 2160
 
-        self.human_limits_model = load_model(os.path.join(self.world_creation.directory, 'realistic_arm_limits_model.h5'))
+        # Validity oracle for human arm poses: the keras model itself, the same network evaluated in NumPy, or a precomputed 4D grid.
+        # Loaded on first use, since only envs with human control need it.
+        if human_limits_oracle not in ['keras', 'numpy', 'grid']:
+            raise ValueError('Unknown human limits oracle: %s' % human_limits_oracle)
+        self.human_limits_oracle_type = human_limits_oracle
+        self.human_limits_oracle = None
         self.right_arm_previous_valid_pose = None
         self.left_arm_previous_valid_pose = None
         self.human_joint_lower_limits = None
         self.human_joint_upper_limits = None
 
+        # Opt-in profiling of pybullet calls and step phases. True prints a table after every episode, a filename appends JSON lines to it.
+        # Can also be enabled with the ASSISTIVE_GYM_PROFILE environment variable. Use env.profiler.dump() for a summary on demand.
+        if profile is None:
+            profile = os.environ.get('ASSISTIVE_GYM_PROFILE', '')
+        self.profiler = None
+        if profile not in [False, '', '0', 'false', 'False']:
+            self.profiler = Profiler(output=None if profile in [True, '1', 'true', 'True'] else profile)
+            self.profiler.attach(self.id)
+            self.profiler.instrument(self)
+
+    def make_ik_backend(self):
+        if self.ik_backend == 'numpy':
+            return NumpyDLSIK(self.id, self.world_creation.urdf_paths)
+        return None
+
     def seed(self, seed=None):
         self.np_random, seed = seeding.np_random(seed)
+        if hasattr(self, 'world_creation'):
+            # Share the new generator with the world and IK helpers so that reseeding also changes their sampling
+            self.world_creation.np_random = self.np_random
+            self.world_creation.human_creation.np_random = self.np_random
+            self.util.np_random = self.np_random
+        if self.reset_pool is not None:
+            # Pool seeds follow the new stream, so reseeding gives the same sequence of episodes again
+            self.reset_pool.reseed(self.np_random.randint(2**31 - 1))
+            self.util.resume_state = None
         return [seed]
 
     def step(self, action):
@@ -79,8 +154,31 @@ class AssistiveEnv(gym.Env):
     def reset(self):
         raise NotImplementedError('Implement reset')
 
+    def setup_episode(self):
+        if self.profiler is not None:
+            self.profiler.end_episode()
+        # The world is about to be rebuilt, so previously tracked bodies and links are stale
+        self.state_cache.clear()
+        # Number of IK solves used by this reset, reported in the info dict
+        self.util.ik_calls = 0
+        if self.reset_pool_size <= 0:
+            return
+        if self.reset_pool is None:
+            self.reset_pool = ResetPool(self.__class__, self.env_kwargs, size=self.reset_pool_size, num_workers=self.reset_pool_workers, seed=self.np_random.randint(2**31 - 1))
+        # Solutions left over from a previous episode that ended its reset early
+        self.util.resume_random_state()
+        state = self.reset_pool.pop()
+        if not state['solutions']:
+            return
+        # Rebuild the world from the worker's random stream so that its recorded base pose and IK solutions apply, skipping those searches.
+        # The generator is switched in place and goes back to the env's own stream, advanced by one draw per episode, once the solutions are used up.
+        self.np_random.randint(2**31 - 1)
+        self.util.resume_state = self.np_random.get_state()
+        self.np_random.set_state(seeding.np_random(state['seed'])[0].get_state())
+        self.util.replay_solutions = list(state['solutions'])
+
     def config(self, tag, section=None):
-        return float(self.configp[self.task if section is None else section][tag])
+        return getattr(self.config_sections[self.task if section is None else section], tag)
 
     def take_step(self, action, robot_arm='left', gains=0.05, forces=1, human_gains=0.1, human_forces=1, step_sim=True):
         action = np.clip(action, a_min=self.action_space.low, a_max=self.action_space.high)
@@ -106,11 +204,9 @@ class AssistiveEnv(gym.Env):
             if len(action_human) != human_len:
                 print('Received human actions of length %d does not match expected action length of %d' % (len(action_human), human_len))
                 exit()
-            human_joint_states = p.getJointStates(self.human, jointIndices=self.human_controllable_joint_indices, physicsClientId=self.id)
-            human_joint_positions = np.array([x[0] for x in human_joint_states])
+            human_joint_positions = self.state_cache.joint_positions(self.human, self.human_controllable_joint_indices)
 
-        robot_joint_states = p.getJointStates(self.robot, jointIndices=indices, physicsClientId=self.id)
-        robot_joint_positions = np.array([x[0] for x in robot_joint_states])
+        robot_joint_positions = self.state_cache.joint_positions(self.robot, indices)
 
         for _ in range(self.frame_skip):
             action_robot[robot_joint_positions + action_robot < self.robot_lower_limits] = 0
@@ -131,7 +227,7 @@ class AssistiveEnv(gym.Env):
         if step_sim:
             # Update robot position
             for _ in range(self.frame_skip):
-                p.stepSimulation(physicsClientId=self.id)
+                self.step_simulation()
                 if self.human_control:
                     self.enforce_realistic_human_joint_limits()
                 self.enforce_hard_human_joint_limits()
@@ -141,47 +237,49 @@ class AssistiveEnv(gym.Env):
                     self.slow_time()
             self.record_video_frame()
 
+    def step_simulation(self):
+        p.stepSimulation(physicsClientId=self.id)
+        self.state_cache.invalidate()
+
     def enforce_realistic_human_joint_limits(self):
         # Only enforce limits for the human arm that is moveable (if either arm is even moveable)
-        if 3 in self.human_controllable_joint_indices:
-            # Right human arm
-            tz, tx, ty, qe = [j[0] for j in p.getJointStates(self.human, jointIndices=[3, 4, 5, 6], physicsClientId=self.id)]
-            # Transform joint angles to match those from the Matlab data
-            tz2 = (-tz + 2*np.pi) % (2*np.pi)
-            tx2 = (tx + 2*np.pi) % (2*np.pi)
-            ty2 = -ty
-            qe2 = (-qe + 2*np.pi) % (2*np.pi)
-            result = self.human_limits_model.predict_classes(np.array([[tz2, tx2, ty2, qe2]]))
-            if result == 1:
-                # This is a valid pose for the person
-                self.right_arm_previous_valid_pose = [tz, tx, ty, qe]
-            elif result == 0 and self.right_arm_previous_valid_pose is not None:
-                # The person is in an invalid pose. Move them back to the most recent valid pose.
-                for i, j in enumerate([3, 4, 5, 6]):
-                    p.resetJointState(self.human, jointIndex=j, targetValue=self.right_arm_previous_valid_pose[i], targetVelocity=0, physicsClientId=self.id)
-        if 13 in self.human_controllable_joint_indices:
-            # Left human arm
-            tz, tx, ty, qe = [j[0] for j in p.getJointStates(self.human, jointIndices=[13, 14, 15, 16], physicsClientId=self.id)]
-            # Transform joint angles to match those from the Matlab data
-            tz2 = (tz + 2*np.pi) % (2*np.pi)
-            tx2 = (tx + 2*np.pi) % (2*np.pi)
-            ty2 = ty
-            qe2 = (-qe + 2*np.pi) % (2*np.pi)
-            result = self.human_limits_model.predict_classes(np.array([[tz2, tx2, ty2, qe2]]))
+        right = 3 in self.human_controllable_joint_indices
+        left = 13 in self.human_controllable_joint_indices
+        if not right and not left:
+            return
+        joints = ([3, 4, 5, 6] if right else []) + ([13, 14, 15, 16] if left else [])
+        poses = np.array([j[0] for j in p.getJointStates(self.human, jointIndices=joints, physicsClientId=self.id)]).reshape(-1, 4)
+        tz, tx, ty, qe = poses.T
+        # Transform joint angles to match those from the Matlab data. The right arm is mirrored.
+        sign = np.array(([-1] if right else []) + ([1] if left else []))
+        tz2 = (sign*tz + 2*np.pi) % (2*np.pi)
+        tx2 = (tx + 2*np.pi) % (2*np.pi)
+        ty2 = sign*ty
+        qe2 = (-qe + 2*np.pi) % (2*np.pi)
+        if self.human_limits_oracle is None:
+            self.human_limits_oracle = load_limits_oracle(self.human_limits_oracle_type, os.path.join(self.world_creation.directory, 'realistic_arm_limits_model.h5'))
+        # Query both arms at once
+        results = self.human_limits_oracle.predict(np.stack([tz2, tx2, ty2, qe2], axis=-1))
+        for arm_joints, pose, result in zip(np.reshape(joints, (-1, 4)), poses, results):
+            previous_valid_pose = self.right_arm_previous_valid_pose if arm_joints[0] == 3 else self.left_arm_previous_valid_pose
             if result == 1:
                 # This is a valid pose for the person
-                self.left_arm_previous_valid_pose = [tz, tx, ty, qe]
-            elif result == 0 and self.left_arm_previous_valid_pose is not None:
+                previous_valid_pose = pose.tolist()
+            elif result == 0 and previous_valid_pose is not None:
                 # The person is in an invalid pose. Move them back to the most recent valid pose.
-                for i, j in enumerate([13, 14, 15, 16]):
-                    p.resetJointState(self.human, jointIndex=j, targetValue=self.left_arm_previous_valid_pose[i], targetVelocity=0, physicsClientId=self.id)
+                for i, j in enumerate(arm_joints):
+                    p.resetJointState(self.human, jointIndex=j, targetValue=previous_valid_pose[i], targetVelocity=0, physicsClientId=self.id)
+                self.state_cache.invalidate()
+            if arm_joints[0] == 3:
+                self.right_arm_previous_valid_pose = previous_valid_pose
+            else:
+                self.left_arm_previous_valid_pose = previous_valid_pose
 
     def enforce_hard_human_joint_limits(self):
         if not self.human_controllable_joint_indices:
             return
         # Enforce joint limits. Sometimes, external forces and break the person's hard joint limits.
-        joint_states = p.getJointStates(self.human, jointIndices=self.human_controllable_joint_indices, physicsClientId=self.id)
-        joint_positions = np.array([x[0] for x in joint_states])
+        joint_positions = self.state_cache.joint_positions(self.human, self.human_controllable_joint_indices)
         if self.human_joint_lower_limits is None:
             self.human_joint_lower_limits = []
             self.human_joint_upper_limits = []
@@ -197,8 +295,10 @@ class AssistiveEnv(gym.Env):
         for i, j in enumerate(self.human_controllable_joint_indices):
             if joint_positions[i] < self.human_joint_lower_limits[i]:
                 p.resetJointState(self.human, jointIndex=j, targetValue=self.human_joint_lower_limits[i], targetVelocity=0, physicsClientId=self.id)
+                self.state_cache.invalidate()
             elif joint_positions[i] > self.human_joint_upper_limits[i]:
                 p.resetJointState(self.human, jointIndex=j, targetValue=self.human_joint_upper_limits[i], targetVelocity=0, physicsClientId=self.id)
+                self.state_cache.invalidate()
 
     def human_preferences(self, end_effector_velocity=0, total_force_on_human=0, tool_force_at_target=0, food_hit_human_reward=0, food_mouth_velocities=[], dressing_forces=[[]], arm_manipulation_tool_forces_on_human=[0, 0], arm_manipulation_total_force_on_human=0):
         # Slow end effector velocities
@@ -255,17 +355,8 @@ class AssistiveEnv(gym.Env):
                 p.resetJointState(self.robot, jointIndex=j, targetValue=[-0.75, 1, -0.5, 0.5, -1, -0.5, 0][i], targetVelocity=0, physicsClientId=self.id)
 
     def joint_limited_weighting(self, q, lower_limits, upper_limits):
-        phi = 0.5
-        lam = 0.05
-        weights = []
-        for qi, l, u in zip(q, lower_limits, upper_limits):
-            qr = 0.5*(u - l)
-            weights.append(1.0 - np.power(phi, (qr - np.abs(qr - qi + l)) / (lam*qr) + 1))
-            if weights[-1] < 0.001:
-                weights[-1] = 0.001
         # Joint-limited-weighting
-        joint_limit_weight = np.diag(weights)
-        return joint_limit_weight
+        return np.diag(joint_limited_weights(q, lower_limits, upper_limits))
 
     def get_motor_joint_states(self, robot):
         num_joints = p.getNumJoints(robot, physicsClientId=self.id)
@@ -288,83 +379,17 @@ class AssistiveEnv(gym.Env):
             lower_limits = [lower_limits]
             upper_limits = [upper_limits]
             ik_indices = [ik_indices]
-        a = 6 # Order of the robot space. 6D (3D position, 3D orientation)
-        best_position = None
-        best_orientation = None
-        best_num_goals_reached = None
-        best_manipulability = None
-        best_start_joint_poses = [None]*len(joints)
-        start_fails = 0
-        iteration = 0
-        best_pose_count = 0
-        while iteration < attempts or best_position is None:
-            iteration += 1
-            random_pos = np.array([self.np_random.uniform(-random_position if right_side else 0, 0 if right_side else random_position), self.np_random.uniform(-random_position, random_position), 0])
-            random_orientation = p.getQuaternionFromEuler([base_euler_orient[0], base_euler_orient[1], base_euler_orient[2] + np.deg2rad(self.np_random.uniform(-random_rotation, random_rotation))], physicsClientId=self.id)
-            p.resetBasePositionAndOrientation(robot, np.array([-0.85, -0.4, 0]) + pos_offset + random_pos, random_orientation, physicsClientId=self.id)
-            # Check if the robot can reach all target locations from this base pose
-            num_goals_reached = 0
-            manipulability = 0.0
-            start_joint_poses = [None]*len(joints)
-            for i, joint in enumerate(joints):
-                for j, (target_pos, target_orient) in enumerate(start_pos_orient[i] + target_pos_orients[i]):
-                    best_jlwki = None
-                    goal_success = False
-                    orient = target_orient
-                    for k in range(ik_random_restarts):
-                        # Reset human joints in case they got perturbed by previous iterations
-                        if human_joint_positions is not None:
-                            for h, pos in zip(human_joint_indices, human_joint_positions):
-                                p.resetJointState(self.human, jointIndex=h, targetValue=pos, targetVelocity=0, physicsClientId=self.id)
-                        # Reset all robot joints
-                        self.reset_robot_joints()
-                        # Find IK solution
-                        success, joint_positions_q_star = self.util.ik_jlwki(robot, joint, target_pos, orient, self.world_creation, joint_indices[i], lower_limits[i], upper_limits[i], ik_indices=ik_indices[i], max_iterations=max_ik_iterations, success_threshold=0.03, half_range=(self.robot_type=='baxter'), step_sim=step_sim, check_env_collisions=check_env_collisions)
-                        if success:
-                            goal_success = True
-                        else:
-                            goal_success = False
-                            break
-                        joint_positions, _, _ = self.get_motor_joint_states(robot)
-                        joint_velocities = [0.0] * len(joint_positions)
-                        joint_accelerations = [0.0] * len(joint_positions)
-                        center_of_mass = p.getLinkState(robot, joint, computeLinkVelocity=True, computeForwardKinematics=True, physicsClientId=self.id)[2]
-                        J_linear, J_angular = p.calculateJacobian(robot, joint, localPosition=center_of_mass, objPositions=joint_positions, objVelocities=joint_velocities, objAccelerations=joint_accelerations, physicsClientId=self.id)
-                        J_linear = np.array(J_linear)[:, ik_indices[i]]
-                        J_angular = np.array(J_angular)[:, ik_indices[i]]
-                        J = np.concatenate([J_linear, J_angular], axis=0)
-                        # Joint-limited-weighting
-                        joint_limit_weight = self.joint_limited_weighting(joint_positions_q_star, lower_limits[i], upper_limits[i])
-                        # Joint-limited-weighted kinematic isotropy (JLWKI)
-                        det = np.linalg.det(np.matmul(np.matmul(J, joint_limit_weight), J.T))
-                        if det < 0:
-                            det = 0
-                        jlwki = np.power(det, 1.0/a) / (np.trace(np.matmul(np.matmul(J, joint_limit_weight), J.T))/a)
-                        if best_jlwki is None or jlwki > best_jlwki:
-                            best_jlwki = jlwki
-                    if goal_success:
-                        num_goals_reached += 1
-                        manipulability += best_jlwki
-                        if j == 0:
-                            start_joint_poses[i] = joint_positions_q_star
-                    if j < len(start_pos_orient[i]) and not goal_success:
-                        # Not able to find an IK solution to a start goal. We cannot use this base pose
-                        start_fails += 1
-                        num_goals_reached = -1
-                        manipulability = None
-                        break
-                if num_goals_reached == -1:
-                    break
-
-            if num_goals_reached == 4:
-                best_pose_count += 1
-            if num_goals_reached > 0:
-                if best_position is None or num_goals_reached > best_num_goals_reached or (num_goals_reached == best_num_goals_reached and manipulability > best_manipulability):
-                    best_position = random_pos
-                    best_orientation = random_orientation
-                    best_num_goals_reached = num_goals_reached
-                    best_manipulability = manipulability
-                    best_start_joint_poses = start_joint_poses
+        solution = self.util.replay_solution('toc')
+        if solution is None:
+            cache_key = None if self.placement_cache is None else self.placement_cache.key(self.task, self.robot_type, self.gender, joints, start_pos_orient, target_pos_orients, pos_offset, human_joint_positions)
+            solution = None if cache_key is None else self.placement_cache.get(cache_key)
+            if solution is None:
+                search = self.search_robot_base_pose if self.placement_workers <= 0 else self.parallel_search_robot_base_pose
+                solution = search(robot, joints, start_pos_orient, target_pos_orients, joint_indices, lower_limits, upper_limits, ik_indices, pos_offset, base_euler_orient, max_ik_iterations, attempts, ik_random_restarts, step_sim, check_env_collisions, right_side, random_rotation, random_position, human_joint_indices, human_joint_positions)
+                if cache_key is not None:
+                    self.placement_cache.put(cache_key, solution)
+            self.util.record_solution('toc', solution)
+        best_position, best_orientation, best_start_joint_poses = solution
 
         p.resetBasePositionAndOrientation(robot, np.array([-0.85, -0.4, 0]) + pos_offset + best_position, best_orientation, physicsClientId=self.id)
         for i, joint in enumerate(joints):
@@ -375,6 +400,121 @@ class AssistiveEnv(gym.Env):
                 p.resetJointState(self.human, jointIndex=h, targetValue=pos, targetVelocity=0, physicsClientId=self.id)
         return best_position, best_orientation, best_start_joint_poses
 
+    def sample_robot_base_pose(self, base_euler_orient, right_side, random_rotation, random_position, np_random=None):
+        np_random = self.np_random if np_random is None else np_random
+        random_pos = np.array([np_random.uniform(-random_position if right_side else 0, 0 if right_side else random_position), np_random.uniform(-random_position, random_position), 0])
+        random_orientation = p.getQuaternionFromEuler([base_euler_orient[0], base_euler_orient[1], base_euler_orient[2] + np.deg2rad(np_random.uniform(-random_rotation, random_rotation))], physicsClientId=self.id)
+        return random_pos, random_orientation
+
+    def evaluate_robot_base_pose(self, robot, random_pos, random_orientation, joints, start_pos_orient, target_pos_orients, joint_indices, lower_limits, upper_limits, ik_indices, pos_offset, max_ik_iterations, ik_random_restarts, step_sim, check_env_collisions, human_joint_indices, human_joint_positions):
+        a = 6 # Order of the robot space. 6D (3D position, 3D orientation)
+        p.resetBasePositionAndOrientation(robot, np.array([-0.85, -0.4, 0]) + pos_offset + random_pos, random_orientation, physicsClientId=self.id)
+        # Check if the robot can reach all target locations from this base pose
+        num_goals_reached = 0
+        manipulability = 0.0
+        start_joint_poses = [None]*len(joints)
+        for i, joint in enumerate(joints):
+            # Jacobians and IK solutions of every goal and restart, scored together once all goals of this arm have been tried
+            goal_jacobians = []
+            goal_joint_positions = []
+            goal_ids = []
+            reached_goals = []
+            for j, (target_pos, target_orient) in enumerate(start_pos_orient[i] + target_pos_orients[i]):
+                goal_success = False
+                orient = target_orient
+                for k in range(ik_random_restarts):
+                    # Reset human joints in case they got perturbed by previous iterations
+                    if human_joint_positions is not None:
+                        for h, pos in zip(human_joint_indices, human_joint_positions):
+                            p.resetJointState(self.human, jointIndex=h, targetValue=pos, targetVelocity=0, physicsClientId=self.id)
+                    # Reset all robot joints
+                    self.reset_robot_joints()
+                    # Find IK solution
+                    success, joint_positions_q_star = self.util.ik_jlwki(robot, joint, target_pos, orient, self.world_creation, joint_indices[i], lower_limits[i], upper_limits[i], ik_indices=ik_indices[i], max_iterations=max_ik_iterations, success_threshold=0.03, half_range=(self.robot_type=='baxter'), step_sim=step_sim, check_env_collisions=check_env_collisions)
+                    if success:
+                        goal_success = True
+                    else:
+                        goal_success = False
+                        break
+                    joint_positions, _, _ = self.get_motor_joint_states(robot)
+                    joint_velocities = [0.0] * len(joint_positions)
+                    joint_accelerations = [0.0] * len(joint_positions)
+                    center_of_mass = p.getLinkState(robot, joint, computeLinkVelocity=True, computeForwardKinematics=True, physicsClientId=self.id)[2]
+                    J_linear, J_angular = p.calculateJacobian(robot, joint, localPosition=center_of_mass, objPositions=joint_positions, objVelocities=joint_velocities, objAccelerations=joint_accelerations, physicsClientId=self.id)
+                    J_linear = np.array(J_linear)[:, ik_indices[i]]
+                    J_angular = np.array(J_angular)[:, ik_indices[i]]
+                    goal_jacobians.append(np.concatenate([J_linear, J_angular], axis=0))
+                    goal_joint_positions.append(joint_positions_q_star)
+                    goal_ids.append(j)
+                if goal_success:
+                    num_goals_reached += 1
+                    reached_goals.append(j)
+                    if j == 0:
+                        start_joint_poses[i] = joint_positions_q_star
+                if j < len(start_pos_orient[i]) and not goal_success:
+                    # Not able to find an IK solution to a start goal. We cannot use this base pose
+                    num_goals_reached = -1
+                    manipulability = None
+                    break
+            if num_goals_reached == -1:
+                break
+            if reached_goals:
+                # Joint-limited-weighted kinematic isotropy (JLWKI) of all IK solutions in one batch, keeping the best restart of each reached goal
+                scores = jlwki_scores(np.array(goal_jacobians), np.array(goal_joint_positions), lower_limits[i], upper_limits[i], order=a)
+                goal_ids = np.array(goal_ids)
+                for j in reached_goals:
+                    manipulability += np.max(scores[goal_ids == j])
+        return num_goals_reached, manipulability, start_joint_poses
+
+    def placement_search(self, attempts, start_pos_orient, target_pos_orients):
+        num_goals = sum(len(start) + len(targets) for start, targets in zip(start_pos_orient, target_pos_orients))
+        return PlacementSearch(self.placement_strategy, attempts=attempts, num_goals=num_goals, full_successes=self.placement_full_successes, patience=self.placement_patience)
+
+    def search_robot_base_pose(self, robot, joints, start_pos_orient, target_pos_orients, joint_indices, lower_limits, upper_limits, ik_indices, pos_offset, base_euler_orient, max_ik_iterations, attempts, ik_random_restarts, step_sim, check_env_collisions, right_side, random_rotation, random_position, human_joint_indices, human_joint_positions):
+        # Same seeding as the parallel search, so the result does not depend on the number of placement workers
+        base_seed = self.np_random.randint(2**31 - 1 - 1000000)
+        candidate_random = np.random.RandomState(base_seed)
+        # Evaluations reseed the shared generator. Put it back afterwards so the env's random stream continues as if one value was drawn.
+        random_state = self.np_random.get_state()
+        search = self.placement_search(attempts, start_pos_orient, target_pos_orients)
+        num_candidates = 0
+        while not search.done():
+            random_pos, random_orientation = self.sample_robot_base_pose(base_euler_orient, right_side, random_rotation, random_position, np_random=candidate_random)
+            self.np_random.seed(base_seed + 1 + num_candidates)
+            num_candidates += 1
+            num_goals_reached, manipulability, start_joint_poses = self.evaluate_robot_base_pose(robot, random_pos, random_orientation, joints, start_pos_orient, target_pos_orients, joint_indices, lower_limits, upper_limits, ik_indices, pos_offset, max_ik_iterations, ik_random_restarts, step_sim, check_env_collisions, human_joint_indices, human_joint_positions)
+            search.add(random_pos, random_orientation, num_goals_reached, manipulability, start_joint_poses)
+        self.np_random.set_state(random_state)
+        best_position, best_orientation, _, _, best_start_joint_poses = search.best
+        return best_position, best_orientation, best_start_joint_poses
+
+    def parallel_search_robot_base_pose(self, robot, joints, start_pos_orient, target_pos_orients, joint_indices, lower_limits, upper_limits, ik_indices, pos_offset, base_euler_orient, max_ik_iterations, attempts, ik_random_restarts, step_sim, check_env_collisions, right_side, random_rotation, random_position, human_joint_indices, human_joint_positions):
+        if self.placement_engine is None:
+            self.placement_engine = PlacementEngine(self.__class__, self.env_kwargs, num_workers=self.placement_workers)
+        # The robot, human and furniture are cloned into the worker clients. Task specific bodies (tools, tables, bowls) are not.
+        scene = {'key': (self.world_creation.furniture_type, self.world_creation.static_human_base, self.gender), 'human': body_state(self.human, self.id), 'furniture': body_state(self.world_creation.furniture, self.id), 'robot': body_state(robot, self.id)}
+        kwargs = dict(joints=joints, start_pos_orient=start_pos_orient, target_pos_orients=target_pos_orients, joint_indices=joint_indices, lower_limits=lower_limits, upper_limits=upper_limits, ik_indices=ik_indices, pos_offset=pos_offset, max_ik_iterations=max_ik_iterations, ik_random_restarts=ik_random_restarts, step_sim=step_sim, check_env_collisions=check_env_collisions, human_joint_indices=human_joint_indices, human_joint_positions=human_joint_positions)
+        # Candidates and their seeds come from a generator seeded here, so the result only depends on the env seed and not on the number of workers
+        base_seed = self.np_random.randint(2**31 - 1 - 1000000)
+        candidate_random = np.random.RandomState(base_seed)
+        search = self.placement_search(attempts, start_pos_orient, target_pos_orients)
+        num_candidates = 0
+        while not search.done():
+            # Keep all workers busy. Evaluations past the point where the search stops are discarded.
+            batch = []
+            for _ in range(max(search.remaining(), self.placement_workers)):
+                random_pos, random_orientation = self.sample_robot_base_pose(base_euler_orient, right_side, random_rotation, random_position, np_random=candidate_random)
+                batch.append((num_candidates, random_pos, random_orientation, base_seed + 1 + num_candidates))
+                num_candidates += 1
+            for (index, random_pos, random_orientation, _), (_, num_goals_reached, manipulability, start_joint_poses, ik_calls) in zip(batch, self.placement_engine.evaluate(scene, kwargs, batch)):
+                self.util.ik_calls += ik_calls
+                if not search.done():
+                    search.add(random_pos, random_orientation, num_goals_reached, manipulability, start_joint_poses)
+        # Leave the robot joints in the same state as a sequential search would
+        self.reset_robot_joints()
+        best_position, best_orientation, _, _, best_start_joint_poses = search.best
+        return best_position, best_orientation, best_start_joint_poses
+
     def slow_time(self):
         # Slow down time so that the simulation matches real time
         t = time.time() - self.last_sim_time
@@ -404,13 +544,82 @@ class AssistiveEnv(gym.Env):
     def update_targets(self):
         pass
 
+    def markers_enabled(self):
+        return self.gui or not self.headless
+
+    def create_markers(self, positions, radius=0.01, rgba=[0, 1, 0, 1]):
+        # Visual-only spheres that share a single visual shape. Returns an empty list in headless mode.
+        if not self.markers_enabled():
+            return []
+        sphere_visual = p.createVisualShape(shapeType=p.GEOM_SPHERE, radius=radius, rgbaColor=rgba, physicsClientId=self.id)
+        return [p.createMultiBody(baseMass=0.0, baseCollisionShapeIndex=-1, baseVisualShapeIndex=sphere_visual, basePosition=pos, useMaximalCoordinates=False, physicsClientId=self.id) for pos in positions]
+
+    def create_marker(self, pos, radius=0.01, rgba=[0, 1, 0, 1]):
+        markers = self.create_markers([pos], radius=radius, rgba=rgba)
+        return markers[0] if markers else None
+
+    def move_marker(self, marker, pos, orient=[0, 0, 0, 1]):
+        if marker is not None:
+            p.resetBasePositionAndOrientation(marker, pos, orient, physicsClientId=self.id)
+
     def render(self, mode='human'):
         if not self.gui:
             self.gui = True
+            if self.profiler is not None:
+                self.profiler.detach(self.id)
             p.disconnect(self.id)
             self.id = p.connect(p.GUI, options='--background_color_red=0.8 --background_color_green=0.9 --background_color_blue=1.0 --width=%d --height=%d' % (self.width, self.height))
 
-            self.world_creation = WorldCreation(self.id, robot_type=self.robot_type, task=self.task, time_step=self.time_step, np_random=self.np_random, config=self.config)
-            self.util = Util(self.id, self.np_random)
+            self.world_creation = WorldCreation(self.id, robot_type=self.robot_type, task=self.task, time_step=self.time_step, np_random=self.np_random, config=self.config, snapshot=self.fast_reset)
+            if self.ik_cache is not None:
+                # Body ids of the new physics client do not match the cached ones
+                self.ik_cache.clear()
+            self.util = Util(self.id, self.np_random, ik_cache=self.ik_cache, ik_backend=self.make_ik_backend(), collision_mode=self.collision_mode)
+            self.state_cache = StateCache(self.id)
+            if self.profiler is not None:
+                self.profiler.attach(self.id)
             # print('Physics server ID:', self.id)
 
+    def get_state(self):
+        '''
+        Capture the current simulation and task state. The returned token can be passed to set_state any number of times
+        during the same episode, and should be released with discard_state once it is no longer needed.
+        '''
+        attributes = {name: copy.deepcopy(getattr(self, name)) for name in self.state_attributes if hasattr(self, name)}
+        return {'state_id': p.saveState(physicsClientId=self.id), 'world': self.world_creation.world_count, 'attributes': attributes, 'random_state': self.np_random.get_state()}
+
+    def set_state(self, state):
+        if state['world'] != self.world_creation.world_count:
+            raise ValueError('Cannot restore a state saved before the last reset')
+        p.restoreState(stateId=state['state_id'], physicsClientId=self.id)
+        # Copy again so that the token can be restored more than once
+        for name, value in state['attributes'].items():
+            setattr(self, name, copy.deepcopy(value))
+        self.np_random.set_state(state['random_state'])
+        self.state_cache.invalidate()
+        self.after_set_state()
+
+    def after_set_state(self):
+        # Restore simulation settings that saveState does not cover
+        pass
+
+    def discard_state(self, state):
+        if state['world'] == self.world_creation.world_count:
+            p.removeState(state['state_id'], physicsClientId=self.id)
+
+    def close(self):
+        if self.reset_pool is not None:
+            self.reset_pool.close()
+            self.reset_pool = None
+        if self.placement_engine is not None:
+            self.placement_engine.close()
+            self.placement_engine = None
+        if self.placement_cache is not None:
+            self.placement_cache.close()
+        if self.profiler is not None:
+            self.profiler.end_episode()
+            self.profiler.detach(self.id)
+        if self.id is not None:
+            p.disconnect(self.id)
+            self.id = None
+
@@ -4,35 +4,38 @@ import numpy as np
 import pybullet as p
 
 from .env import AssistiveEnv
+from .particles import ParticlePool
 
 class FeedingEnv(AssistiveEnv):
-    def __init__(self, robot_type='pr2', human_control=False):
-        super(FeedingEnv, self).__init__(robot_type=robot_type, task='feeding', human_control=human_control, frame_skip=10, time_step=0.01, action_robot_len=7, action_human_len=(4 if human_control else 0), obs_robot_len=25, obs_human_len=(23 if human_control else 0))
+    def __init__(self, robot_type='pr2', human_control=False, **kwargs):
+        super(FeedingEnv, self).__init__(robot_type=robot_type, task='feeding', human_control=human_control, frame_skip=10, time_step=0.01, action_robot_len=7, action_human_len=(4 if human_control else 0), obs_robot_len=25, obs_human_len=(23 if human_control else 0), **kwargs)
+        self.state_attributes += ['foods']
+        self.food_pool = ParticlePool(radius=0.005, mass=0.001)
 
     def step(self, action):
-        self.take_step(action, robot_arm='right', gains=self.config('robot_gains'), forces=self.config('robot_forces'), human_gains=0.0005)
+        self.take_step(action, robot_arm='right', gains=self.params.robot_gains, forces=self.params.robot_forces, human_gains=0.0005)
 
         robot_force_on_human, spoon_force_on_human = self.get_total_force()
         total_force_on_human = robot_force_on_human + spoon_force_on_human
         reward_food, food_mouth_velocities, food_hit_human_reward = self.get_food_rewards()
-        end_effector_velocity = np.linalg.norm(p.getBaseVelocity(self.spoon, physicsClientId=self.id)[0])
+        end_effector_velocity = np.linalg.norm(self.state_cache.base_velocity(self.spoon)[0])
         obs = self._get_obs([spoon_force_on_human], [robot_force_on_human, spoon_force_on_human])
 
         # Get human preferences
         preferences_score = self.human_preferences(end_effector_velocity=end_effector_velocity, total_force_on_human=robot_force_on_human, tool_force_at_target=spoon_force_on_human, food_hit_human_reward=food_hit_human_reward, food_mouth_velocities=food_mouth_velocities)
 
-        spoon_pos, spoon_orient = p.getBasePositionAndOrientation(self.spoon, physicsClientId=self.id)
+        spoon_pos, spoon_orient = self.state_cache.base_pos_orient(self.spoon)
         spoon_pos = np.array(spoon_pos)
 
         reward_distance_mouth_target = -np.linalg.norm(self.target_pos - spoon_pos) # Penalize robot for distance between the spoon and human mouth.
         reward_action = -np.sum(np.square(action)) # Penalize actions
 
-        reward = self.config('distance_weight')*reward_distance_mouth_target + self.config('action_weight')*reward_action + self.config('food_reward_weight')*reward_food + preferences_score
+        reward = self.params.distance_weight*reward_distance_mouth_target + self.params.action_weight*reward_action + self.params.food_reward_weight*reward_food + preferences_score
 
         if self.gui and reward_food != 0:
             print('Task success:', self.task_success, 'Food reward:', reward_food)
 
-        info = {'total_force_on_human': total_force_on_human, 'task_success': int(self.task_success >= self.total_food_count*self.config('task_success_threshold')), 'action_robot_len': self.action_robot_len, 'action_human_len': self.action_human_len, 'obs_robot_len': self.obs_robot_len, 'obs_human_len': self.obs_human_len}
+        info = {'total_force_on_human': total_force_on_human, 'task_success': int(self.task_success >= self.total_food_count*self.params.task_success_threshold), 'action_robot_len': self.action_robot_len, 'action_human_len': self.action_human_len, 'obs_robot_len': self.obs_robot_len, 'obs_human_len': self.obs_human_len, 'reset_ik_calls': self.util.ik_calls}
         done = False
 
         return obs, reward, done, info
@@ -49,46 +52,40 @@ class FeedingEnv(AssistiveEnv):
     def get_food_rewards(self):
         # Check all food particles to see if they have left the spoon or entered the person's mouth
         # Give the robot a reward or penalty depending on food particle status
-        food_reward = 0
-        food_hit_human_reward = 0
-        food_mouth_velocities = []
-        foods_to_remove = []
-        for f in self.foods:
-            food_pos, food_orient = p.getBasePositionAndOrientation(f, physicsClientId=self.id)
-            distance_to_mouth = np.linalg.norm(self.target_pos - food_pos)
-            if distance_to_mouth < 0.02:
-                # Delete particle and give robot a reward
-                food_reward += 20
-                self.task_success += 1
-                food_velocity = np.linalg.norm(p.getBaseVelocity(f, physicsClientId=self.id)[0])
-                food_mouth_velocities.append(food_velocity)
-                foods_to_remove.append(f)
-                p.resetBasePositionAndOrientation(f, self.np_random.uniform(1000, 2000, size=3), [0, 0, 0, 1], physicsClientId=self.id)
-                continue
-            elif food_pos[-1] < 0.5 or len(p.getContactPoints(bodyA=f, bodyB=self.table, physicsClientId=self.id)) > 0 or len(p.getContactPoints(bodyA=f, bodyB=self.bowl, physicsClientId=self.id)) > 0:
-                # Delete particle and give robot a penalty for spilling food
-                food_reward -= 5
-                foods_to_remove.append(f)
-                continue
-            if len(p.getContactPoints(bodyA=f, bodyB=self.human, physicsClientId=self.id)) > 0 and f not in self.foods_hit_person:
-                # Record that this food particle just hit the person, so that we can penalize the robot
-                self.foods_hit_person.append(f)
-                food_hit_human_reward -= 1
-        self.foods = [f for f in self.foods if f not in foods_to_remove]
+        indices = self.foods.active_indices()
+        if len(indices) == 0:
+            return 0, [], 0
+        food_pos = self.foods.positions(indices)
+        distance_to_mouth = np.linalg.norm(self.target_pos - food_pos, axis=-1)
+        # Delete particles that entered the mouth and give robot a reward
+        mouth = distance_to_mouth < 0.02
+        food_reward = 20*int(np.sum(mouth))
+        self.task_success += int(np.sum(mouth))
+        food_mouth_velocities = list(self.foods.speeds(indices[mouth]))
+        # Delete particles that were spilled and give robot a penalty
+        spilled = ~mouth & ((food_pos[:, -1] < 0.5) | self.foods.contacts(self.table)[indices] | self.foods.contacts(self.bowl)[indices])
+        food_reward -= 5*int(np.sum(spilled))
+        # Record food particles that just hit the person, so that we can penalize the robot
+        hit = ~mouth & ~spilled & self.foods.contacts(self.human)[indices] & ~self.foods.hit_person[indices]
+        self.foods.hit_person[indices[hit]] = True
+        food_hit_human_reward = -int(np.sum(hit))
+        # Eaten particles leave the scene. Draw the far away positions they used to be moved to, so the random stream stays the same.
+        self.np_random.uniform(1000, 2000, size=(int(np.sum(mouth)), 3))
+        self.foods.remove(indices[mouth], park_bodies=True)
+        # Spilled particles stay where they are as colliding bodies
+        self.foods.remove(indices[spilled])
         return food_reward, food_mouth_velocities, food_hit_human_reward
 
     def _get_obs(self, forces, forces_human):
-        torso_pos = np.array(p.getLinkState(self.robot, 15 if self.robot_type == 'pr2' else 0, computeForwardKinematics=True, physicsClientId=self.id)[0])
-        spoon_pos, spoon_orient = p.getBasePositionAndOrientation(self.spoon, physicsClientId=self.id)
-        robot_right_joint_states = p.getJointStates(self.robot, jointIndices=self.robot_right_arm_joint_indices, physicsClientId=self.id)
-        robot_right_joint_positions = np.array([x[0] for x in robot_right_joint_states])
-        robot_pos, robot_orient = p.getBasePositionAndOrientation(self.robot, physicsClientId=self.id)
+        torso_pos = self.state_cache.link_pos(self.robot, 15 if self.robot_type == 'pr2' else 0)
+        spoon_pos, spoon_orient = self.state_cache.base_pos_orient(self.spoon)
+        robot_right_joint_positions = self.state_cache.joint_positions(self.robot, self.robot_right_arm_joint_indices)
+        robot_pos, robot_orient = self.state_cache.base_pos_orient(self.robot)
         if self.human_control:
-            human_pos = np.array(p.getBasePositionAndOrientation(self.human, physicsClientId=self.id)[0])
-            human_joint_states = p.getJointStates(self.human, jointIndices=self.human_controllable_joint_indices, physicsClientId=self.id)
-            human_joint_positions = np.array([x[0] for x in human_joint_states])
+            human_pos = self.state_cache.base_pos_orient(self.human)[0]
+            human_joint_positions = self.state_cache.joint_positions(self.human, self.human_controllable_joint_indices)
 
-        head_pos, head_orient = p.getLinkState(self.human, 23, computeForwardKinematics=True, physicsClientId=self.id)[:2]
+        head_pos, head_orient = self.state_cache.link_pos_orient(self.human, 23)
 
         robot_obs = np.concatenate([spoon_pos-torso_pos, spoon_orient, spoon_pos-self.target_pos, robot_right_joint_positions, head_pos-torso_pos, head_orient, forces]).ravel()
         if self.human_control:
@@ -98,10 +95,16 @@ class FeedingEnv(AssistiveEnv):
 
         return np.concatenate([robot_obs, human_obs]).ravel()
 
+    def after_set_state(self):
+        self.foods.restore()
+
     def reset(self):
+        self.setup_episode()
         self.setup_timing()
         self.task_success = 0
         self.human, self.wheelchair, self.robot, self.robot_lower_limits, self.robot_upper_limits, self.human_lower_limits, self.human_upper_limits, self.robot_right_arm_joint_indices, self.robot_left_arm_joint_indices, self.gender = self.world_creation.create_new_world(furniture_type='wheelchair', static_human_base=True, human_impairment='random', print_joints=False, gender='random')
+        # Particle bodies become part of the fast reset snapshot, so they have to exist before any task bodies are added
+        self.food_pool.prepare(self.world_creation, 8)
         self.robot_lower_limits = self.robot_lower_limits[self.robot_right_arm_joint_indices]
         self.robot_upper_limits = self.robot_upper_limits[self.robot_right_arm_joint_indices]
         self.reset_robot_joints()
@@ -140,9 +143,7 @@ class FeedingEnv(AssistiveEnv):
         head_pos, head_orient = p.getLinkState(self.human, 23, computeForwardKinematics=True, physicsClientId=self.id)[:2]
         target_pos, target_orient = p.multiplyTransforms(head_pos, head_orient, self.mouth_pos, [0, 0, 0, 1], physicsClientId=self.id)
         self.target_pos = np.array(target_pos)
-        sphere_collision = -1
-        sphere_visual = p.createVisualShape(shapeType=p.GEOM_SPHERE, radius=0.01, rgbaColor=[0, 1, 0, 1], physicsClientId=self.id)
-        self.target = p.createMultiBody(baseMass=0.0, baseCollisionShapeIndex=sphere_collision, baseVisualShapeIndex=sphere_visual, basePosition=self.target_pos, useMaximalCoordinates=False, physicsClientId=self.id)
+        self.target = self.create_marker(self.target_pos, rgba=[0, 1, 0, 1])
 
         p.resetDebugVisualizerCamera(cameraDistance=1.10, cameraYaw=40, cameraPitch=-45, cameraTargetPosition=[-0.2, 0, 0.75], physicsClientId=self.id)
 
@@ -190,19 +191,13 @@ class FeedingEnv(AssistiveEnv):
         # Generate food
         spoon_pos, spoon_orient = p.getBasePositionAndOrientation(self.spoon, physicsClientId=self.id)
         spoon_pos = np.array(spoon_pos)
-        food_radius = 0.005
-        food_collision = p.createCollisionShape(p.GEOM_SPHERE, radius=food_radius, physicsClientId=self.id)
-        food_visual = -1
-        food_mass = 0.001
-        food_count = 2*2*2
+        food_radius = self.food_pool.radius
         batch_positions = []
         for i in range(2):
             for j in range(2):
                 for k in range(2):
                     batch_positions.append(np.array([i*2*food_radius-0.005, j*2*food_radius, k*2*food_radius+0.02]) + spoon_pos)
-        last_food_id = p.createMultiBody(baseMass=food_mass, baseCollisionShapeIndex=food_collision, baseVisualShapeIndex=food_visual, basePosition=[0, 0, 0], useMaximalCoordinates=False, batchPositions=batch_positions, physicsClientId=self.id)
-        self.foods = list(range(last_food_id-food_count+1, last_food_id+1))
-        self.foods_hit_person = []
+        self.foods = self.food_pool.reset(self.world_creation, batch_positions)
         self.total_food_count = len(self.foods)
 
         # Enable rendering
@@ -212,11 +207,12 @@ class FeedingEnv(AssistiveEnv):
         for _ in range(100):
             p.stepSimulation(physicsClientId=self.id)
 
+        self.state_cache.invalidate()
         return self._get_obs([0], [0, 0])
 
     def update_targets(self):
-        head_pos, head_orient = p.getLinkState(self.human, 23, computeForwardKinematics=True, physicsClientId=self.id)[:2]
+        head_pos, head_orient = self.state_cache.link_pos_orient(self.human, 23)
         target_pos, target_orient = p.multiplyTransforms(head_pos, head_orient, self.mouth_pos, [0, 0, 0, 1], physicsClientId=self.id)
         self.target_pos = np.array(target_pos)
-        p.resetBasePositionAndOrientation(self.target, self.target_pos, [0, 0, 0, 1], physicsClientId=self.id)
+        self.move_marker(self.target, self.target_pos)
 
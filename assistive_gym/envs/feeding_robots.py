@@ -1,38 +1,38 @@
 from .feeding import FeedingEnv
 
 class FeedingPR2Env(FeedingEnv):
-    def __init__(self):
-        super(FeedingPR2Env, self).__init__(robot_type='pr2', human_control=False)
+    def __init__(self, **kwargs):
+        super(FeedingPR2Env, self).__init__(robot_type='pr2', human_control=False, **kwargs)
 
 class FeedingBaxterEnv(FeedingEnv):
-    def __init__(self):
-        super(FeedingBaxterEnv, self).__init__(robot_type='baxter', human_control=False)
+    def __init__(self, **kwargs):
+        super(FeedingBaxterEnv, self).__init__(robot_type='baxter', human_control=False, **kwargs)
 
 class FeedingSawyerEnv(FeedingEnv):
-    def __init__(self):
-        super(FeedingSawyerEnv, self).__init__(robot_type='sawyer', human_control=False)
+    def __init__(self, **kwargs):
+        super(FeedingSawyerEnv, self).__init__(robot_type='sawyer', human_control=False, **kwargs)
 
 class FeedingJacoEnv(FeedingEnv):
-    def __init__(self):
-        super(FeedingJacoEnv, self).__init__(robot_type='jaco', human_control=False)
+    def __init__(self, **kwargs):
+        super(FeedingJacoEnv, self).__init__(robot_type='jaco', human_control=False, **kwargs)
 
 class FeedingPandaEnv(FeedingEnv):
-    def __init__(self):
-        super(FeedingPandaEnv, self).__init__(robot_type='panda', human_control=False)
+    def __init__(self, **kwargs):
+        super(FeedingPandaEnv, self).__init__(robot_type='panda', human_control=False, **kwargs)
 
 class FeedingPR2HumanEnv(FeedingEnv):
-    def __init__(self):
-        super(FeedingPR2HumanEnv, self).__init__(robot_type='pr2', human_control=True)
+    def __init__(self, **kwargs):
+        super(FeedingPR2HumanEnv, self).__init__(robot_type='pr2', human_control=True, **kwargs)
 
 class FeedingBaxterHumanEnv(FeedingEnv):
-    def __init__(self):
-        super(FeedingBaxterHumanEnv, self).__init__(robot_type='baxter', human_control=True)
+    def __init__(self, **kwargs):
+        super(FeedingBaxterHumanEnv, self).__init__(robot_type='baxter', human_control=True, **kwargs)
 
 class FeedingSawyerHumanEnv(FeedingEnv):
-    def __init__(self):
-        super(FeedingSawyerHumanEnv, self).__init__(robot_type='sawyer', human_control=True)
+    def __init__(self, **kwargs):
+        super(FeedingSawyerHumanEnv, self).__init__(robot_type='sawyer', human_control=True, **kwargs)
 
 class FeedingJacoHumanEnv(FeedingEnv):
-    def __init__(self):
-        super(FeedingJacoHumanEnv, self).__init__(robot_type='jaco', human_control=True)
+    def __init__(self, **kwargs):
+        super(FeedingJacoHumanEnv, self).__init__(robot_type='jaco', human_control=True, **kwargs)
 
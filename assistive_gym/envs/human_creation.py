@@ -54,10 +54,58 @@ class HumanCreation:
         self.elbow_radius = 0.0
         self.shoulder_radius = 0.0
         self.id = pid
+        self.templates = {}
+
+    def clear_cache(self):
+        # Shape indices are only valid until the next resetSimulation
+        self.templates = {}
 
     def create_human(self, static=True, limit_scale=1.0, specular_color=[0.1, 0.1, 0.1], gender='random', config=None):
         if gender not in ['male', 'female']:
             gender = self.np_random.choice(['male', 'female'])
+        c = lambda tag: config(tag, 'human_%s' % gender)
+        # The collision and visual shapes (including the head meshes) are created once and shared by every human with the same body dimensions
+        key = (gender, c('mass'), c('radius_scale'), c('height_scale'), self.cloth, tuple(specular_color))
+        if key not in self.templates:
+            self.templates[key] = self.create_template(gender, c('mass'), c('radius_scale'), c('height_scale'), specular_color)
+        template = self.templates[key]
+        self.hand_radius, self.elbow_radius, self.shoulder_radius = template['radii']
+
+        # Joint limits of the head, torso and arms (first 24 joints) are scaled by the impairment
+        linkLowerLimits = np.array(template['linkLowerLimits'])
+        linkUpperLimits = np.array(template['linkUpperLimits'])
+        linkLowerLimits[:24] *= limit_scale
+        linkUpperLimits[:24] *= limit_scale
+
+        m = template['mass']
+        human = p.createMultiBody(baseMass=0 if static else m*0.1, baseCollisionShapeIndex=template['base_c'], baseVisualShapeIndex=template['base_v'], basePosition=template['base_p'], baseOrientation=[0, 0, 0, 1], linkMasses=template['linkMasses'], linkCollisionShapeIndices=template['linkCollisionShapeIndices'], linkVisualShapeIndices=template['linkVisualShapeIndices'], linkPositions=template['linkPositions'], linkOrientations=template['linkOrientations'], linkInertialFramePositions=template['linkInertialFramePositions'], linkInertialFrameOrientations=template['linkInertialFrameOrientations'], linkParentIndices=template['linkParentIndices'], linkJointTypes=template['linkJointTypes'], linkJointAxis=template['linkJointAxis'], linkLowerLimits=linkLowerLimits, linkUpperLimits=linkUpperLimits, useMaximalCoordinates=False, flags=p.URDF_USE_SELF_COLLISION, physicsClientId=self.id)
+
+        num_joints = p.getNumJoints(human, physicsClientId=self.id)
+        if template['collision_filter'] is None:
+            # pybullet may order the links of the body differently from the lists above, so shapes are looked up on the created body
+            has_shape = [len(p.getCollisionShapeData(human, j, physicsClientId=self.id)) > 0 for j in range(-1, num_joints)]
+            enabled = template['enabled']
+            # Links without a collision shape never produce contacts, so filters are only needed between links that have one
+            template['collision_filter'] = [(i, j, int(enabled[i+1, j+1])) for i in range(-1, num_joints) for j in range(i+1, num_joints) if has_shape[i+1] and has_shape[j+1]]
+
+        # Self collision has been enabled for the person
+        # For stability: Remove all collisions except between the arms/legs and the other body parts
+        for i, j, enable in template['collision_filter']:
+            p.setCollisionFilterPair(human, human, i, j, enable, physicsClientId=self.id)
+
+        # Enforce joint limits, read back from the body since its joint order can differ from the lists above
+        joint_infos = [p.getJointInfo(human, j, physicsClientId=self.id) for j in range(num_joints)]
+        lower_limits = np.array([info[8] for info in joint_infos])
+        upper_limits = np.array([info[9] for info in joint_infos])
+        human_joint_positions = np.array([x[0] for x in p.getJointStates(human, jointIndices=list(range(num_joints)), physicsClientId=self.id)])
+        for j in np.where(human_joint_positions < lower_limits)[0]:
+            p.resetJointState(human, jointIndex=j, targetValue=lower_limits[j], targetVelocity=0, physicsClientId=self.id)
+        for j in np.where(human_joint_positions > upper_limits)[0]:
+            p.resetJointState(human, jointIndex=j, targetValue=upper_limits[j], targetVelocity=0, physicsClientId=self.id)
+
+        return human
+
+    def create_template(self, gender, m, rs, hs, specular_color):
         def create_body(shape=p.GEOM_CAPSULE, radius=0, length=0, position_offset=[0, 0, 0], orientation=[0, 0, 0, 1]):
             visual_shape = p.createVisualShape(shape, radius=radius, length=length, rgbaColor=[0.8, 0.6, 0.4, 1], specularColor=specular_color, visualFramePosition=position_offset, visualFrameOrientation=orientation, physicsClientId=self.id)
             collision_shape = p.createCollisionShape(shape, radius=radius, height=length, collisionFramePosition=position_offset, collisionFrameOrientation=orientation, physicsClientId=self.id)
@@ -65,10 +113,6 @@ class HumanCreation:
 
         joint_c, joint_v = -1, -1
         if gender == 'male':
-            c = lambda tag: config(tag, 'human_male')
-            m = c('mass') # mass of 50% male in kg
-            rs = c('radius_scale')
-            hs = c('height_scale')
             chest_c, chest_v = create_body(shape=p.GEOM_CAPSULE, radius=0.127*rs, length=0.056, orientation=p.getQuaternionFromEuler([0, np.pi/2.0, 0], physicsClientId=self.id))
             right_shoulders_c, right_shoulders_v = create_body(shape=p.GEOM_CAPSULE, radius=0.106*rs, length=0.253/8, position_offset=[-0.253/2.5 + 0.253/16, 0, 0], orientation=p.getQuaternionFromEuler([0, np.pi/2.0, 0], physicsClientId=self.id))
             left_shoulders_c, left_shoulders_v = create_body(shape=p.GEOM_CAPSULE, radius=0.106*rs, length=0.253/8, position_offset=[0.253/2.5 - 0.253/16, 0, 0], orientation=p.getQuaternionFromEuler([0, np.pi/2.0, 0], physicsClientId=self.id))
@@ -76,7 +120,7 @@ class HumanCreation:
             upperarm_c, upperarm_v = create_body(shape=p.GEOM_CAPSULE, radius=0.043*rs, length=0.279*hs, position_offset=[0, 0, -0.279/2.0*hs])
             forearm_c, forearm_v = create_body(shape=p.GEOM_CAPSULE, radius=0.033*rs, length=0.257*hs, position_offset=[0, 0, -0.257/2.0*hs])
             hand_c, hand_v = create_body(shape=p.GEOM_SPHERE, radius=0.043*rs, length=0, position_offset=[0, 0, -0.043*rs])
-            self.hand_radius, self.elbow_radius, self.shoulder_radius = 0.043*rs, 0.043*rs, 0.043*rs
+            radii = (0.043*rs, 0.043*rs, 0.043*rs)
             waist_c, waist_v = create_body(shape=p.GEOM_CAPSULE, radius=0.1205*rs, length=0.049, orientation=p.getQuaternionFromEuler([0, np.pi/2.0, 0], physicsClientId=self.id))
             hips_c, hips_v = create_body(shape=p.GEOM_CAPSULE, radius=0.1335*rs, length=0.094, position_offset=[0, 0, -0.08125*hs], orientation=p.getQuaternionFromEuler([0, np.pi/2.0, 0], physicsClientId=self.id))
             thigh_c, thigh_v = create_body(shape=p.GEOM_CAPSULE, radius=0.08*rs, length=0.424*hs, position_offset=[0, 0, -0.424/2.0*hs])
@@ -111,10 +155,6 @@ class HumanCreation:
             shin_p = [0, 0, -0.424*hs]
             foot_p = [0, 0, -0.403*hs - 0.025]
         else:
-            c = lambda tag: config(tag, 'human_female')
-            m = c('mass') # mass of 50% female in kg
-            rs = c('radius_scale')
-            hs = c('height_scale')
             chest_c, chest_v = create_body(shape=p.GEOM_CAPSULE, radius=0.127*rs, length=0.01, orientation=p.getQuaternionFromEuler([0, np.pi/2.0, 0], physicsClientId=self.id)) #
             right_shoulders_c, right_shoulders_v = create_body(shape=p.GEOM_CAPSULE, radius=0.092*rs, length=0.225/8, position_offset=[-0.225/2.5 + 0.225/16, 0, 0], orientation=p.getQuaternionFromEuler([0, np.pi/2.0, 0], physicsClientId=self.id))
             left_shoulders_c, left_shoulders_v = create_body(shape=p.GEOM_CAPSULE, radius=0.092*rs, length=0.225/8, position_offset=[0.225/2.5 - 0.225/16, 0, 0], orientation=p.getQuaternionFromEuler([0, np.pi/2.0, 0], physicsClientId=self.id))
@@ -122,7 +162,7 @@ class HumanCreation:
             upperarm_c, upperarm_v = create_body(shape=p.GEOM_CAPSULE, radius=0.0355*rs, length=0.264*hs, position_offset=[0, 0, -0.264/2.0*hs])
             forearm_c, forearm_v = create_body(shape=p.GEOM_CAPSULE, radius=0.027*rs, length=0.234*hs, position_offset=[0, 0, -0.234/2.0*hs])
             hand_c, hand_v = create_body(shape=p.GEOM_SPHERE, radius=0.0355*rs, length=0, position_offset=[0, 0, -0.0355*rs])
-            self.hand_radius, self.elbow_radius, self.shoulder_radius = 0.0355*rs, 0.0355*rs, 0.0355*rs
+            radii = (0.0355*rs, 0.0355*rs, 0.0355*rs)
             waist_c, waist_v = create_body(shape=p.GEOM_CAPSULE, radius=0.11*rs, length=0.009, orientation=p.getQuaternionFromEuler([0, np.pi/2.0, 0], physicsClientId=self.id))
             hips_c, hips_v = create_body(shape=p.GEOM_CAPSULE, radius=0.127*rs, length=0.117, position_offset=[0, 0, -0.15/2*hs], orientation=p.getQuaternionFromEuler([0, np.pi/2.0, 0], physicsClientId=self.id))
             thigh_c, thigh_v = create_body(shape=p.GEOM_CAPSULE, radius=0.0775*rs, length=0.391*hs, position_offset=[0, 0, -0.391/2.0*hs])
@@ -181,8 +221,8 @@ class HumanCreation:
         linkParentIndices.extend([0, 1, 2, 0, 4, 5, 0, 7, 8, 9])
         linkJointTypes.extend([p.JOINT_REVOLUTE]*10)
         linkJointAxis.extend([[1, 0, 0], [0, 1, 0], [0, 0, 1], [1, 0, 0], [0, 1, 0], [0, 0, 1], [1, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]])
-        linkLowerLimits.extend(np.array([np.deg2rad(-10), np.deg2rad(-10), np.deg2rad(-35), np.deg2rad(-10), np.deg2rad(-30), np.deg2rad(-35), np.deg2rad(-10), np.deg2rad(-50), np.deg2rad(-34), np.deg2rad(-70)])*limit_scale)
-        linkUpperLimits.extend(np.array([np.deg2rad(10), np.deg2rad(30), np.deg2rad(35), np.deg2rad(10), np.deg2rad(10), np.deg2rad(35), np.deg2rad(20), np.deg2rad(50), np.deg2rad(34), np.deg2rad(70)])*limit_scale)
+        linkLowerLimits.extend(np.array([np.deg2rad(-10), np.deg2rad(-10), np.deg2rad(-35), np.deg2rad(-10), np.deg2rad(-30), np.deg2rad(-35), np.deg2rad(-10), np.deg2rad(-50), np.deg2rad(-34), np.deg2rad(-70)]))
+        linkUpperLimits.extend(np.array([np.deg2rad(10), np.deg2rad(30), np.deg2rad(35), np.deg2rad(10), np.deg2rad(10), np.deg2rad(35), np.deg2rad(20), np.deg2rad(50), np.deg2rad(34), np.deg2rad(70)]))
 
         # NOTE: Right arm
         linkMasses.extend(m*np.array([0, 0, 0.033, 0, 0.019, 0, 0.0065]))
@@ -199,8 +239,8 @@ class HumanCreation:
         linkParentIndices.extend([3, 11, 12, 13, 14, 15, 16])
         linkJointTypes.extend([p.JOINT_REVOLUTE]*7)
         linkJointAxis.extend([[0, 1, 0], [1, 0, 0], [0, 0, 1], [1, 0, 0], [0, 0, 1], [1, 0, 0], [0, 1, 0]])
-        linkLowerLimits.extend(np.array([np.deg2rad(5), np.deg2rad(-188), np.deg2rad(-90), np.deg2rad(-128), np.deg2rad(-90), np.deg2rad(-81), np.deg2rad(-27)])*limit_scale)
-        linkUpperLimits.extend(np.array([np.deg2rad(198), np.deg2rad(61), np.deg2rad(90), np.deg2rad(0), np.deg2rad(90), np.deg2rad(90), np.deg2rad(47)])*limit_scale)
+        linkLowerLimits.extend(np.array([np.deg2rad(5), np.deg2rad(-188), np.deg2rad(-90), np.deg2rad(-128), np.deg2rad(-90), np.deg2rad(-81), np.deg2rad(-27)]))
+        linkUpperLimits.extend(np.array([np.deg2rad(198), np.deg2rad(61), np.deg2rad(90), np.deg2rad(0), np.deg2rad(90), np.deg2rad(90), np.deg2rad(47)]))
 
         # NOTE: Left arm
         linkMasses.extend(m*np.array([0, 0, 0.033, 0, 0.019, 0, 0.0065]))
@@ -217,8 +257,8 @@ class HumanCreation:
         linkParentIndices.extend([6, 18, 19, 20, 21, 22, 23])
         linkJointTypes.extend([p.JOINT_REVOLUTE]*7)
         linkJointAxis.extend([[0, 1, 0], [1, 0, 0], [0, 0, 1], [1, 0, 0], [0, 0, 1], [1, 0, 0], [0, 1, 0]])
-        linkLowerLimits.extend(np.array([np.deg2rad(-198), np.deg2rad(-188), np.deg2rad(-90), np.deg2rad(-128), np.deg2rad(-90), np.deg2rad(-81), np.deg2rad(-47)])*limit_scale)
-        linkUpperLimits.extend(np.array([np.deg2rad(-5), np.deg2rad(61), np.deg2rad(90), np.deg2rad(0), np.deg2rad(90), np.deg2rad(90), np.deg2rad(27)])*limit_scale)
+        linkLowerLimits.extend(np.array([np.deg2rad(-198), np.deg2rad(-188), np.deg2rad(-90), np.deg2rad(-128), np.deg2rad(-90), np.deg2rad(-81), np.deg2rad(-47)]))
+        linkUpperLimits.extend(np.array([np.deg2rad(-5), np.deg2rad(61), np.deg2rad(90), np.deg2rad(0), np.deg2rad(90), np.deg2rad(90), np.deg2rad(27)]))
 
         # NOTE: Waist and hips
         linkMasses.extend(m*np.array([0, 0, 0.13, 0.14]))
@@ -262,41 +302,12 @@ class HumanCreation:
         linkLowerLimits.extend(np.array([np.deg2rad(-127), np.deg2rad(-45), np.deg2rad(-40), 0, np.deg2rad(-35), np.deg2rad(-24), np.deg2rad(-35)]))
         linkUpperLimits.extend(np.array([np.deg2rad(30), np.deg2rad(40), np.deg2rad(45), np.deg2rad(130), np.deg2rad(38), np.deg2rad(23), np.deg2rad(43)]))
 
-        human = p.createMultiBody(baseMass=0 if static else m*0.1, baseCollisionShapeIndex=chest_c, baseVisualShapeIndex=chest_v, basePosition=chest_p, baseOrientation=[0, 0, 0, 1], linkMasses=linkMasses, linkCollisionShapeIndices=linkCollisionShapeIndices, linkVisualShapeIndices=linkVisualShapeIndices, linkPositions=linkPositions, linkOrientations=linkOrientations, linkInertialFramePositions=linkInertialFramePositions, linkInertialFrameOrientations=linkInertialFrameOrientations, linkParentIndices=linkParentIndices, linkJointTypes=linkJointTypes, linkJointAxis=linkJointAxis, linkLowerLimits=linkLowerLimits, linkUpperLimits=linkUpperLimits, useMaximalCoordinates=False, flags=p.URDF_USE_SELF_COLLISION, physicsClientId=self.id)
-
-        # Self collision has been enabled for the person
-        # For stability: Remove all collisions except between the arms/legs and the other body parts
-        num_joints = p.getNumJoints(human, physicsClientId=self.id)
-        for i in range(-1, num_joints):
-            for j in range(-1, num_joints):
-                p.setCollisionFilterPair(human, human, i, j, 0, physicsClientId=self.id)
-        for i in range(3, 10): # Right arm
-            for j in [-1] + list(range(10, num_joints)):
-                p.setCollisionFilterPair(human, human, i, j, 1, physicsClientId=self.id)
-        for i in range(13, 20): # Left arm
-            for j in list(range(-1, 10)) + list(range(20, num_joints)):
-                p.setCollisionFilterPair(human, human, i, j, 1, physicsClientId=self.id)
-        for i in range(28, 35): # Right leg
-            for j in list(range(-1, 24)) + list(range(35, num_joints)):
-                p.setCollisionFilterPair(human, human, i, j, 1, physicsClientId=self.id)
-        for i in range(35, num_joints): # Left leg
-            for j in list(range(-1, 24)) + list(range(28, 35)):
-                p.setCollisionFilterPair(human, human, i, j, 1, physicsClientId=self.id)
-
-        # Enforce joint limits
-        human_joint_states = p.getJointStates(human, jointIndices=list(range(p.getNumJoints(human, physicsClientId=self.id))), physicsClientId=self.id)
-        human_joint_positions = np.array([x[0] for x in human_joint_states])
-        for j in range(p.getNumJoints(human, physicsClientId=self.id)):
-            joint_info = p.getJointInfo(human, j, physicsClientId=self.id)
-            joint_name = joint_info[1]
-            joint_pos = human_joint_positions[j]
-            lower_limit = joint_info[8]
-            upper_limit = joint_info[9]
-            # print(joint_name, joint_pos, lower_limit, upper_limit)
-            if joint_pos < lower_limit:
-                p.resetJointState(human, jointIndex=j, targetValue=lower_limit, targetVelocity=0, physicsClientId=self.id)
-            elif joint_pos > upper_limit:
-                p.resetJointState(human, jointIndex=j, targetValue=upper_limit, targetVelocity=0, physicsClientId=self.id)
-
-        return human
+        # Self collision pairs that stay enabled, by pybullet link index as in the original loops: the arms and legs against the other body parts
+        num_joints = len(linkCollisionShapeIndices)
+        enabled = np.zeros((num_joints+1, num_joints+1), dtype=bool)
+        for links, others in [(range(3, 10), [-1] + list(range(10, num_joints))), (range(13, 20), list(range(-1, 10)) + list(range(20, num_joints))), (range(28, 35), list(range(-1, 24)) + list(range(35, num_joints))), (range(35, num_joints), list(range(-1, 24)) + list(range(28, 35)))]:
+            for i in links:
+                enabled[i+1, np.array(others)+1] = True
+        enabled |= enabled.T
 
+        return {'mass': m, 'radii': radii, 'base_c': chest_c, 'base_v': chest_v, 'base_p': chest_p, 'linkMasses': linkMasses, 'linkCollisionShapeIndices': linkCollisionShapeIndices, 'linkVisualShapeIndices': linkVisualShapeIndices, 'linkPositions': linkPositions, 'linkOrientations': linkOrientations, 'linkInertialFramePositions': linkInertialFramePositions, 'linkInertialFrameOrientations': linkInertialFrameOrientations, 'linkParentIndices': linkParentIndices, 'linkJointTypes': linkJointTypes, 'linkJointAxis': linkJointAxis, 'linkLowerLimits': linkLowerLimits, 'linkUpperLimits': linkUpperLimits, 'enabled': enabled, 'collision_filter': None}
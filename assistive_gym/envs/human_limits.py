@@ -0,0 +1,127 @@
+import os
+import numpy as np
+
+# Bounds of the (tz2, tx2, ty2, qe2) arm angles fed into the realistic arm limits classifier.
+# tz2, tx2 and qe2 are wrapped into [0, 2pi), ty2 is the shoulder rotation in [-pi, pi].
+LIMITS_LOWER = np.array([0, 0, -np.pi, 0])
+LIMITS_UPPER = np.array([2*np.pi, 2*np.pi, np.pi, 2*np.pi])
+LIMITS_PERIODIC = np.array([True, True, False, True])
+
+# Loaded models and oracles are shared by every env in the process
+_models = {}
+_oracles = {}
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'tanh': np.tanh,
+    'sigmoid': lambda x: 1.0 / (1.0 + np.exp(-x)),
+    'softmax': lambda x: np.exp(x - np.max(x, axis=-1, keepdims=True)) / np.sum(np.exp(x - np.max(x, axis=-1, keepdims=True)), axis=-1, keepdims=True),
+}
+
+class KerasLimitsOracle:
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, x):
+        return np.array(self.model.predict_classes(np.array(x))).flatten()
+
+class NumpyLimitsOracle:
+    def __init__(self, layers):
+        # List of (weights, biases, activation) tuples, one per dense layer
+        self.layers = layers
+
+    @classmethod
+    def from_keras_model(cls, model):
+        layers = []
+        for layer in model.layers:
+            layer_type = layer.__class__.__name__
+            if layer_type == 'Dense':
+                weights, biases = layer.get_weights()
+                layers.append((weights, biases, layer.get_config()['activation']))
+            elif layer_type == 'Activation':
+                layers.append((None, None, layer.get_config()['activation']))
+            elif layer_type != 'Dropout':
+                raise ValueError('Unsupported layer type in the human limits model: %s' % layer_type)
+        return cls(layers)
+
+    @classmethod
+    def load(cls, filename):
+        data = np.load(filename)
+        layers = []
+        for i in range(int(data['num_layers'])):
+            if 'weights_%d' % i in data.files:
+                layers.append((data['weights_%d' % i], data['biases_%d' % i], str(data['activation_%d' % i])))
+            else:
+                layers.append((None, None, str(data['activation_%d' % i])))
+        return cls(layers)
+
+    def save(self, filename):
+        arrays = {'num_layers': len(self.layers)}
+        for i, (weights, biases, activation) in enumerate(self.layers):
+            if weights is not None:
+                arrays['weights_%d' % i] = weights
+                arrays['biases_%d' % i] = biases
+            arrays['activation_%d' % i] = activation
+        np.savez(filename, **arrays)
+
+    def predict_proba(self, x):
+        x = np.array(x, dtype=np.float64)
+        for weights, biases, activation in self.layers:
+            if weights is not None:
+                x = np.dot(x, weights) + biases
+            x = ACTIVATIONS[activation](x)
+        return x
+
+    def predict(self, x):
+        # Same decision rule as keras Sequential.predict_classes
+        proba = self.predict_proba(x)
+        if proba.shape[-1] > 1:
+            return np.argmax(proba, axis=-1)
+        return (proba > 0.5).astype(np.int32).flatten()
+
+class GridLimitsOracle:
+    def __init__(self, oracle, resolution=32, batch_size=65536):
+        # Precompute the classifier at the center of every cell of a dense 4D grid
+        self.resolution = resolution
+        self.step = (LIMITS_UPPER - LIMITS_LOWER) / resolution
+        centers = [LIMITS_LOWER[i] + (np.arange(resolution) + 0.5) * self.step[i] for i in range(4)]
+        points = np.stack(np.meshgrid(*centers, indexing='ij'), axis=-1).reshape(-1, 4)
+        self.grid = np.concatenate([oracle.predict(points[i:i+batch_size]) for i in range(0, len(points), batch_size)]).astype(np.uint8).reshape([resolution]*4)
+
+    def predict(self, x):
+        cells = np.floor((np.array(x, dtype=np.float64) - LIMITS_LOWER) / self.step).astype(np.int64)
+        cells = np.where(LIMITS_PERIODIC, cells % self.resolution, np.clip(cells, 0, self.resolution - 1))
+        return self.grid[cells[:, 0], cells[:, 1], cells[:, 2], cells[:, 3]].astype(np.int32)
+
+def load_limits_model(filename):
+    if filename not in _models:
+        # Import keras (and TensorFlow) only once an env actually needs the model
+        from keras.models import load_model
+        _models[filename] = load_model(filename)
+    return _models[filename]
+
+def load_limits_oracle(oracle_type, filename):
+    if (oracle_type, filename) not in _oracles:
+        if oracle_type == 'keras':
+            oracle = KerasLimitsOracle(load_limits_model(filename))
+        elif oracle_type == 'numpy':
+            # Weights exported with NumpyLimitsOracle.save next to the model avoid importing keras at all
+            weights_filename = os.path.splitext(filename)[0] + '.npz'
+            if os.path.isfile(weights_filename):
+                oracle = NumpyLimitsOracle.load(weights_filename)
+            else:
+                oracle = NumpyLimitsOracle.from_keras_model(load_limits_model(filename))
+        elif oracle_type == 'grid':
+            oracle = GridLimitsOracle(load_limits_oracle('numpy', filename))
+        else:
+            raise ValueError('Unknown human limits oracle: %s' % oracle_type)
+        _oracles[(oracle_type, filename)] = oracle
+    return _oracles[(oracle_type, filename)]
+
+def agreement(oracle, reference, num_samples=100000, seed=0):
+    '''
+    Fraction of uniformly sampled arm poses for which both oracles return the same class.
+    '''
+    x = np.random.RandomState(seed).uniform(LIMITS_LOWER, LIMITS_UPPER, size=(num_samples, 4))
+    return np.mean(oracle.predict(x) == reference.predict(x))
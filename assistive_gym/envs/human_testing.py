@@ -7,8 +7,8 @@ import pybullet as p
 from .env import AssistiveEnv
 
 class HumanTestingEnv(AssistiveEnv):
-    def __init__(self):
-        super(HumanTestingEnv, self).__init__(robot_type=None, task='testing', human_control=False, frame_skip=5, time_step=0.02)
+    def __init__(self, **kwargs):
+        super(HumanTestingEnv, self).__init__(robot_type=None, task='testing', human_control=False, frame_skip=5, time_step=0.02, **kwargs)
 
     def step(self, action):
         yaw = 0
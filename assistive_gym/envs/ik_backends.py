@@ -0,0 +1,174 @@
+import xml.etree.ElementTree as ET
+import numpy as np
+import pybullet as p
+
+class PyBulletIK:
+    def __init__(self, pid):
+        self.id = pid
+
+    def solve(self, body, target_joint, target_pos, target_orient, lower_limits, upper_limits, joint_ranges, rest_poses, max_iterations=1000, current_positions=None, np_random=None):
+        # Positions of all non-fixed joints of the body, in joint index order (same as calculateInverseKinematics)
+        ik_kwargs = dict(lowerLimits=lower_limits, upperLimits=upper_limits, jointRanges=joint_ranges, restPoses=rest_poses, maxNumIterations=max_iterations, physicsClientId=self.id)
+        if target_orient is not None:
+            ik_kwargs['targetOrientation'] = target_orient
+        if current_positions is not None:
+            ik_kwargs['currentPositions'] = current_positions
+        return np.array(p.calculateInverseKinematics(body, target_joint, targetPosition=target_pos, **ik_kwargs))
+
+def origin_transform(element):
+    # 4x4 transform of an URDF <origin xyz="" rpy=""/> element (identity when missing)
+    T = np.eye(4)
+    if element is None:
+        return T
+    xyz = [float(x) for x in element.get('xyz', '0 0 0').split()]
+    roll, pitch, yaw = [float(x) for x in element.get('rpy', '0 0 0').split()]
+    Rx = np.array([[1, 0, 0], [0, np.cos(roll), -np.sin(roll)], [0, np.sin(roll), np.cos(roll)]])
+    Ry = np.array([[np.cos(pitch), 0, np.sin(pitch)], [0, 1, 0], [-np.sin(pitch), 0, np.cos(pitch)]])
+    Rz = np.array([[np.cos(yaw), -np.sin(yaw), 0], [np.sin(yaw), np.cos(yaw), 0], [0, 0, 1]])
+    T[:3, :3] = Rz.dot(Ry).dot(Rx)
+    T[:3, 3] = xyz
+    return T
+
+def pose_transform(pos, orient, pid):
+    T = np.eye(4)
+    T[:3, :3] = np.array(p.getMatrixFromQuaternion(orient, physicsClientId=pid)).reshape(3, 3)
+    T[:3, 3] = pos
+    return T
+
+class KinematicChain:
+    def __init__(self, filename, link_name):
+        # Chain of joints from the root link of the URDF down to the given link
+        root = ET.parse(filename).getroot()
+        joints = {}
+        for joint in root.findall('joint'):
+            axis = joint.find('axis')
+            joints[joint.find('child').get('link')] = {'name': joint.get('name'), 'type': joint.get('type'), 'parent': joint.find('parent').get('link'), 'origin': origin_transform(joint.find('origin')), 'axis': self.unit(axis.get('xyz') if axis is not None else '1 0 0')}
+        inertial_origins = {}
+        for link in root.findall('link'):
+            inertial = link.find('inertial')
+            inertial_origins[link.get('name')] = origin_transform(None if inertial is None else inertial.find('origin'))
+        chain = []
+        link = link_name
+        while link in joints:
+            chain.append(joints[link])
+            link = joints[link]['parent']
+        self.joints = list(reversed(chain))
+        # pybullet reports the base pose at its center of mass (inertial frame), and IK and getLinkState work on the center of mass of the target link too
+        self.root_inertial = inertial_origins.get(link, np.eye(4))
+        self.tip_inertial = inertial_origins.get(link_name, np.eye(4))
+
+    def unit(self, xyz):
+        axis = np.array([float(x) for x in xyz.split()])
+        return axis / np.linalg.norm(axis)
+
+    def forward(self, q):
+        # q: (S, len(self.joints)) joint values, ignored for fixed joints. Returns the tip center of mass transforms (S, 4, 4), joint positions and axes in the root frame (S, J, 3).
+        S = len(q)
+        T = np.tile(np.eye(4), (S, 1, 1))
+        positions = np.zeros((S, len(self.joints), 3))
+        axes = np.zeros((S, len(self.joints), 3))
+        for j, joint in enumerate(self.joints):
+            T = np.matmul(T, joint['origin'])
+            axes[:, j] = np.matmul(T[:, :3, :3], joint['axis'])
+            positions[:, j] = T[:, :3, 3]
+            if joint['type'] in ['revolute', 'continuous']:
+                # Rodrigues rotation about the joint axis
+                k = joint['axis']
+                K = np.array([[0, -k[2], k[1]], [k[2], 0, -k[0]], [-k[1], k[0], 0]])
+                angle = q[:, j][:, None, None]
+                R = np.eye(4)[None].repeat(S, axis=0)
+                R[:, :3, :3] = np.eye(3) + np.sin(angle)*K + (1 - np.cos(angle))*K.dot(K)
+                T = np.matmul(T, R)
+            elif joint['type'] == 'prismatic':
+                offset = np.eye(4)[None].repeat(S, axis=0)
+                offset[:, :3, 3] = q[:, j][:, None] * joint['axis']
+                T = np.matmul(T, offset)
+        return np.matmul(T, self.tip_inertial), positions, axes
+
+class NumpyDLSIK:
+    def __init__(self, pid, urdf_paths, num_seeds=32, damping=0.05, tolerance=1e-4, min_converged=1):
+        # Damped least squares on the kinematic chain parsed from the URDF, run for many seeds at once without touching the physics client.
+        # Falls back to pybullet for bodies whose URDF is unknown.
+        self.id = pid
+        self.urdf_paths = urdf_paths
+        self.num_seeds = num_seeds
+        self.damping = damping
+        self.tolerance = tolerance
+        # Stop iterating once this many seeds have reached the target
+        self.min_converged = min_converged
+        self.chains = {}
+        self.fallback = PyBulletIK(pid)
+
+    def chain(self, body, target_joint):
+        filename = self.urdf_paths.get(body)
+        if filename is None:
+            return None
+        key = (filename, target_joint)
+        if key not in self.chains:
+            chain = KinematicChain(filename, p.getJointInfo(body, target_joint, physicsClientId=self.id)[12].decode('utf-8'))
+            # Index of every chain joint in the list of non-fixed joints (the IK solution vector)
+            movable = [p.getJointInfo(body, j, physicsClientId=self.id)[1].decode('utf-8') for j in range(p.getNumJoints(body, physicsClientId=self.id)) if p.getJointInfo(body, j, physicsClientId=self.id)[2] != p.JOINT_FIXED]
+            chain.indices = np.array([movable.index(joint['name']) if joint['type'] != 'fixed' else -1 for joint in chain.joints])
+            chain.num_movable = len(movable)
+            self.chains[key] = chain
+        return self.chains[key]
+
+    def solve(self, body, target_joint, target_pos, target_orient, lower_limits, upper_limits, joint_ranges, rest_poses, max_iterations=1000, current_positions=None, np_random=None):
+        chain = self.chain(body, target_joint)
+        if chain is None:
+            return self.fallback.solve(body, target_joint, target_pos, target_orient, lower_limits, upper_limits, joint_ranges, rest_poses, max_iterations, current_positions)
+        movable = chain.indices >= 0
+        indices = chain.indices[movable]
+        lower = np.array(lower_limits)[indices]
+        upper = np.array(upper_limits)[indices]
+
+        # Solve in the root link frame of the robot
+        base_pos, base_orient = p.getBasePositionAndOrientation(body, physicsClientId=self.id)
+        world_to_root = np.linalg.inv(pose_transform(base_pos, base_orient, self.id).dot(np.linalg.inv(chain.root_inertial)))
+        target = world_to_root.dot(np.append(target_pos, 1))[:3]
+        target_R = None if target_orient is None else world_to_root[:3, :3].dot(pose_transform([0, 0, 0], target_orient, self.id)[:3, :3])
+
+        # Seeds: the rest pose, the current joint positions and uniformly random configurations within the joint limits
+        if current_positions is None:
+            current_positions = [x[0] for x in p.getJointStates(body, jointIndices=[j for j in range(p.getNumJoints(body, physicsClientId=self.id)) if p.getJointInfo(body, j, physicsClientId=self.id)[2] != p.JOINT_FIXED], physicsClientId=self.id)]
+        current_positions = np.array(current_positions, dtype=np.float64)
+        seeds = [np.array(rest_poses)[indices], current_positions[indices]]
+        seeds.extend((np.random if np_random is None else np_random).uniform(lower, upper, size=(max(self.num_seeds - 2, 0), len(indices))))
+        q_movable = np.clip(np.array(seeds), lower, upper)
+        q = np.zeros((len(q_movable), len(chain.joints)))
+
+        dims = 3 if target_R is None else 6
+        damping = np.eye(dims) * self.damping**2
+        converged = np.zeros(len(q_movable), dtype=bool)
+        for _ in range(max_iterations):
+            q[:, movable] = q_movable
+            T, positions, axes = chain.forward(q)
+            error = target - T[:, :3, 3]
+            J = np.cross(axes[:, movable], T[:, None, :3, 3] - positions[:, movable])
+            prismatic = np.array([joint['type'] == 'prismatic' for joint in chain.joints])[movable]
+            J[:, prismatic] = axes[:, movable][:, prismatic]
+            J = J.transpose(0, 2, 1)
+            if target_R is not None:
+                # Orientation error as the sum of cross products of the current and desired frame axes
+                error = np.concatenate([error, 0.5*np.sum(np.cross(T[:, :3, :3].transpose(0, 2, 1), target_R.T), axis=1)], axis=-1)
+                J_angular = np.where(prismatic[None, None, :], 0, axes[:, movable].transpose(0, 2, 1))
+                J = np.concatenate([J, J_angular], axis=1)
+            converged |= np.linalg.norm(error, axis=-1) < self.tolerance
+            if np.sum(converged) >= min(self.min_converged, len(converged)):
+                break
+            # dq = J^T (J J^T + lambda^2 I)^-1 e for every seed that has not converged yet. Converged seeds stay where they are.
+            active = ~converged
+            J, error = J[active], error[active]
+            dq = np.matmul(J.transpose(0, 2, 1), np.linalg.solve(np.matmul(J, J.transpose(0, 2, 1)) + damping, error[..., None]))[..., 0]
+            q_movable[active] = np.clip(q_movable[active] + dq, lower, upper)
+
+        # Keep the seed with the smallest error, preferring the one closest to the rest pose among equally good solutions
+        q[:, movable] = q_movable
+        T, _, _ = chain.forward(q)
+        error = np.linalg.norm(target - T[:, :3, 3], axis=-1)
+        if target_R is not None:
+            error += np.linalg.norm(T[:, :3, :3] - target_R, axis=(1, 2))
+        best = np.lexsort((np.linalg.norm(q_movable - seeds[0], axis=-1), np.round(error / self.tolerance)))[0]
+        solution = current_positions.copy()
+        solution[indices] = q_movable[best]
+        return solution
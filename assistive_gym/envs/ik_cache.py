@@ -0,0 +1,85 @@
+import itertools
+from collections import OrderedDict
+import numpy as np
+
+# Offsets of a grid cell and all of its neighbours
+NEIGHBOURS = list(itertools.product([-1, 0, 1], repeat=3))
+
+class IKCache:
+    def __init__(self, tolerance=0.01, max_entries=1000, max_distance=0.1, max_angle=np.deg2rad(15)):
+        # Targets are discretized into cells of this size. Cached solutions of the nearest target within max_distance (meters)
+        # and max_angle (radians between target orientations) are used as a warm start.
+        self.tolerance = tolerance
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.max_angle = max_angle
+        self.entries = OrderedDict()
+        # Keys grouped by body, link and a coarse position cell of size max_distance, so that nearest lookups only scan neighbouring cells
+        self.regions = {}
+        self.hits = 0
+        self.misses = 0
+
+    def features(self, target_pos, target_orient):
+        return np.concatenate([target_pos, [0, 0, 0, 0] if target_orient is None else target_orient]).astype(np.float64)
+
+    def key(self, body, target_joint, target_pos, target_orient):
+        cell = np.round(self.features(target_pos, target_orient) / self.tolerance).astype(np.int64)
+        return (body, target_joint, tuple(cell))
+
+    def region(self, target_pos):
+        return tuple(np.floor(np.array(target_pos, dtype=np.float64) / self.max_distance).astype(np.int64))
+
+    def nearest(self, body, target_joint, target_pos, target_orient):
+        region = self.region(target_pos)
+        candidates = [k for offset in NEIGHBOURS for k in self.regions.get((body, target_joint, tuple(np.add(region, offset))), ())]
+        if not candidates:
+            return None
+        features = self.features(target_pos, target_orient)
+        cached = np.array([self.entries[k][0] for k in candidates])
+        distances = np.linalg.norm(cached[:, :3] - features[:3], axis=-1)
+        valid = distances <= self.max_distance
+        if target_orient is not None:
+            # Angle between unit quaternions, where q and -q are the same rotation
+            dots = np.abs(np.dot(cached[:, 3:], features[3:]) / np.maximum(np.linalg.norm(cached[:, 3:], axis=-1) * np.linalg.norm(features[3:]), 1e-12))
+            valid &= 2 * np.arccos(np.clip(dots, 0, 1)) <= self.max_angle
+        else:
+            valid &= ~np.any(cached[:, 3:], axis=-1)
+        if not np.any(valid):
+            return None
+        return candidates[int(np.argmin(np.where(valid, distances, np.inf)))]
+
+    def get(self, body, target_joint, target_pos, target_orient):
+        key = self.key(body, target_joint, target_pos, target_orient)
+        if key not in self.entries:
+            # Fall back to the closest target solved for the same body and link
+            key = self.nearest(body, target_joint, target_pos, target_orient)
+        if key is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Mark as most recently used
+        self.entries.move_to_end(key)
+        return self.entries[key][1].copy()
+
+    def put(self, body, target_joint, target_pos, target_orient, joint_positions):
+        key = self.key(body, target_joint, target_pos, target_orient)
+        if key in self.entries:
+            self.unindex(key)
+        self.entries[key] = (self.features(target_pos, target_orient), np.array(joint_positions, dtype=np.float64))
+        self.entries.move_to_end(key)
+        self.regions.setdefault((body, target_joint, self.region(target_pos)), set()).add(key)
+        while len(self.entries) > self.max_entries:
+            # Evict the least recently used solution
+            self.unindex(next(iter(self.entries)))
+            self.entries.popitem(last=False)
+
+    def unindex(self, key):
+        region = (key[0], key[1], self.region(self.entries[key][0][:3]))
+        self.regions[region].discard(key)
+        if not self.regions[region]:
+            del self.regions[region]
+
+    def clear(self):
+        # Body ids change whenever the world is rebuilt from scratch
+        self.entries = OrderedDict()
+        self.regions = {}
@@ -0,0 +1,26 @@
+import numpy as np
+
+def joint_limited_weights(q, lower_limits, upper_limits, phi=0.5, lam=0.05, min_weight=0.001):
+    '''
+    Joint-limited weights of one (n,) or many (..., n) joint configurations. Weights drop towards zero near the joint limits.
+    '''
+    q = np.asarray(q, dtype=np.float64)
+    lower_limits = np.asarray(lower_limits, dtype=np.float64)
+    upper_limits = np.asarray(upper_limits, dtype=np.float64)
+    qr = 0.5*(upper_limits - lower_limits)
+    weights = 1.0 - np.power(phi, (qr - np.abs(qr - q + lower_limits)) / (lam*qr) + 1)
+    return np.maximum(weights, min_weight)
+
+def jlwki(jacobians, weights, order=6):
+    '''
+    Joint-limited-weighted kinematic isotropy (JLWKI) of stacked (..., order, n) Jacobians and (..., n) joint weights.
+    '''
+    jacobians = np.asarray(jacobians, dtype=np.float64)
+    # J W J^T for every configuration, with W = diag(weights)
+    jwj = np.einsum('...ij,...j,...kj->...ik', jacobians, np.asarray(weights, dtype=np.float64), jacobians)
+    det = np.maximum(np.linalg.det(jwj), 0)
+    return np.power(det, 1.0/order) / (np.trace(jwj, axis1=-2, axis2=-1)/order)
+
+def jlwki_scores(jacobians, q, lower_limits, upper_limits, order=6):
+    # Manipulability score of many candidate joint configurations at once
+    return jlwki(jacobians, joint_limited_weights(q, lower_limits, upper_limits), order=order)
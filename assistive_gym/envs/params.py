@@ -0,0 +1,37 @@
+import os, configparser
+from collections import namedtuple
+
+CONFIG_FILENAME = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'config.ini')
+
+# Parsed config files, shared by every env in the process
+_configs = {}
+
+def load_config(filename=CONFIG_FILENAME):
+    '''
+    Parse a config file once into a dictionary of immutable parameter tuples, one per section, with float fields.
+    '''
+    if filename not in _configs:
+        configp = configparser.ConfigParser()
+        configp.read(filename)
+        sections = {}
+        for name in configp.sections():
+            Params = namedtuple(''.join(word.capitalize() for word in name.split('_')) + 'Params', list(configp[name].keys()))
+            sections[name] = Params(**{tag: float(value) for tag, value in configp[name].items()})
+        _configs[filename] = sections
+    return _configs[filename]
+
+def make_params(task, overrides=None, filename=CONFIG_FILENAME):
+    '''
+    Config sections with per-env overrides applied. Overrides map parameters of the task section to new values,
+    or other section names (e.g. human_preferences) to dictionaries of new values.
+    '''
+    sections = dict(load_config(filename))
+    for key, value in (overrides or {}).items():
+        section, values = (key, value) if isinstance(value, dict) else (task, {key: value})
+        if section not in sections:
+            raise ValueError('Unknown config section: %s' % section)
+        for tag in values:
+            if tag not in sections[section]._fields:
+                raise ValueError('Unknown config parameter: %s' % tag)
+        sections[section] = sections[section]._replace(**{tag: float(v) for tag, v in values.items()})
+    return sections
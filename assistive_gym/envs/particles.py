@@ -0,0 +1,121 @@
+import numpy as np
+import pybullet as p
+
+# Far below the floor, out of view of any camera
+PARK_POSITION = [0, 0, -100]
+
+class ParticleSet:
+    def __init__(self, pid, ids, gravity=(0, 0, -9.81)):
+        self.id = pid
+        self.gravity = gravity
+        self.ids = np.array(ids, dtype=np.int64)
+        self.index = {int(body): i for i, body in enumerate(self.ids)}
+        # Particles that are still part of the task (not yet eaten/drunk or spilled)
+        self.active = np.ones(len(self.ids), dtype=bool)
+        # Particles that have touched the person at some point during the episode
+        self.hit_person = np.zeros(len(self.ids), dtype=bool)
+        # Removed particles that have been taken out of the simulation. Other removed particles stay in the scene as colliding bodies.
+        self.parked = np.zeros(len(self.ids), dtype=bool)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def active_indices(self):
+        return np.flatnonzero(self.active)
+
+    # pybullet has no query for the base states of several bodies, and every particle is its own body, so positions and speeds
+    # cost one call per particle. Speeds are only read for the particles that reached the mouth.
+    def positions(self, indices):
+        return np.array([p.getBasePositionAndOrientation(body, physicsClientId=self.id)[0] for body in self.ids[indices]]).reshape(-1, 3)
+
+    def speeds(self, indices):
+        return np.array([np.linalg.norm(p.getBaseVelocity(body, physicsClientId=self.id)[0]) for body in self.ids[indices]])
+
+    def contacts(self, body):
+        # Boolean mask of all particles currently in contact with the given body, from a single contact query
+        mask = np.zeros(len(self.ids), dtype=bool)
+        for c in p.getContactPoints(bodyA=body, physicsClientId=self.id):
+            for other in (c[1], c[2]):
+                i = self.index.get(other)
+                if i is not None:
+                    mask[i] = True
+        return mask
+
+    def remove(self, indices, park_bodies=False):
+        # Stop tracking the particles. Only parked particles leave the simulation.
+        self.active[indices] = False
+        if park_bodies:
+            self.parked[indices] = True
+            for body in self.ids[indices]:
+                park(body, self.id)
+
+    def restore(self):
+        # restoreState brings back positions and velocities, but not the per-body collision filters and gravity set by park/unpark
+        for i, body in enumerate(self.ids):
+            if self.parked[i]:
+                park(body, self.id)
+            else:
+                activate(body, self.gravity, self.id)
+
+def park(body, pid):
+    # Take a particle out of the simulation without deleting it: no collisions, no gravity, no motion
+    p.setCollisionFilterGroupMask(body, -1, 0, 0, physicsClientId=pid)
+    p.resetBasePositionAndOrientation(body, PARK_POSITION, [0, 0, 0, 1], physicsClientId=pid)
+    p.resetBaseVelocity(body, [0, 0, 0], [0, 0, 0], physicsClientId=pid)
+    p.setGravity(0, 0, 0, body=body, physicsClientId=pid)
+    p.changeDynamics(body, -1, activationState=p.ACTIVATION_STATE_SLEEP, physicsClientId=pid)
+
+def unpark(body, pos, gravity, pid):
+    p.resetBasePositionAndOrientation(body, pos, [0, 0, 0, 1], physicsClientId=pid)
+    p.resetBaseVelocity(body, [0, 0, 0], [0, 0, 0], physicsClientId=pid)
+    activate(body, gravity, pid)
+
+def activate(body, gravity, pid):
+    # Default filter of a dynamic body: DefaultFilter group, collides with everything
+    p.setCollisionFilterGroupMask(body, -1, 1, -1, physicsClientId=pid)
+    p.setGravity(*gravity, body=body, physicsClientId=pid)
+    p.changeDynamics(body, -1, activationState=p.ACTIVATION_STATE_WAKE_UP, physicsClientId=pid)
+
+class ParticlePool:
+    def __init__(self, radius, mass, rgba=None):
+        # Particle bodies are created once per world snapshot and reactivated on every later reset
+        self.radius = radius
+        self.mass = mass
+        self.rgba = rgba
+        self.world_creation = None
+        self.generation = None
+        self.ids = []
+
+    def reusable(self, world_creation, count):
+        return world_creation.snapshot and self.world_creation is world_creation and self.generation == world_creation.generation and len(self.ids) == count
+
+    def create(self, pid, positions):
+        collision = p.createCollisionShape(p.GEOM_SPHERE, radius=self.radius, physicsClientId=pid)
+        last_id = p.createMultiBody(baseMass=self.mass, baseCollisionShapeIndex=collision, baseVisualShapeIndex=-1, basePosition=[0, 0, 0], useMaximalCoordinates=False, batchPositions=positions, physicsClientId=pid)
+        self.ids = list(range(last_id-len(positions)+1, last_id+1))
+        if self.rgba is not None:
+            for body in self.ids:
+                p.changeVisualShape(body, -1, rgbaColor=self.rgba, physicsClientId=pid)
+        return self.ids
+
+    def prepare(self, world_creation, count):
+        '''
+        With snapshots enabled, add the particle bodies to the world snapshot. Must be called right after create_new_world,
+        before the task adds any bodies of its own, since restoreState needs the same bodies that were present when saving.
+        '''
+        if not world_creation.snapshot or self.reusable(world_creation, count):
+            return
+        world_creation.extend_snapshot(lambda: self.create(world_creation.id, [PARK_POSITION]*count))
+        self.world_creation = world_creation
+        self.generation = world_creation.generation
+
+    def reset(self, world_creation, positions, gravity=(0, 0, -9.81)):
+        pid = world_creation.id
+        if not self.reusable(world_creation, len(positions)):
+            # Without snapshots the world is rebuilt every reset, so the particles are created with it
+            self.create(pid, positions)
+            self.world_creation = None
+        else:
+            for body, pos in zip(self.ids, positions):
+                unpark(body, pos, gravity, pid)
+        return ParticleSet(pid, self.ids, gravity=gravity)
@@ -0,0 +1,139 @@
+import multiprocessing as mp
+import numpy as np
+import pybullet as p
+
+def body_state(body, pid):
+    # Base pose and all joint positions, enough to put a copy of the body into the same configuration in another client
+    if body is None:
+        return None
+    pos, orient = p.getBasePositionAndOrientation(body, physicsClientId=pid)
+    joint_positions = [x[0] for x in p.getJointStates(body, jointIndices=list(range(p.getNumJoints(body, physicsClientId=pid))), physicsClientId=pid)]
+    return pos, orient, joint_positions
+
+def set_body_state(body, state, pid):
+    if body is None or state is None:
+        return
+    pos, orient, joint_positions = state
+    p.resetBasePositionAndOrientation(body, pos, orient, physicsClientId=pid)
+    for j, q in enumerate(joint_positions):
+        p.resetJointState(body, jointIndex=j, targetValue=q, targetVelocity=0, physicsClientId=pid)
+
+def _worker(env_class, env_kwargs, jobs, results):
+    # Background placement searches are not part of the profiled episodes of the main env
+    env = env_class(profile=False, **env_kwargs)
+    # Warm starts would make a candidate depend on the ones evaluated before it by the same worker
+    env.util.ik_cache = None
+    scene_key = None
+    state_id = None
+    try:
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            scene, search, candidates = job
+            if scene['key'] != scene_key:
+                # Rebuild the static world (human, furniture, robot) only when it differs from the previous search
+                furniture_type, static_human_base, gender = scene['key']
+                env.human, env.furniture, env.robot, _, _, _, _, env.robot_right_arm_joint_indices, env.robot_left_arm_joint_indices, env.gender = env.world_creation.create_new_world(furniture_type=furniture_type, static_human_base=static_human_base, human_impairment='none', print_joints=False, gender=gender)
+                scene_key = scene['key']
+                state_id = None
+            set_body_state(env.human, scene['human'], env.id)
+            set_body_state(env.furniture, scene['furniture'], env.id)
+            set_body_state(env.robot, scene['robot'], env.id)
+            if state_id is not None:
+                p.removeState(state_id, physicsClientId=env.id)
+            state_id = p.saveState(physicsClientId=env.id)
+            evaluations = []
+            for index, position, orientation, seed in candidates:
+                # Every candidate starts from the cloned scene with its own seed, so results do not depend on how candidates are split between workers
+                p.restoreState(stateId=state_id, physicsClientId=env.id)
+                env.np_random.seed(seed)
+                ik_calls = env.util.ik_calls
+                evaluation = env.evaluate_robot_base_pose(env.robot, position, orientation, **search)
+                evaluations.append((index,) + evaluation + (env.util.ik_calls - ik_calls,))
+            results.put(evaluations)
+    except KeyboardInterrupt:
+        pass
+    env.close()
+
+class PlacementEngine:
+    def __init__(self, env_class, env_kwargs, num_workers=2, context='spawn'):
+        ctx = mp.get_context(context)
+        self.num_workers = num_workers
+        self.jobs = [ctx.Queue() for _ in range(num_workers)]
+        self.results = ctx.Queue()
+        self.processes = [ctx.Process(target=_worker, args=(env_class, env_kwargs, jobs, self.results), daemon=True) for jobs in self.jobs]
+        for process in self.processes:
+            process.start()
+
+    def evaluate(self, scene, search, candidates):
+        '''
+        Evaluate (index, position, orientation, seed) base pose candidates in the worker processes.
+        Returns (index, num_goals_reached, manipulability, start_joint_poses, ik_calls) tuples sorted by candidate index.
+        '''
+        # Contiguous, disjoint subsets of the candidates for each worker
+        chunks = [chunk for chunk in np.array_split(np.arange(len(candidates)), self.num_workers) if len(chunk) > 0]
+        for worker, chunk in enumerate(chunks):
+            self.jobs[worker].put((scene, search, [candidates[i] for i in chunk]))
+        evaluations = []
+        for _ in chunks:
+            evaluations.extend(self.results.get())
+        return sorted(evaluations, key=lambda e: e[0])
+
+    def close(self):
+        for jobs in self.jobs:
+            jobs.put(None)
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self.processes = []
+
+class PlacementSearch:
+    def __init__(self, strategy='fixed', attempts=100, num_goals=None, full_successes=5, patience=20):
+        # fixed: evaluate all attempts. first_n: stop once full_successes poses reached every goal. adaptive: stop once the best pose has not improved for patience attempts.
+        if strategy not in ['fixed', 'first_n', 'adaptive']:
+            raise ValueError('Unknown placement search strategy: %s' % strategy)
+        self.strategy = strategy
+        self.attempts = attempts
+        self.num_goals = num_goals
+        self.full_successes = full_successes
+        self.patience = patience
+        self.iteration = 0
+        self.num_full_successes = 0
+        self.since_improvement = 0
+        self.best = None
+
+    def add(self, position, orientation, num_goals_reached, manipulability, start_joint_poses):
+        self.iteration += 1
+        self.since_improvement += 1
+        if num_goals_reached == self.num_goals:
+            self.num_full_successes += 1
+        if num_goals_reached > 0:
+            if self.best is None or num_goals_reached > self.best[2] or (num_goals_reached == self.best[2] and manipulability > self.best[3]):
+                self.best = (position, orientation, num_goals_reached, manipulability, start_joint_poses)
+                self.since_improvement = 0
+
+    def done(self):
+        # Keep searching until at least one usable base pose has been found
+        if self.best is None:
+            return False
+        if self.iteration >= self.attempts:
+            return True
+        if self.strategy == 'first_n':
+            return self.num_full_successes >= self.full_successes
+        if self.strategy == 'adaptive':
+            return self.since_improvement >= self.patience
+        return False
+
+    def remaining(self):
+        # Lower bound on the number of attempts that still have to be evaluated before the search can stop
+        if self.iteration >= self.attempts:
+            # Past the budget without a usable pose yet
+            return 1
+        if self.strategy == 'first_n':
+            return min(self.attempts - self.iteration, max(1, self.full_successes - self.num_full_successes))
+        if self.strategy == 'adaptive':
+            return min(self.attempts - self.iteration, max(1, self.patience - self.since_improvement))
+        return self.attempts - self.iteration
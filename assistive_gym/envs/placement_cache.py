@@ -0,0 +1,85 @@
+import os, atexit
+from collections import OrderedDict
+import numpy as np
+
+class PlacementCache:
+    def __init__(self, filename, tolerance=0.01, max_entries=10000, flush_every=100):
+        # Targets and human joint angles are discretized into cells of this size. Any query that lands in the same cell is a hit.
+        self.filename = filename
+        self.tolerance = tolerance
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # New entries are written to disk every flush_every puts, and on close or interpreter exit
+        self.flush_every = flush_every
+        self.unsaved = 0
+        self.load()
+        atexit.register(self.flush)
+
+    def key(self, task, robot_type, gender, joints, start_pos_orient, target_pos_orients, pos_offset, human_joint_positions):
+        features = []
+        for goals in [start_pos_orient, target_pos_orients]:
+            for arm_goals in goals:
+                for target_pos, target_orient in arm_goals:
+                    features.extend(target_pos)
+                    features.extend([0, 0, 0, 0] if target_orient is None else target_orient)
+        features.extend(pos_offset)
+        if human_joint_positions is not None:
+            features.extend(human_joint_positions)
+        cell = np.round(np.array(features, dtype=np.float64) / self.tolerance).astype(np.int64)
+        return '|'.join([task, str(robot_type), gender, ','.join([str(j) for j in joints]), ','.join([str(c) for c in cell])])
+
+    def get(self, key):
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Mark as most recently used
+        self.entries.move_to_end(key)
+        position, orientation, start_joint_poses = self.entries[key]
+        return np.array(position), tuple(orientation), [np.array(poses) for poses in start_joint_poses]
+
+    def put(self, key, solution):
+        position, orientation, start_joint_poses = solution
+        self.entries[key] = (np.array(position), np.array(orientation), [np.array(poses) for poses in start_joint_poses])
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            # Evict the least recently used placement
+            self.entries.popitem(last=False)
+        self.unsaved += 1
+        if self.unsaved >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self.unsaved > 0:
+            self.save()
+            self.unsaved = 0
+
+    def close(self):
+        self.flush()
+        atexit.unregister(self.flush)
+
+    def load(self):
+        if self.filename is None or not os.path.isfile(self.filename):
+            return
+        data = np.load(self.filename, allow_pickle=True)
+        if data['tolerance'] != self.tolerance:
+            # Entries were discretized with a different cell size and cannot be reused
+            return
+        for key, position, orientation, start_joint_poses in zip(data['keys'], data['positions'], data['orientations'], data['start_joint_poses']):
+            self.entries[str(key)] = (position, orientation, list(start_joint_poses))
+
+    def save(self):
+        if self.filename is None:
+            return
+        start_joint_poses = np.empty(len(self.entries), dtype=object)
+        for i, entry in enumerate(self.entries.values()):
+            start_joint_poses[i] = entry[2]
+        directory = os.path.dirname(os.path.abspath(self.filename))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # Write to a temporary file first so that concurrent readers never see a partially written cache
+        tmp_filename = '%s.%d.tmp.npz' % (self.filename, os.getpid())
+        np.savez(tmp_filename, tolerance=self.tolerance, keys=np.array(list(self.entries.keys())), positions=np.array([e[0] for e in self.entries.values()]).reshape(-1, 3), orientations=np.array([e[1] for e in self.entries.values()]).reshape(-1, 4), start_joint_poses=start_joint_poses)
+        os.replace(tmp_filename, self.filename)
@@ -0,0 +1,119 @@
+import sys, time, json
+import pybullet
+
+# Logical phases of a step. Phases listed as children are subtracted from their parent to get the time spent in the parent itself.
+PHASE_CHILDREN = [
+    ('step', 'reward', ['take_step', 'observation']),
+    ('take_step', 'action', ['step_simulation', 'limits', 'update_targets']),
+]
+
+class PyBulletProxy:
+    '''
+    Stand-in for the pybullet module that times every call made for a physics client with an attached profiler.
+    '''
+    def __init__(self, module):
+        self._module = module
+        self.profilers = {}
+
+    def __getattr__(self, name):
+        attr = getattr(self._module, name)
+        if not callable(attr):
+            return attr
+        profilers = self.profilers
+        def call(*args, **kwargs):
+            profiler = profilers.get(kwargs.get('physicsClientId', 0))
+            if profiler is None:
+                return attr(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                profiler.record_call(name, time.perf_counter() - start)
+        # Cache the wrapper so that later lookups skip __getattr__
+        setattr(self, name, call)
+        return call
+
+_proxy = None
+
+def install():
+    # Swap the pybullet module used by every env module for the profiling proxy
+    global _proxy
+    if _proxy is None:
+        _proxy = PyBulletProxy(pybullet)
+    for name, module in list(sys.modules.items()):
+        if name.startswith('assistive_gym.envs') and getattr(module, 'p', None) is pybullet:
+            module.p = _proxy
+    return _proxy
+
+class Profiler:
+    def __init__(self, output=None):
+        # Summaries are printed as a table, or appended as JSON lines to the output file when given
+        self.output = output
+        self.episode = 0
+        self.clear()
+
+    def clear(self):
+        self.calls = {}
+        self.phases = {}
+
+    def attach(self, pid):
+        install().profilers[pid] = self
+
+    def detach(self, pid):
+        if _proxy is not None and _proxy.profilers.get(pid) is self:
+            del _proxy.profilers[pid]
+
+    def record_call(self, name, elapsed):
+        entry = self.calls.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed
+
+    def record_phase(self, name, elapsed):
+        entry = self.phases.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed
+
+    def wrap(self, phase, function):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record_phase(phase, time.perf_counter() - start)
+        return timed
+
+    def instrument(self, env):
+        # Time the logical phases of an env by wrapping its bound methods
+        for phase, method in [('step', 'step'), ('take_step', 'take_step'), ('step_simulation', 'step_simulation'), ('limits', 'enforce_realistic_human_joint_limits'), ('limits', 'enforce_hard_human_joint_limits'), ('update_targets', 'update_targets'), ('observation', '_get_obs')]:
+            setattr(env, method, self.wrap(phase, getattr(env, method)))
+
+    def summary(self):
+        phases = {name: {'calls': count, 'time': elapsed} for name, (count, elapsed) in self.phases.items()}
+        for parent, own, children in PHASE_CHILDREN:
+            if parent in phases:
+                phases[own] = {'calls': phases[parent]['calls'], 'time': phases[parent]['time'] - sum(phases[c]['time'] for c in children if c in phases)}
+        calls = {name: {'calls': count, 'time': elapsed} for name, (count, elapsed) in self.calls.items()}
+        return {'episode': self.episode, 'phases': phases, 'pybullet': calls}
+
+    def table(self):
+        summary = self.summary()
+        lines = ['Episode %d' % summary['episode'], '%-40s %10s %12s %12s' % ('Phase', 'Calls', 'Total (ms)', 'Per call (us)')]
+        for name, entry in sorted(summary['phases'].items(), key=lambda x: -x[1]['time']):
+            lines.append('%-40s %10d %12.2f %12.2f' % (name, entry['calls'], entry['time']*1000, entry['time']*1e6/max(entry['calls'], 1)))
+        lines.append('%-40s %10s %12s %12s' % ('pybullet function', 'Calls', 'Total (ms)', 'Per call (us)'))
+        for name, entry in sorted(summary['pybullet'].items(), key=lambda x: -x[1]['time']):
+            lines.append('%-40s %10d %12.2f %12.2f' % (name, entry['calls'], entry['time']*1000, entry['time']*1e6/max(entry['calls'], 1)))
+        return '\n'.join(lines)
+
+    def dump(self):
+        if self.output is None:
+            print(self.table())
+        else:
+            with open(self.output, 'a') as f:
+                f.write(json.dumps(self.summary()) + '\n')
+
+    def end_episode(self):
+        if self.phases or self.calls:
+            self.dump()
+        self.clear()
+        self.episode += 1
@@ -0,0 +1,65 @@
+import multiprocessing as mp
+
+def _worker(env_class, env_kwargs, seeds, states):
+    # Background resets are not part of the profiled episodes of the main env
+    env = env_class(profile=False, **env_kwargs)
+    try:
+        while True:
+            request = seeds.get()
+            if request is None:
+                break
+            generation, seed = request
+            # Run a full reset and record the results of every base pose and IK search along the way
+            env.seed(seed)
+            env.util.recorded_solutions = []
+            env.reset()
+            states.put({'generation': generation, 'seed': seed, 'solutions': env.util.recorded_solutions})
+            env.util.recorded_solutions = None
+    except KeyboardInterrupt:
+        pass
+    env.close()
+
+class ResetPool:
+    def __init__(self, env_class, env_kwargs, size=8, num_workers=1, seed=0, context='spawn'):
+        ctx = mp.get_context(context)
+        self.size = size
+        self.num_workers = num_workers
+        # Bounded queue of recorded search results, one per seed. Workers block once it is full and refill it as results get popped.
+        self.states = ctx.Queue(maxsize=size)
+        self.seeds = ctx.Queue()
+        self.generation = -1
+        self.reseed(seed)
+        self.processes = [ctx.Process(target=_worker, args=(env_class, env_kwargs, self.seeds, self.states), daemon=True) for _ in range(num_workers)]
+        for process in self.processes:
+            process.start()
+
+    def reseed(self, seed):
+        # Start a new run of consecutive seeds. Results still in flight for the previous run are dropped as they arrive.
+        self.generation += 1
+        self.next_seed = seed
+        self.next_pop = seed
+        self.ready = {}
+        for _ in range(self.size + self.num_workers):
+            self.request_state()
+
+    def request_state(self):
+        self.seeds.put((self.generation, self.next_seed))
+        self.next_seed += 1
+
+    def pop(self):
+        # Workers finish in any order. Hand results out in seed order so episodes do not depend on worker timing.
+        # Blocks only when the workers have not caught up yet.
+        while self.next_pop not in self.ready:
+            state = self.states.get()
+            if state['generation'] == self.generation:
+                self.ready[state['seed']] = state
+        state = self.ready.pop(self.next_pop)
+        self.next_pop += 1
+        self.request_state()
+        return state
+
+    def close(self):
+        for process in self.processes:
+            process.terminate()
+            process.join()
+        self.processes = []
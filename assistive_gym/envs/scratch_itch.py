@@ -6,14 +6,15 @@ import pybullet as p
 from .env import AssistiveEnv
 
 class ScratchItchEnv(AssistiveEnv):
-    def __init__(self, robot_type='pr2', human_control=False):
-        super(ScratchItchEnv, self).__init__(robot_type=robot_type, task='scratch_itch', human_control=human_control, frame_skip=5, time_step=0.02, action_robot_len=7, action_human_len=(10 if human_control else 0), obs_robot_len=30, obs_human_len=(34 if human_control else 0))
+    def __init__(self, robot_type='pr2', human_control=False, **kwargs):
+        super(ScratchItchEnv, self).__init__(robot_type=robot_type, task='scratch_itch', human_control=human_control, frame_skip=5, time_step=0.02, action_robot_len=7, action_human_len=(10 if human_control else 0), obs_robot_len=30, obs_human_len=(34 if human_control else 0), **kwargs)
+        self.state_attributes += ['prev_target_contact_pos']
 
     def step(self, action):
-        self.take_step(action, robot_arm='left', gains=self.config('robot_gains'), forces=self.config('robot_forces'), human_gains=0.05)
+        self.take_step(action, robot_arm='left', gains=self.params.robot_gains, forces=self.params.robot_forces, human_gains=0.05)
 
         total_force_on_human, tool_force, tool_force_at_target, target_contact_pos = self.get_total_force()
-        end_effector_velocity = np.linalg.norm(p.getLinkState(self.tool, 1, computeForwardKinematics=True, computeLinkVelocity=True, physicsClientId=self.id)[6])
+        end_effector_velocity = np.linalg.norm(self.state_cache.link_velocity(self.tool, 1))
         if target_contact_pos is not None:
             target_contact_pos = np.array(target_contact_pos)
         obs = self._get_obs([tool_force], [total_force_on_human, tool_force_at_target])
@@ -21,7 +22,7 @@ class ScratchItchEnv(AssistiveEnv):
         # Get human preferences
         preferences_score = self.human_preferences(end_effector_velocity=end_effector_velocity, total_force_on_human=total_force_on_human, tool_force_at_target=tool_force_at_target)
 
-        tool_pos = np.array(p.getLinkState(self.tool, 1, computeForwardKinematics=True, physicsClientId=self.id)[0])
+        tool_pos = self.state_cache.link_pos(self.tool, 1)
         reward_distance = -np.linalg.norm(self.target_pos - tool_pos) # Penalize distances away from target
         reward_action = -np.sum(np.square(action)) # Penalize actions
         reward_force_scratch = 0.0 # Reward force near the target
@@ -31,12 +32,12 @@ class ScratchItchEnv(AssistiveEnv):
             self.prev_target_contact_pos = target_contact_pos
             self.task_success += 1
 
-        reward = self.config('distance_weight')*reward_distance + self.config('action_weight')*reward_action + self.config('tool_force_weight')*tool_force_at_target + self.config('scratch_reward_weight')*reward_force_scratch + preferences_score
+        reward = self.params.distance_weight*reward_distance + self.params.action_weight*reward_action + self.params.tool_force_weight*tool_force_at_target + self.params.scratch_reward_weight*reward_force_scratch + preferences_score
 
         if self.gui and tool_force_at_target > 0:
             print('Task success:', self.task_success, 'Tool force at target:', tool_force_at_target, reward_force_scratch)
 
-        info = {'total_force_on_human': total_force_on_human, 'task_success': int(self.task_success >= self.config('task_success_threshold')), 'action_robot_len': self.action_robot_len, 'action_human_len': self.action_human_len, 'obs_robot_len': self.obs_robot_len, 'obs_human_len': self.obs_human_len}
+        info = {'total_force_on_human': total_force_on_human, 'task_success': int(self.task_success >= self.params.task_success_threshold), 'action_robot_len': self.action_robot_len, 'action_human_len': self.action_human_len, 'obs_robot_len': self.obs_robot_len, 'obs_human_len': self.obs_human_len, 'reset_ik_calls': self.util.ik_calls}
         done = False
 
         return obs, reward, done, info
@@ -62,22 +63,18 @@ class ScratchItchEnv(AssistiveEnv):
         return total_force_on_human, tool_force, tool_force_at_target, target_contact_pos
 
     def _get_obs(self, forces, forces_human):
-        torso_pos = np.array(p.getLinkState(self.robot, 15 if self.robot_type == 'pr2' else 0, computeForwardKinematics=True, physicsClientId=self.id)[0])
-        state = p.getLinkState(self.tool, 1, computeForwardKinematics=True, physicsClientId=self.id)
-        tool_pos = np.array(state[0])
-        tool_orient = np.array(state[1]) # Quaternions
-        robot_joint_states = p.getJointStates(self.robot, jointIndices=self.robot_left_arm_joint_indices, physicsClientId=self.id)
-        robot_joint_positions = np.array([x[0] for x in robot_joint_states])
-        robot_pos, robot_orient = p.getBasePositionAndOrientation(self.robot, physicsClientId=self.id)
+        torso_pos = self.state_cache.link_pos(self.robot, 15 if self.robot_type == 'pr2' else 0)
+        tool_pos, tool_orient = self.state_cache.link_pos_orient(self.tool, 1) # Quaternions
+        robot_joint_positions = self.state_cache.joint_positions(self.robot, self.robot_left_arm_joint_indices)
+        robot_pos, robot_orient = self.state_cache.base_pos_orient(self.robot)
         if self.human_control:
-            human_pos = np.array(p.getBasePositionAndOrientation(self.human, physicsClientId=self.id)[0])
-            human_joint_states = p.getJointStates(self.human, jointIndices=self.human_controllable_joint_indices, physicsClientId=self.id)
-            human_joint_positions = np.array([x[0] for x in human_joint_states])
+            human_pos = self.state_cache.base_pos_orient(self.human)[0]
+            human_joint_positions = self.state_cache.joint_positions(self.human, self.human_controllable_joint_indices)
 
         # Human shoulder, elbow, and wrist joint locations
-        shoulder_pos, shoulder_orient = p.getLinkState(self.human, 5, computeForwardKinematics=True, physicsClientId=self.id)[:2]
-        elbow_pos, elbow_orient = p.getLinkState(self.human, 7, computeForwardKinematics=True, physicsClientId=self.id)[:2]
-        wrist_pos, wrist_orient = p.getLinkState(self.human, 9, computeForwardKinematics=True, physicsClientId=self.id)[:2]
+        shoulder_pos, shoulder_orient = self.state_cache.link_pos_orient(self.human, 5)
+        elbow_pos, elbow_orient = self.state_cache.link_pos_orient(self.human, 7)
+        wrist_pos, wrist_orient = self.state_cache.link_pos_orient(self.human, 9)
 
         robot_obs = np.concatenate([tool_pos-torso_pos, tool_orient, tool_pos - self.target_pos, self.target_pos-torso_pos, robot_joint_positions, shoulder_pos-torso_pos, elbow_pos-torso_pos, wrist_pos-torso_pos, forces]).ravel()
         if self.human_control:
@@ -88,6 +85,7 @@ class ScratchItchEnv(AssistiveEnv):
         return np.concatenate([robot_obs, human_obs]).ravel()
 
     def reset(self):
+        self.setup_episode()
         self.setup_timing()
         self.task_success = 0
         self.prev_target_contact_pos = np.zeros(3)
@@ -134,6 +132,7 @@ class ScratchItchEnv(AssistiveEnv):
             self.world_creation.set_gripper_open_position(self.robot, position=0.015, left=True, set_instantly=True)
             self.tool = self.world_creation.init_tool(self.robot, mesh_scale=[0.001]*3, pos_offset=[0, 0.125, 0], orient_offset=p.getQuaternionFromEuler([0, 0, np.pi/2.0], physicsClientId=self.id), maximal=False)
 
+        self.state_cache.invalidate()
         self.generate_target()
 
         p.setGravity(0, 0, 0, physicsClientId=self.id)
@@ -154,15 +153,13 @@ class ScratchItchEnv(AssistiveEnv):
         arm_pos, arm_orient = p.getLinkState(self.human, self.limb, computeForwardKinematics=True, physicsClientId=self.id)[:2]
         target_pos, target_orient = p.multiplyTransforms(arm_pos, arm_orient, self.target_on_arm, [0, 0, 0, 1], physicsClientId=self.id)
 
-        sphere_collision = -1
-        sphere_visual = p.createVisualShape(shapeType=p.GEOM_SPHERE, radius=0.01, rgbaColor=[0, 1, 1, 1], physicsClientId=self.id)
-        self.target = p.createMultiBody(baseMass=0.0, baseCollisionShapeIndex=sphere_collision, baseVisualShapeIndex=sphere_visual, basePosition=target_pos, useMaximalCoordinates=False, physicsClientId=self.id)
+        self.target = self.create_marker(target_pos, rgba=[0, 1, 1, 1])
 
         self.update_targets()
 
     def update_targets(self):
-        arm_pos, arm_orient = p.getLinkState(self.human, self.limb, computeForwardKinematics=True, physicsClientId=self.id)[:2]
+        arm_pos, arm_orient = self.state_cache.link_pos_orient(self.human, self.limb)
         target_pos, target_orient = p.multiplyTransforms(arm_pos, arm_orient, self.target_on_arm, [0, 0, 0, 1], physicsClientId=self.id)
         self.target_pos = np.array(target_pos)
-        p.resetBasePositionAndOrientation(self.target, self.target_pos, [0, 0, 0, 1], physicsClientId=self.id)
+        self.move_marker(self.target, self.target_pos)
 
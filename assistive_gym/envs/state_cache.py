@@ -0,0 +1,76 @@
+import numpy as np
+import pybullet as p
+
+class StateCache:
+    def __init__(self, pid):
+        self.id = pid
+        self.clear()
+
+    def clear(self):
+        # Links that have been asked for on each body. All of them are fetched together with a single getLinkStates call.
+        # Cleared when the world gets rebuilt and body ids change.
+        self.links = {}
+        self.invalidate()
+
+    def invalidate(self):
+        # Called whenever the simulation state changes (stepSimulation, resetJointState, ...)
+        self.link_states = {}
+        self.base_states = {}
+        self.base_velocities = {}
+        self.joint_states = {}
+
+    def _link_row(self, body, link):
+        links = self.links.setdefault(body, [])
+        if link not in links:
+            links.append(link)
+            self.link_states.pop(body, None)
+        if body not in self.link_states:
+            states = p.getLinkStates(body, links, computeLinkVelocity=True, computeForwardKinematics=True, physicsClientId=self.id)
+            self.link_states[body] = (np.array([s[0] for s in states]), np.array([s[1] for s in states]), np.array([s[6] for s in states]), np.array([s[7] for s in states]))
+        return self.link_states[body], links.index(link)
+
+    def link_pos(self, body, link):
+        states, row = self._link_row(body, link)
+        return states[0][row].copy()
+
+    def link_orient(self, body, link):
+        states, row = self._link_row(body, link)
+        return states[1][row].copy()
+
+    def link_pos_orient(self, body, link):
+        states, row = self._link_row(body, link)
+        return states[0][row].copy(), states[1][row].copy()
+
+    def link_velocity(self, body, link):
+        states, row = self._link_row(body, link)
+        return states[2][row].copy()
+
+    def link_angular_velocity(self, body, link):
+        states, row = self._link_row(body, link)
+        return states[3][row].copy()
+
+    def link_positions(self, body, links):
+        # (N, 3) array of world positions for several links of the same body
+        rows = [self._link_row(body, link)[1] for link in links]
+        return self.link_states[body][0][rows]
+
+    def base_pos_orient(self, body):
+        if body not in self.base_states:
+            pos, orient = p.getBasePositionAndOrientation(body, physicsClientId=self.id)
+            self.base_states[body] = (np.array(pos), np.array(orient))
+        pos, orient = self.base_states[body]
+        return pos.copy(), orient.copy()
+
+    def base_velocity(self, body):
+        if body not in self.base_velocities:
+            linear, angular = p.getBaseVelocity(body, physicsClientId=self.id)
+            self.base_velocities[body] = (np.array(linear), np.array(angular))
+        linear, angular = self.base_velocities[body]
+        return linear.copy(), angular.copy()
+
+    def joint_positions(self, body, joints):
+        key = (body, tuple(joints))
+        if key not in self.joint_states:
+            self.joint_states[key] = np.array([x[0] for x in p.getJointStates(body, jointIndices=joints, physicsClientId=self.id)])
+        # Callers (e.g. take_step) modify the returned array in place
+        return self.joint_states[key].copy()
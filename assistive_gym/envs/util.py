@@ -1,58 +1,158 @@
 import numpy as np
 import pybullet as p
 
+from .ik_backends import PyBulletIK
+
 class Util:
-    def __init__(self, pid, np_random):
+    def __init__(self, pid, np_random, ik_cache=None, ik_backend=None, collision_mode='step'):
         self.id = pid
         self.ik_lower_limits = {}
         self.ik_upper_limits = {}
         self.ik_joint_ranges = {}
         self.ik_rest_poses = {}
         self.np_random = np_random
+        # Base pose and IK search results recorded by reset pool workers, or replayed from them
+        self.recorded_solutions = None
+        self.replay_solutions = None
+        # Random state of the env's own stream while replayed solutions are in use
+        self.resume_state = None
+        self.ik_calls = 0
+        # Optional IKCache of converged solutions, used as warm starts for nearby targets
+        self.ik_cache = ik_cache
+        self.last_ik_solution = None
+        # Solver behind ik(): pybullet's calculateInverseKinematics by default, or e.g. a NumpyDLSIK
+        self.ik_backend = PyBulletIK(pid) if ik_backend is None else ik_backend
+        # How IK solutions are checked for collisions: by stepping the simulation ('step') or by querying contacts of the posed robot ('query')
+        self.collision_mode = collision_mode
+        self.arm_links = {}
+
+    def record_solution(self, kind, solution):
+        if self.recorded_solutions is not None:
+            self.recorded_solutions.append((kind, solution, self.np_random.get_state()))
+
+    def replay_solution(self, kind):
+        if self.replay_solutions:
+            solution_kind, solution, random_state = self.replay_solutions.pop(0)
+            if solution_kind == kind:
+                # Continue from the random state the worker had right after its search
+                self.np_random.set_state(random_state)
+                if not self.replay_solutions:
+                    self.resume_random_state()
+                return solution
+            # This episode diverged from the recorded one, so fall back to searching
+            self.replay_solutions = None
+            self.resume_random_state()
+        return None
 
-    def ik_random_restarts(self, body, target_joint, target_pos, target_orient, world_creation, robot_arm_joint_indices, robot_lower_limits, robot_upper_limits, ik_indices=range(29, 29+7), max_iterations=1000, max_ik_random_restarts=50, random_restart_threshold=0.01, half_range=False, step_sim=False, check_env_collisions=False):
+    def resume_random_state(self):
+        if self.resume_state is not None:
+            self.np_random.set_state(self.resume_state)
+            self.resume_state = None
+        self.replay_solutions = None
+
+    def ik_random_restarts(self, body, target_joint, target_pos, target_orient, world_creation, robot_arm_joint_indices, robot_lower_limits, robot_upper_limits, ik_indices=range(29, 29+7), max_iterations=1000, max_ik_random_restarts=50, random_restart_threshold=0.01, half_range=False, step_sim=False, check_env_collisions=False, collision_mode=None):
+        collision_mode = self.collision_mode if collision_mode is None else collision_mode
+        solution = self.replay_solution('ik')
+        if solution is not None:
+            world_creation.setup_robot_joints(body, robot_arm_joint_indices, robot_lower_limits, robot_upper_limits, randomize_joint_positions=False, default_positions=np.array(solution[1]), tool=None)
+            return solution
         orient_orig = target_orient
         best_ik_joints = None
         best_ik_distance = 0
         for r in range(max_ik_random_restarts):
-            target_joint_positions = self.ik(body, target_joint, target_pos, target_orient, ik_indices=ik_indices, max_iterations=max_iterations, half_range=half_range)
+            # Only the first attempt starts from a cached solution, later restarts use random rest poses
+            target_joint_positions = self.ik(body, target_joint, target_pos, target_orient, ik_indices=ik_indices, max_iterations=max_iterations, half_range=half_range, warm_start=(r == 0))
             world_creation.setup_robot_joints(body, robot_arm_joint_indices, robot_lower_limits, robot_upper_limits, randomize_joint_positions=False, default_positions=np.array(target_joint_positions), tool=None)
+            env_collision = False
+            if collision_mode == 'query' and (step_sim or check_env_collisions):
+                # Contacts of the posed configuration, without integrating dynamics
+                self_collision, env_collision = self.query_collisions(body, robot_arm_joint_indices)
+                env_collision = env_collision and check_env_collisions
             if step_sim:
-                for _ in range(5):
-                    p.stepSimulation(physicsClientId=self.id)
-                if len(p.getContactPoints(bodyA=body, bodyB=body, physicsClientId=self.id)) > 0 and orient_orig is not None:
+                if collision_mode != 'query':
+                    for _ in range(5):
+                        p.stepSimulation(physicsClientId=self.id)
+                    self_collision = len(p.getContactPoints(bodyA=body, bodyB=body, physicsClientId=self.id)) > 0
+                if self_collision and orient_orig is not None:
                     # The robot's arm is in contact with itself. Continually randomize end effector orientation until a solution is found
                     target_orient = p.getQuaternionFromEuler(p.getEulerFromQuaternion(orient_orig, physicsClientId=self.id) + np.deg2rad(self.np_random.uniform(-45, 45, size=3)), physicsClientId=self.id)
-            if check_env_collisions:
+            if check_env_collisions and collision_mode != 'query':
                 for _ in range(25):
                     p.stepSimulation(physicsClientId=self.id)
             gripper_pos, gripper_orient = p.getLinkState(body, target_joint, computeForwardKinematics=True, physicsClientId=self.id)[:2]
-            if np.linalg.norm(target_pos - np.array(gripper_pos)) < random_restart_threshold and (target_orient is None or np.linalg.norm(target_orient - np.array(gripper_orient)) < random_restart_threshold or np.isclose(np.linalg.norm(target_orient - np.array(gripper_orient)), 2, atol=random_restart_threshold)):
+            if not env_collision and np.linalg.norm(target_pos - np.array(gripper_pos)) < random_restart_threshold and (target_orient is None or np.linalg.norm(target_orient - np.array(gripper_orient)) < random_restart_threshold or np.isclose(np.linalg.norm(target_orient - np.array(gripper_orient)), 2, atol=random_restart_threshold)):
+                self.cache_ik_solution()
+                self.record_solution('ik', (True, np.array(target_joint_positions)))
                 return True, np.array(target_joint_positions)
             if best_ik_joints is None or np.linalg.norm(target_pos - np.array(gripper_pos)) < best_ik_distance:
                 best_ik_joints = target_joint_positions
                 best_ik_distance = np.linalg.norm(target_pos - np.array(gripper_pos))
         world_creation.setup_robot_joints(body, robot_arm_joint_indices, robot_lower_limits, robot_upper_limits, randomize_joint_positions=False, default_positions=np.array(best_ik_joints), tool=None)
+        self.record_solution('ik', (False, np.array(best_ik_joints)))
         return False, np.array(best_ik_joints)
 
-    def ik_jlwki(self, body, target_joint, target_pos, target_orient, world_creation, robot_arm_joint_indices, robot_lower_limits, robot_upper_limits, ik_indices=range(29, 29+7), max_iterations=100, success_threshold=0.03, half_range=False, step_sim=False, check_env_collisions=False):
+    def ik_jlwki(self, body, target_joint, target_pos, target_orient, world_creation, robot_arm_joint_indices, robot_lower_limits, robot_upper_limits, ik_indices=range(29, 29+7), max_iterations=100, success_threshold=0.03, half_range=False, step_sim=False, check_env_collisions=False, collision_mode=None):
+        collision_mode = self.collision_mode if collision_mode is None else collision_mode
         target_joint_positions = self.ik(body, target_joint, target_pos, target_orient, ik_indices=ik_indices, max_iterations=max_iterations, half_range=half_range)
         world_creation.setup_robot_joints(body, robot_arm_joint_indices, robot_lower_limits, robot_upper_limits, randomize_joint_positions=False, default_positions=np.array(target_joint_positions), tool=None)
-        if step_sim:
-            for _ in range(5):
-                p.stepSimulation(physicsClientId=self.id)
-            if len(p.getContactPoints(bodyA=body, bodyB=body, physicsClientId=self.id)) > 0:
-                # The robot's arm is in contact with itself.
+        if collision_mode == 'query' and (step_sim or check_env_collisions):
+            # Check contacts of the posed configuration without integrating dynamics, so the human and robot are not perturbed
+            self_collision, env_collision = self.query_collisions(body, robot_arm_joint_indices)
+            if (step_sim and self_collision) or (check_env_collisions and env_collision):
                 return False, np.array(target_joint_positions)
-        if check_env_collisions:
-            for _ in range(25):
-                p.stepSimulation(physicsClientId=self.id)
+        else:
+            if step_sim:
+                for _ in range(5):
+                    p.stepSimulation(physicsClientId=self.id)
+                if len(p.getContactPoints(bodyA=body, bodyB=body, physicsClientId=self.id)) > 0:
+                    # The robot's arm is in contact with itself.
+                    return False, np.array(target_joint_positions)
+            if check_env_collisions:
+                for _ in range(25):
+                    p.stepSimulation(physicsClientId=self.id)
         gripper_pos, gripper_orient = p.getLinkState(body, target_joint, computeForwardKinematics=True, physicsClientId=self.id)[:2]
         if np.linalg.norm(target_pos - np.array(gripper_pos)) < success_threshold and (target_orient is None or np.linalg.norm(target_orient - np.array(gripper_orient)) < success_threshold or np.isclose(np.linalg.norm(target_orient - np.array(gripper_orient)), 2, atol=success_threshold)):
+            self.cache_ik_solution()
             return True, np.array(target_joint_positions)
         return False, np.array(target_joint_positions)
 
-    def ik(self, body, target_joint, target_pos, target_orient, ik_indices=range(29, 29+7), max_iterations=1000, half_range=False):
+    def query_collisions(self, body, robot_arm_joint_indices, penetration=0.0):
+        '''
+        Returns (self_collision, env_collision) for the current joint positions of the robot, without stepping the simulation.
+        Environment collisions are penetrations deeper than the given depth between the arm (and anything attached to it) and other bodies.
+        '''
+        p.performCollisionDetection(physicsClientId=self.id)
+        self_collision = len(p.getContactPoints(bodyA=body, bodyB=body, physicsClientId=self.id)) > 0
+        links = self.arm_link_indices(body, robot_arm_joint_indices)
+        env_collision = any(c[2] != body and c[3] in links and c[8] < -penetration for c in p.getContactPoints(bodyA=body, physicsClientId=self.id))
+        return self_collision, env_collision
+
+    def arm_link_indices(self, body, robot_arm_joint_indices):
+        # Links moved by the arm joints, i.e. the arm joint links and all of their descendants (gripper, tool mounts)
+        key = (body, tuple(robot_arm_joint_indices))
+        if key not in self.arm_links:
+            parents = [p.getJointInfo(body, j, physicsClientId=self.id)[16] for j in range(p.getNumJoints(body, physicsClientId=self.id))]
+            links = set(robot_arm_joint_indices)
+            for j in range(len(parents)):
+                if parents[j] in links:
+                    links.add(j)
+            self.arm_links[key] = links
+        return self.arm_links[key]
+
+    def ik_cache_target(self, body, target_pos, target_orient):
+        # Targets are cached relative to the robot base, since the base gets moved around between resets
+        base_pos, base_orient = p.getBasePositionAndOrientation(body, physicsClientId=self.id)
+        inv_pos, inv_orient = p.invertTransform(base_pos, base_orient, physicsClientId=self.id)
+        local_pos, local_orient = p.multiplyTransforms(inv_pos, inv_orient, target_pos, [0, 0, 0, 1] if target_orient is None else target_orient, physicsClientId=self.id)
+        return np.array(local_pos), None if target_orient is None else np.array(local_orient)
+
+    def cache_ik_solution(self):
+        # Store the last IK solution once the caller has verified that it reaches the target
+        if self.ik_cache is not None and self.last_ik_solution is not None:
+            self.ik_cache.put(*self.last_ik_solution)
+
+    def ik(self, body, target_joint, target_pos, target_orient, ik_indices=range(29, 29+7), max_iterations=1000, half_range=False, warm_start=True):
+        self.ik_calls += 1
         key = '%d_%d' % (body, target_joint)
         if key not in self.ik_lower_limits:
             self.ik_lower_limits[key] = []
@@ -79,11 +179,21 @@ class Util:
                         self.ik_joint_ranges[key].append((upper_limit - lower_limit)/2.0)
                     # self.ik_rest_poses[key].append((upper_limit + lower_limit)/2.0)
                     j_names.append([len(j_names)] + list(joint_info[:2]))
-        self.ik_rest_poses[key] = self.np_random.uniform(self.ik_lower_limits[key], self.ik_upper_limits[key]).tolist()
-        if target_orient is not None:
-            ik_joint_poses = np.array(p.calculateInverseKinematics(body, target_joint, targetPosition=target_pos, targetOrientation=target_orient, lowerLimits=self.ik_lower_limits[key], upperLimits=self.ik_upper_limits[key], jointRanges=self.ik_joint_ranges[key], restPoses=self.ik_rest_poses[key], maxNumIterations=max_iterations, physicsClientId=self.id))
+        cached = None
+        if self.ik_cache is not None:
+            local_pos, local_orient = self.ik_cache_target(body, target_pos, target_orient)
+            if warm_start:
+                cached = self.ik_cache.get(body, target_joint, local_pos, local_orient)
+                if cached is not None and len(cached) != len(self.ik_lower_limits[key]):
+                    cached = None
+        if cached is not None:
+            # Start from the solution of the nearest cached target and keep the null space close to it
+            self.ik_rest_poses[key] = cached.tolist()
         else:
-            ik_joint_poses = np.array(p.calculateInverseKinematics(body, target_joint, targetPosition=target_pos, lowerLimits=self.ik_lower_limits[key], upperLimits=self.ik_upper_limits[key], jointRanges=self.ik_joint_ranges[key], restPoses=self.ik_rest_poses[key], maxNumIterations=max_iterations, physicsClientId=self.id))
+            self.ik_rest_poses[key] = self.np_random.uniform(self.ik_lower_limits[key], self.ik_upper_limits[key]).tolist()
+        ik_joint_poses = self.ik_backend.solve(body, target_joint, target_pos, target_orient, self.ik_lower_limits[key], self.ik_upper_limits[key], self.ik_joint_ranges[key], self.ik_rest_poses[key], max_iterations=max_iterations, current_positions=None if cached is None else cached.tolist(), np_random=self.np_random)
+        if self.ik_cache is not None:
+            self.last_ik_solution = (body, target_joint, local_pos, local_orient, ik_joint_poses)
         # print(j_names)
         # print(ik_joint_poses)
         # exit()
@@ -93,7 +203,8 @@ class Util:
     def points_in_cylinder(self, pt1, pt2, r, q):
         vec = pt2 - pt1
         const = r * np.linalg.norm(vec)
-        return np.dot(q - pt1, vec) >= 0 and np.dot(q - pt2, vec) <= 0 and np.linalg.norm(np.cross(q - pt1, vec)) <= const
+        # q can be a single point or an (N, 3) array of points
+        return (np.sum((q - pt1) * vec, axis=-1) >= 0) & (np.sum((q - pt2) * vec, axis=-1) <= 0) & (np.linalg.norm(np.cross(q - pt1, vec), axis=-1) <= const)
 
     def point_on_capsule(self, p1, p2, radius, theta_range=(0, np.pi*2)):
         '''
@@ -4,9 +4,10 @@ import pybullet as p
 from pybullet_utils import urdfEditor as ed
 
 from .human_creation import HumanCreation
+from .particles import park
 
 class WorldCreation:
-    def __init__(self, pid, robot_type='pr2', task='scratch_itch', time_step=0.02, np_random=None, config=None):
+    def __init__(self, pid, robot_type='pr2', task='scratch_itch', time_step=0.02, np_random=None, config=None, snapshot=False):
         self.id = pid
         self.robot_type = robot_type
         self.task = task
@@ -18,9 +19,53 @@ class WorldCreation:
         self.human_limit_scale = 1.0
         self.human_strength = 1.0
         self.human_tremors = np.zeros(10)
+        # When enabled, the static scene is built once per (robot, task, gender, furniture) and restored from a saved state on later resets
+        self.snapshot = snapshot
+        self.snapshot_state = None
+        # Bodies added after the snapshot that survive restores (e.g. pooled food and water particles)
+        self.persistent_bodies = set()
+        # Incremented every time the simulation is rebuilt from scratch and all body ids become invalid
+        self.generation = 0
+        # Number of worlds created so far, including ones restored from the snapshot
+        self.world_count = 0
+        self.furniture_type = None
+        self.static_human_base = False
+        self.furniture = None
+        # URDF file of every loaded robot, by body id
+        self.urdf_paths = {}
 
     def create_new_world(self, furniture_type='wheelchair', static_human_base=False, human_impairment='random', print_joints=False, gender='random'):
+        self.world_count += 1
+        # Choose gender
+        if gender not in ['male', 'female']:
+            gender = self.np_random.choice(['male', 'female'])
+        # Specify human impairments
+        if human_impairment == 'random':
+            human_impairment = self.np_random.choice(['none', 'limits', 'weakness', 'tremor'])
+        elif human_impairment == 'no_tremor':
+            human_impairment = self.np_random.choice(['none', 'limits', 'weakness'])
+        self.human_impairment = human_impairment
+        # Kept so that the scene can be rebuilt elsewhere (e.g. in placement workers)
+        self.furniture_type = furniture_type
+        self.static_human_base = static_human_base
+        self.human_limit_scale = 1.0 if human_impairment != 'limits' else self.np_random.uniform(0.5, 1.0)
+        self.human_strength = 1.0 if human_impairment != 'weakness' else self.np_random.uniform(0.25, 1.0)
+
+        snapshot_key = (self.robot_type, self.task, gender, furniture_type, static_human_base)
+        if self.snapshot and self.snapshot_state is not None and self.snapshot_state['key'] == snapshot_key:
+            return self.restore_snapshot()
+        if self.snapshot and self.snapshot_state is not None and self.snapshot_state['key'][:2] + self.snapshot_state['key'][3:] == snapshot_key[:2] + snapshot_key[3:]:
+            # Only the gender differs, so keep the rest of the scene and swap the human, whose shapes are cached per gender
+            return self.swap_snapshot_human(snapshot_key, gender, static_human_base, print_joints)
+        if self.snapshot_state is not None:
+            p.removeState(self.snapshot_state['state_id'], physicsClientId=self.id)
+            self.snapshot_state = None
+
         p.resetSimulation(physicsClientId=self.id)
+        self.generation += 1
+        self.persistent_bodies = set()
+        self.human_creation.clear_cache()
+        self.urdf_paths.clear()
 
         # Configure camera position
         p.resetDebugVisualizerCamera(cameraDistance=1.75, cameraYaw=-25, cameraPitch=-45, cameraTargetPosition=[-0.2, 0, 0.4], physicsClientId=self.id)
@@ -54,18 +99,8 @@ class WorldCreation:
         else:
             furniture = None
 
-        # Choose gender
-        if gender not in ['male', 'female']:
-            gender = self.np_random.choice(['male', 'female'])
-        # Specify human impairments
-        if human_impairment == 'random':
-            human_impairment = self.np_random.choice(['none', 'limits', 'weakness', 'tremor'])
-        elif human_impairment == 'no_tremor':
-            human_impairment = self.np_random.choice(['none', 'limits', 'weakness'])
-        self.human_impairment = human_impairment
-        self.human_limit_scale = 1.0 if human_impairment != 'limits' else self.np_random.uniform(0.5, 1.0)
-        self.human_strength = 1.0 if human_impairment != 'weakness' else self.np_random.uniform(0.25, 1.0)
-        human, human_lower_limits, human_upper_limits = self.init_human(static_human_base, self.human_limit_scale, print_joints, gender=gender)
+        # Snapshots are built with unscaled joint limits. The impairment scale is applied on top after every restore.
+        human, human_lower_limits, human_upper_limits = self.init_human(static_human_base, 1.0 if self.snapshot else self.human_limit_scale, print_joints, gender=gender)
 
         p.setTimeStep(self.time_step, physicsClientId=self.id)
         # Disable real time simulation so that the simulation only advances when we call stepSimulation
@@ -86,9 +121,100 @@ class WorldCreation:
         else:
             robot, robot_lower_limits, robot_upper_limits, robot_right_arm_joint_indices, robot_left_arm_joint_indices = None, None, None, None, None
 
+        self.furniture = furniture
+        world = [human, furniture, robot, robot_lower_limits, robot_upper_limits, human_lower_limits, human_upper_limits, robot_right_arm_joint_indices, robot_left_arm_joint_indices, gender]
+        if self.snapshot:
+            self.save_snapshot(snapshot_key, world)
+            return self.restore_snapshot()
+        return tuple(world)
+
+    def save_snapshot(self, key, world):
+        human = world[0]
+        robot = world[2]
+        self.snapshot_state = {'key': key, 'world': world, 'limit_scale': 1.0}
+        self.snapshot_state['bodies'] = set(p.getBodyUniqueId(i, physicsClientId=self.id) for i in range(p.getNumBodies(physicsClientId=self.id)))
+        # restoreState only covers positions and velocities, so keep track of the human masses that tasks later zero out
+        self.snapshot_state['human_masses'] = [p.getDynamicsInfo(human, j, physicsClientId=self.id)[0] for j in range(-1, p.getNumJoints(human, physicsClientId=self.id))]
+        self.snapshot_state['robot_motor_joints'] = [] if robot is None else [j for j in range(p.getNumJoints(robot, physicsClientId=self.id)) if p.getJointInfo(robot, j, physicsClientId=self.id)[2] != p.JOINT_FIXED]
+        self.snapshot_state['robot_motor_forces'] = [] if robot is None else [p.getJointInfo(robot, j, physicsClientId=self.id)[10] for j in self.snapshot_state['robot_motor_joints']]
+        self.snapshot_state['state_id'] = p.saveState(physicsClientId=self.id)
+
+    def revert_to_snapshot(self):
+        p.configureDebugVisualizer(p.COV_ENABLE_RENDERING, 0, physicsClientId=self.id)
+        # Remove everything that the previous episode added on top of the snapshot (tools, tables, food, targets, cloth)
+        for i in reversed(range(p.getNumConstraints(physicsClientId=self.id))):
+            p.removeConstraint(p.getConstraintUniqueId(i, physicsClientId=self.id), physicsClientId=self.id)
+        for body in [p.getBodyUniqueId(i, physicsClientId=self.id) for i in range(p.getNumBodies(physicsClientId=self.id))]:
+            if body not in self.snapshot_state['bodies'] and body not in self.persistent_bodies:
+                p.removeBody(body, physicsClientId=self.id)
+        for body in self.persistent_bodies:
+            park(body, self.id)
+        p.restoreState(stateId=self.snapshot_state['state_id'], physicsClientId=self.id)
+
+    def extend_snapshot(self, create_bodies):
+        '''
+        Add bodies that persist across episodes (e.g. pooled particles) to the snapshot. They are created parked on top of the
+        saved scene, and the snapshot is saved again so that later restores see the same set of bodies.
+        '''
+        p.restoreState(stateId=self.snapshot_state['state_id'], physicsClientId=self.id)
+        bodies = create_bodies()
+        for body in bodies:
+            park(body, self.id)
+        self.persistent_bodies.update(bodies)
+        self.snapshot_state['bodies'].update(bodies)
+        p.removeState(self.snapshot_state['state_id'], physicsClientId=self.id)
+        self.snapshot_state['state_id'] = p.saveState(physicsClientId=self.id)
+        # Re-apply the per-episode changes (joint limit impairment) that restoreState undid
+        return self.restore_snapshot()
+
+    def swap_snapshot_human(self, key, gender, static_human_base, print_joints):
+        world = list(self.snapshot_state['world'])
+        self.revert_to_snapshot()
+        p.removeBody(world[0], physicsClientId=self.id)
+        p.removeState(self.snapshot_state['state_id'], physicsClientId=self.id)
+        self.snapshot_state = None
+        world[0], world[5], world[6] = self.init_human(static_human_base, 1.0, print_joints, gender=gender)
+        world[9] = gender
+        self.save_snapshot(key, world)
+        return self.restore_snapshot()
+
+    def restore_snapshot(self):
+        human, furniture, robot, robot_lower_limits, robot_upper_limits, human_lower_limits, human_upper_limits, robot_right_arm_joint_indices, robot_left_arm_joint_indices, gender = self.snapshot_state['world']
+        self.furniture = furniture
+        self.revert_to_snapshot()
+
+        # Undo the gravity, mass and motor changes made by the previous episode
+        p.setGravity(0, 0, 0, physicsClientId=self.id)
+        for j, mass in enumerate(self.snapshot_state['human_masses']):
+            p.changeDynamics(human, j-1, mass=mass, physicsClientId=self.id)
+        if robot is not None:
+            p.setJointMotorControlArray(robot, jointIndices=self.snapshot_state['robot_motor_joints'], controlMode=p.VELOCITY_CONTROL, targetVelocities=[0]*len(self.snapshot_state['robot_motor_joints']), forces=self.snapshot_state['robot_motor_forces'], physicsClientId=self.id)
+
+        # Re-apply the randomized joint limit impairment
+        human_lower_limits = np.array(human_lower_limits)
+        human_upper_limits = np.array(human_upper_limits)
+        # Only the head, torso and arm joints (first 24) are scaled, matching HumanCreation.create_human
+        scaled = np.arange(len(human_lower_limits)) < 24
+        scaled[np.abs(human_lower_limits) >= 1e10] = False
+        human_lower_limits[scaled] *= self.human_limit_scale
+        human_upper_limits[scaled] *= self.human_limit_scale
+        if self.snapshot_state['limit_scale'] != self.human_limit_scale:
+            for j in np.where(scaled)[0]:
+                p.changeDynamics(human, j, jointLowerLimit=human_lower_limits[j], jointUpperLimit=human_upper_limits[j], physicsClientId=self.id)
+            self.snapshot_state['limit_scale'] = self.human_limit_scale
+        joint_positions = np.array([x[0] for x in p.getJointStates(human, jointIndices=list(range(len(human_lower_limits))), physicsClientId=self.id)])
+        for j in np.where(scaled & ((joint_positions < human_lower_limits) | (joint_positions > human_upper_limits)))[0]:
+            p.resetJointState(human, jointIndex=j, targetValue=np.clip(joint_positions[j], human_lower_limits[j], human_upper_limits[j]), targetVelocity=0, physicsClientId=self.id)
+
         return human, furniture, robot, robot_lower_limits, robot_upper_limits, human_lower_limits, human_upper_limits, robot_right_arm_joint_indices, robot_left_arm_joint_indices, gender
 
 
+    def load_urdf(self, filename, **kwargs):
+        # Remember which URDF a body came from, for IK solvers that work on the kinematic chain directly
+        body = p.loadURDF(filename, physicsClientId=self.id, **kwargs)
+        self.urdf_paths[body] = filename
+        return body
+
     def init_human(self, static_human_base=False, limit_scale=1.0, print_joints=False, gender='random'):
         human = self.human_creation.create_human(static=static_human_base, limit_scale=limit_scale, specular_color=[0.1, 0.1, 0.1], gender=gender, config=self.config)
         if print_joints:
@@ -162,11 +288,11 @@ class WorldCreation:
 
     def init_pr2(self, print_joints=False):
         if self.task == 'arm_manipulation':
-            robot = p.loadURDF(os.path.join(self.directory, 'PR2', 'pr2_no_torso_lift_tall_arm_manipulation.urdf'), useFixedBase=True, basePosition=[0, 0, 0], physicsClientId=self.id)
+            robot = self.load_urdf(os.path.join(self.directory, 'PR2', 'pr2_no_torso_lift_tall_arm_manipulation.urdf'), useFixedBase=True, basePosition=[0, 0, 0])
             robot_right_arm_joint_indices = [42, 43, 44, 46, 47, 49, 50]
             robot_left_arm_joint_indices = [65, 66, 67, 69, 70, 72, 73]
         else:
-            robot = p.loadURDF(os.path.join(self.directory, 'PR2', 'pr2_no_torso_lift_tall.urdf'), useFixedBase=True, basePosition=[0, 0, 0], flags=p.URDF_USE_INERTIA_FROM_FILE, physicsClientId=self.id)
+            robot = self.load_urdf(os.path.join(self.directory, 'PR2', 'pr2_no_torso_lift_tall.urdf'), useFixedBase=True, basePosition=[0, 0, 0], flags=p.URDF_USE_INERTIA_FROM_FILE)
             robot_right_arm_joint_indices = [42, 43, 44, 46, 47, 49, 50]
             robot_left_arm_joint_indices = [64, 65, 66, 68, 69, 71, 72]
         if print_joints:
@@ -201,12 +327,12 @@ class WorldCreation:
     def init_sawyer(self, print_joints=False):
         # Enable self collisions to prevent the arm from going through the torso
         if self.task == 'arm_manipulation':
-            robot = p.loadURDF(os.path.join(self.directory, 'sawyer', 'sawyer_arm_manipulation.urdf'), useFixedBase=True, basePosition=[0, 0, 0], flags=p.URDF_USE_SELF_COLLISION, physicsClientId=self.id)
+            robot = self.load_urdf(os.path.join(self.directory, 'sawyer', 'sawyer_arm_manipulation.urdf'), useFixedBase=True, basePosition=[0, 0, 0], flags=p.URDF_USE_SELF_COLLISION)
             # Disable collisions between the fingers and the tool
             for i in range(16, 24):
                 p.setCollisionFilterPair(robot, robot, i, 24, 0, physicsClientId=self.id)
         else:
-            robot = p.loadURDF(os.path.join(self.directory, 'sawyer', 'sawyer.urdf'), useFixedBase=True, basePosition=[0, 0, 0], flags=p.URDF_USE_SELF_COLLISION, physicsClientId=self.id)
+            robot = self.load_urdf(os.path.join(self.directory, 'sawyer', 'sawyer.urdf'), useFixedBase=True, basePosition=[0, 0, 0], flags=p.URDF_USE_SELF_COLLISION)
         # Remove collisions between the various arm links for stability
         for i in range(3, 24):
             for j in range(3, 24):
@@ -228,11 +354,11 @@ class WorldCreation:
 
     def init_baxter(self, print_joints=False):
         if self.task == 'arm_manipulation':
-            robot = p.loadURDF(os.path.join(self.directory, 'baxter', 'baxter_custom_arm_manipulation.urdf'), useFixedBase=True, basePosition=[0, 0, 0], physicsClientId=self.id)
+            robot = self.load_urdf(os.path.join(self.directory, 'baxter', 'baxter_custom_arm_manipulation.urdf'), useFixedBase=True, basePosition=[0, 0, 0])
             robot_right_arm_joint_indices = [12, 13, 14, 15, 16, 18, 19]
             robot_left_arm_joint_indices = [35, 36, 37, 38, 39, 41, 42]
         else:
-            robot = p.loadURDF(os.path.join(self.directory, 'baxter', 'baxter_custom.urdf'), useFixedBase=True, basePosition=[0, 0, 0], physicsClientId=self.id)
+            robot = self.load_urdf(os.path.join(self.directory, 'baxter', 'baxter_custom.urdf'), useFixedBase=True, basePosition=[0, 0, 0])
             robot_right_arm_joint_indices = [12, 13, 14, 15, 16, 18, 19]
             robot_left_arm_joint_indices = [34, 35, 36, 37, 38, 40, 41]
         if print_joints:
@@ -256,12 +382,12 @@ class WorldCreation:
     def init_jaco(self, print_joints=False):
         # Enable self collisions to prevent the arm from going through the torso
         if self.task == 'arm_manipulation':
-            robot = p.loadURDF(os.path.join(self.directory, 'jaco', 'j2s7s300_gym_arm_manipulation.urdf'), useFixedBase=True, basePosition=[0, 0, 0], flags=p.URDF_USE_SELF_COLLISION, physicsClientId=self.id)
+            robot = self.load_urdf(os.path.join(self.directory, 'jaco', 'j2s7s300_gym_arm_manipulation.urdf'), useFixedBase=True, basePosition=[0, 0, 0], flags=p.URDF_USE_SELF_COLLISION)
             # Disable collisions between the fingers and the tool
             for i in range(10, 16):
                 p.setCollisionFilterPair(robot, robot, i, 9, 0, physicsClientId=self.id)
         else:
-            robot = p.loadURDF(os.path.join(self.directory, 'jaco', 'j2s7s300_gym.urdf'), useFixedBase=True, basePosition=[0, 0, 0], flags=p.URDF_USE_SELF_COLLISION, physicsClientId=self.id)
+            robot = self.load_urdf(os.path.join(self.directory, 'jaco', 'j2s7s300_gym.urdf'), useFixedBase=True, basePosition=[0, 0, 0], flags=p.URDF_USE_SELF_COLLISION)
         robot_arm_joint_indices = [1, 2, 3, 4, 5, 6, 7]
         if print_joints:
             self.print_joint_info(robot, show_fixed=True)
@@ -287,7 +413,7 @@ class WorldCreation:
         if self.task == 'arm_manipulation':
             raise NotImplementedError
         else:
-            robot = p.loadURDF(os.path.join(self.directory, 'panda', 'panda_model.urdf'), useFixedBase=True, basePosition=[0, 0, 0], flags=p.URDF_USE_SELF_COLLISION, physicsClientId=self.id)
+            robot = self.load_urdf(os.path.join(self.directory, 'panda', 'panda_model.urdf'), useFixedBase=True, basePosition=[0, 0, 0], flags=p.URDF_USE_SELF_COLLISION)
         robot_arm_joint_indices = []
         for i in range(p.getNumJoints(robot, physicsClientId=self.id)):
             joint_info = p.getJointInfo(robot, i, physicsClientId=self.id)
@@ -311,7 +437,7 @@ class WorldCreation:
         return robot, lower_limits, upper_limits, robot_arm_joint_indices, robot_arm_joint_indices
 
     def init_kinova_gen3(self, print_joints=False):
-        robot = p.loadURDF(os.path.join(self.directory, 'kinova_gen3', 'GEN3_URDF_V12.urdf'), useFixedBase=True, basePosition=[0, 0, 0], flags=p.URDF_USE_SELF_COLLISION, physicsClientId=self.id)
+        robot = self.load_urdf(os.path.join(self.directory, 'kinova_gen3', 'GEN3_URDF_V12.urdf'), useFixedBase=True, basePosition=[0, 0, 0], flags=p.URDF_USE_SELF_COLLISION)
         robot_arm_joint_indices = [0, 1, 2, 3, 4, 5, 6]
         if print_joints:
             self.print_joint_info(robot, show_fixed=True)
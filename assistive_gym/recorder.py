@@ -0,0 +1,127 @@
+import os, json
+import numpy as np
+import gym
+
+INDEX_FILENAME = 'index.json'
+
+class TrajectoryRecorder(gym.Wrapper):
+    '''
+    Records every transition of the wrapped env into chunked, memory-mapped .npy files in a directory, with an index.json
+    that lists the chunks and episode boundaries. Only one chunk is mapped at a time, so memory use does not grow with the dataset.
+    '''
+    def __init__(self, env, directory, chunk_size=10000, info_keys=('task_success', 'total_force_on_human')):
+        super(TrajectoryRecorder, self).__init__(env)
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.info_keys = list(info_keys)
+        os.makedirs(directory, exist_ok=True)
+        self.fields = {'observations': (np.float32, tuple(env.observation_space.shape)), 'actions': (np.float32, tuple(env.action_space.shape)), 'rewards': (np.float32, ()), 'dones': (np.bool_, ())}
+        for key in self.info_keys:
+            # Missing info values are stored as nan
+            self.fields['info_' + key] = (np.float32, ())
+        self.chunks = []
+        self.episodes = []
+        self.num_steps = 0
+        self.chunk = None
+        self.chunk_length = 0
+        self.episode_start = None
+        self.last_obs = None
+
+    def open_chunk(self):
+        index = len(self.chunks)
+        files = {name: 'chunk_%05d_%s.npy' % (index, name) for name in self.fields}
+        self.chunk = {name: np.lib.format.open_memmap(os.path.join(self.directory, files[name]), mode='w+', dtype=dtype, shape=(self.chunk_size,) + shape) for name, (dtype, shape) in self.fields.items()}
+        self.chunks.append({'files': files, 'length': 0})
+        self.chunk_length = 0
+
+    def close_chunk(self):
+        if self.chunk is None:
+            return
+        for array in self.chunk.values():
+            array.flush()
+        self.chunk = None
+        self.write_index()
+
+    def write_index(self):
+        index = {'chunk_size': self.chunk_size, 'num_steps': self.num_steps, 'fields': {name: {'dtype': np.dtype(dtype).str, 'shape': list(shape)} for name, (dtype, shape) in self.fields.items()}, 'chunks': self.chunks, 'episodes': self.episodes}
+        # Write to a temporary file first so a crash never leaves a truncated index behind
+        filename = os.path.join(self.directory, INDEX_FILENAME)
+        with open(filename + '.tmp', 'w') as f:
+            json.dump(index, f)
+        os.replace(filename + '.tmp', filename)
+
+    def end_episode(self):
+        if self.episode_start is not None and self.num_steps > self.episode_start:
+            self.episodes.append([self.episode_start, self.num_steps - self.episode_start])
+        self.episode_start = None
+
+    def reset(self, **kwargs):
+        # An episode that was cut short by an early reset still gets recorded
+        self.end_episode()
+        self.last_obs = self.env.reset(**kwargs)
+        self.episode_start = self.num_steps
+        return self.last_obs
+
+    def step(self, action):
+        obs, reward, done, info = self.env.step(action)
+        if self.chunk is None or self.chunk_length >= self.chunk_size:
+            self.close_chunk()
+            self.open_chunk()
+        row = self.chunk_length
+        self.chunk['observations'][row] = self.last_obs
+        self.chunk['actions'][row] = action
+        self.chunk['rewards'][row] = reward
+        self.chunk['dones'][row] = done
+        for key in self.info_keys:
+            self.chunk['info_' + key][row] = info.get(key, np.nan)
+        self.chunk_length += 1
+        self.chunks[-1]['length'] = self.chunk_length
+        self.num_steps += 1
+        self.last_obs = obs
+        if done:
+            self.end_episode()
+        return obs, reward, done, info
+
+    def close(self):
+        self.end_episode()
+        self.close_chunk()
+        self.write_index()
+        return self.env.close()
+
+class TrajectoryDataset:
+    '''
+    Read-only view of a directory written by TrajectoryRecorder. Chunks are memory-mapped, so reading does not copy data
+    unless an episode spans two chunks.
+    '''
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, INDEX_FILENAME)) as f:
+            self.index = json.load(f)
+        self.fields = list(self.index['fields'].keys())
+        self.episodes = [tuple(e) for e in self.index['episodes']]
+        self.chunk_starts = np.cumsum([0] + [chunk['length'] for chunk in self.index['chunks']])
+        self.arrays = [{name: np.load(os.path.join(directory, chunk['files'][name]), mmap_mode='r')[:chunk['length']] for name in self.fields} for chunk in self.index['chunks']]
+
+    def __len__(self):
+        return int(self.chunk_starts[-1])
+
+    def field(self, name):
+        # Zero-copy arrays of one field, one per chunk
+        return [arrays[name] for arrays in self.arrays]
+
+    def steps(self, start, stop):
+        # Dictionary of all fields for the global step range [start, stop)
+        first = np.searchsorted(self.chunk_starts, start, side='right') - 1
+        last = np.searchsorted(self.chunk_starts, stop, side='left') - 1
+        if first == last:
+            offset = self.chunk_starts[first]
+            return {name: self.arrays[first][name][start - offset:stop - offset] for name in self.fields}
+        parts = []
+        for c in range(first, last + 1):
+            offset = self.chunk_starts[c]
+            parts.append({name: self.arrays[c][name][max(start - offset, 0):min(stop - offset, len(self.arrays[c][name]))] for name in self.fields})
+        return {name: np.concatenate([part[name] for part in parts]) for name in self.fields}
+
+    def episode(self, i):
+        start, length = self.episodes[i]
+        return self.steps(start, start + length)
@@ -0,0 +1,243 @@
+import multiprocessing as mp
+from multiprocessing.connection import wait
+import numpy as np
+import gym
+
+def _worker(index, env_id, env_kwargs, seed, pipe, parent_pipe, buffers, shapes):
+    parent_pipe.close()
+    # Importing assistive_gym registers the environment ids in spawned processes
+    import assistive_gym
+    obs_buffer, action_buffer, reward_buffer, done_buffer = [np.frombuffer(b, dtype=d).reshape(s) for b, (d, s) in zip(buffers, shapes)]
+    env = gym.make(env_id, **env_kwargs)
+    env.seed(seed)
+    try:
+        while True:
+            command, data = pipe.recv()
+            if command == 'step':
+                obs, reward, done, info = env.step(np.array(action_buffer[index]))
+                if done:
+                    # Automatically reset finished episodes so the batch always holds live observations
+                    info['terminal_observation'] = obs
+                    obs = env.reset()
+                obs_buffer[index] = obs
+                reward_buffer[index] = reward
+                done_buffer[index] = done
+                pipe.send(info)
+            elif command == 'reset':
+                obs_buffer[index] = env.reset()
+                pipe.send(None)
+            elif command == 'seed':
+                pipe.send(env.seed(data))
+            elif command == 'close':
+                env.close()
+                pipe.send(None)
+                break
+    except KeyboardInterrupt:
+        pass
+
+class SubprocVectorEnv:
+    def __init__(self, env_id, num_envs=1, seed=1001, context='spawn', **env_kwargs):
+        self.env_id = env_id
+        self.num_envs = num_envs
+        # Query the spaces from a throwaway env. Building the world only happens on reset, so this is cheap.
+        env = gym.make(env_id, **env_kwargs)
+        self.observation_space = env.observation_space
+        self.action_space = env.action_space
+        env.close()
+
+        ctx = mp.get_context(context)
+        obs_dim = int(np.prod(self.observation_space.shape))
+        action_dim = int(np.prod(self.action_space.shape))
+        # Preallocated shared memory buffers. Observations, actions, rewards and dones never get pickled.
+        self.shapes = [(np.float32, (num_envs, obs_dim)), (np.float32, (num_envs, action_dim)), (np.float64, (num_envs,)), (np.bool_, (num_envs,))]
+        self.buffers = [ctx.RawArray('b', int(np.prod(s)) * np.dtype(d).itemsize) for d, s in self.shapes]
+        self.obs_buffer, self.action_buffer, self.reward_buffer, self.done_buffer = [np.frombuffer(b, dtype=d).reshape(s) for b, (d, s) in zip(self.buffers, self.shapes)]
+
+        self.pipes = []
+        self.processes = []
+        for i in range(num_envs):
+            parent_pipe, child_pipe = ctx.Pipe()
+            # Worker i is seeded with seed + i through AssistiveEnv.seed, so worker 0 matches a single gym.make env
+            process = ctx.Process(target=_worker, args=(i, env_id, env_kwargs, seed + i, child_pipe, parent_pipe, self.buffers, self.shapes), daemon=True)
+            process.start()
+            child_pipe.close()
+            self.pipes.append(parent_pipe)
+            self.processes.append(process)
+        self.waiting = False
+        self.closed = False
+
+    def seed(self, seed=None):
+        for i, pipe in enumerate(self.pipes):
+            pipe.send(('seed', None if seed is None else seed + i))
+        return [pipe.recv() for pipe in self.pipes]
+
+    def reset(self):
+        for pipe in self.pipes:
+            pipe.send(('reset', None))
+        for pipe in self.pipes:
+            pipe.recv()
+        return np.array(self.obs_buffer)
+
+    def step_async(self, actions):
+        self.action_buffer[:] = np.reshape(actions, self.action_buffer.shape)
+        for pipe in self.pipes:
+            pipe.send(('step', None))
+        self.waiting = True
+
+    def step_wait(self):
+        infos = [pipe.recv() for pipe in self.pipes]
+        self.waiting = False
+        return np.array(self.obs_buffer), np.array(self.reward_buffer), np.array(self.done_buffer), infos
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        if self.closed:
+            return
+        if self.waiting:
+            for pipe in self.pipes:
+                pipe.recv()
+        for pipe in self.pipes:
+            pipe.send(('close', None))
+        for pipe in self.pipes:
+            pipe.recv()
+        for process in self.processes:
+            process.join()
+        self.closed = True
+
+    def __del__(self):
+        if hasattr(self, 'closed') and not self.closed:
+            self.close()
+
+class AsyncVectorEnv(SubprocVectorEnv):
+    '''
+    Subprocess vector env with an asynchronous send / recv API. Workers reset finished episodes on their own and
+    recv returns whichever envs are done first, so slow resets in one env do not stall the others.
+    '''
+    def __init__(self, env_id, num_envs=1, seed=1001, context='spawn', **env_kwargs):
+        super(AsyncVectorEnv, self).__init__(env_id, num_envs=num_envs, seed=seed, context=context, **env_kwargs)
+        # Command each env is currently running ('step' or 'reset'), None when its result has been received
+        self.pending = [None]*num_envs
+
+    def dispatch(self, command, env_ids):
+        for i in env_ids:
+            if self.pending[i] is not None:
+                raise ValueError('Env %d has not returned its last %s yet' % (i, self.pending[i]))
+            self.pipes[i].send((command, None))
+            self.pending[i] = command
+
+    def async_reset(self, env_ids=None):
+        self.dispatch('reset', range(self.num_envs) if env_ids is None else env_ids)
+
+    def send(self, actions, env_ids=None):
+        # actions holds one row per env id, in the same order
+        env_ids = np.arange(self.num_envs) if env_ids is None else np.asarray(env_ids)
+        self.action_buffer[env_ids] = np.reshape(actions, (len(env_ids),) + self.action_buffer.shape[1:])
+        self.dispatch('step', env_ids)
+
+    def recv(self, min_batch=1, timeout=None):
+        '''
+        Wait until at least min_batch of the running envs have finished and return (obs, rewards, dones, infos, env_ids)
+        for every env that is ready, with one row per env id. Envs that ran a reset report a reward of 0 and done False.
+        '''
+        running = [i for i in range(self.num_envs) if self.pending[i] is not None]
+        min_batch = min(min_batch, len(running))
+        ready = []
+        while running and (len(ready) < min_batch or not ready):
+            connections = wait([self.pipes[i] for i in running if i not in ready], timeout=timeout)
+            if not connections:
+                break
+            ready.extend(i for i in running if self.pipes[i] in connections)
+        ready = sorted(ready)
+        infos = []
+        for i in ready:
+            info = self.pipes[i].recv()
+            if self.pending[i] == 'reset':
+                info = {}
+                self.reward_buffer[i] = 0
+                self.done_buffer[i] = False
+            self.pending[i] = None
+            infos.append(info)
+        return np.array(self.obs_buffer[ready]), np.array(self.reward_buffer[ready]), np.array(self.done_buffer[ready]), infos, np.array(ready, dtype=np.int64)
+
+    def close(self):
+        if self.closed:
+            return
+        for i in range(self.num_envs):
+            if self.pending[i] is not None:
+                self.pipes[i].recv()
+                self.pending[i] = None
+        super(AsyncVectorEnv, self).close()
+
+class BatchedVectorEnv:
+    def __init__(self, env_id, num_envs=1, seed=1001, **env_kwargs):
+        # All envs live in this process, each with its own pybullet DIRECT client. Modules, the human limits oracle and assets
+        # loaded at import time are shared, so every extra env only costs its physics client and scene.
+        # env_id is either a registered environment id or an AssistiveEnv subclass.
+        self.env_id = env_id
+        self.num_envs = num_envs
+        self.envs = [gym.make(env_id, **env_kwargs) if isinstance(env_id, str) else env_id(**env_kwargs) for _ in range(num_envs)]
+        self.observation_space = self.envs[0].observation_space
+        self.action_space = self.envs[0].action_space
+        obs_dim = int(np.prod(self.observation_space.shape))
+        action_dim = int(np.prod(self.action_space.shape))
+        # Preallocated batch buffers that every env writes its row into
+        self.obs_buffer = np.zeros((num_envs, obs_dim), dtype=np.float32)
+        self.action_buffer = np.zeros((num_envs, action_dim), dtype=np.float32)
+        self.reward_buffer = np.zeros(num_envs, dtype=np.float64)
+        self.done_buffer = np.zeros(num_envs, dtype=np.bool_)
+        self.seed(seed)
+        self.closed = False
+
+    def seed(self, seed=None):
+        # Env i is seeded with seed + i, the same as worker i of a SubprocVectorEnv
+        return [env.seed(None if seed is None else seed + i) for i, env in enumerate(self.envs)]
+
+    def reset(self):
+        for i, env in enumerate(self.envs):
+            self.obs_buffer[i] = env.reset()
+        return np.array(self.obs_buffer)
+
+    def step_async(self, actions):
+        self.action_buffer[:] = np.reshape(actions, self.action_buffer.shape)
+
+    def step_wait(self):
+        infos = []
+        for i, env in enumerate(self.envs):
+            obs, reward, done, info = env.step(np.array(self.action_buffer[i]))
+            if done:
+                # Automatically reset finished episodes so the batch always holds live observations
+                info['terminal_observation'] = obs
+                obs = env.reset()
+            self.obs_buffer[i] = obs
+            self.reward_buffer[i] = reward
+            self.done_buffer[i] = done
+            infos.append(info)
+        return np.array(self.obs_buffer), np.array(self.reward_buffer), np.array(self.done_buffer), infos
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        if self.closed:
+            return
+        for env in self.envs:
+            env.close()
+        self.closed = True
+
+    def __del__(self):
+        if hasattr(self, 'closed') and not self.closed:
+            self.close()
+
+def make(env_id, num_envs=1, seed=1001, context='spawn', vector_type='subproc', **env_kwargs):
+    # subproc: one process per env. async: one process per env with send / recv. batched: all envs in this process, each with its own physics client.
+    if vector_type == 'subproc':
+        return SubprocVectorEnv(env_id, num_envs=num_envs, seed=seed, context=context, **env_kwargs)
+    if vector_type == 'async':
+        return AsyncVectorEnv(env_id, num_envs=num_envs, seed=seed, context=context, **env_kwargs)
+    if vector_type == 'batched':
+        return BatchedVectorEnv(env_id, num_envs=num_envs, seed=seed, **env_kwargs)
+    raise ValueError('Unknown vector env type: %s' % vector_type)
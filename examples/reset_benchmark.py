@@ -0,0 +1,31 @@
+import gym, sys, time, argparse
+import assistive_gym
+
+if sys.version_info < (3, 0):
+    print('Please use Python 3')
+    exit()
+
+parser = argparse.ArgumentParser(description='Assistive Gym Reset Benchmark')
+parser.add_argument('--envs', nargs='+', default=['ScratchItchPR2-v0', 'BedBathingPR2-v0', 'FeedingPR2-v0', 'DrinkingPR2-v0', 'DressingPR2-v0', 'ArmManipulationPR2-v0'],
+                    help='Environments to benchmark (default: the PR2 version of every task)')
+parser.add_argument('--resets', type=int, default=20,
+                    help='Number of timed resets per environment (default: 20)')
+args = parser.parse_args()
+
+def resets_per_second(env_id, fast_reset):
+    env = gym.make(env_id, fast_reset=fast_reset)
+    env.seed(0)
+    # The first reset always builds the scene from scratch
+    env.reset()
+    start = time.time()
+    for _ in range(args.resets):
+        env.reset()
+    elapsed = time.time() - start
+    env.close()
+    return args.resets / elapsed
+
+print('%-26s %12s %12s %8s' % ('Environment', 'Full reset', 'Fast reset', 'Speedup'))
+for env_id in args.envs:
+    full = resets_per_second(env_id, fast_reset=False)
+    fast = resets_per_second(env_id, fast_reset=True)
+    print('%-26s %10.2f/s %10.2f/s %7.2fx' % (env_id, full, fast, fast / full))
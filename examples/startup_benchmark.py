@@ -0,0 +1,20 @@
+import sys, argparse
+from assistive_gym.bench import registered_env_ids, measure_import, measure_make
+
+if sys.version_info < (3, 0):
+    print('Please use Python 3')
+    exit()
+
+parser = argparse.ArgumentParser(description='Assistive Gym Startup Benchmark')
+parser.add_argument('--envs', nargs='+', default=None,
+                    help='Environments to benchmark (default: all Assistive Gym environments)')
+args = parser.parse_args()
+
+env_ids = args.envs if args.envs is not None else registered_env_ids()
+
+# Import and gym.make times in fresh interpreters. See python -m assistive_gym.bench for resets, steps and baselines.
+r = measure_import()
+print('%-32s %8.3f s %8.1f MB' % ('import assistive_gym', r['import_time'], r['peak_rss_mb']))
+for env_id in env_ids:
+    r = measure_make(env_id)
+    print('%-32s %8.3f s %8.1f MB' % ('gym.make(%s)' % env_id, r['make_time'], r['peak_rss_mb']))
@@ -0,0 +1,35 @@
+import sys, time, argparse
+import numpy as np
+import assistive_gym.vector
+
+if sys.version_info < (3, 0):
+    print('Please use Python 3')
+    exit()
+
+parser = argparse.ArgumentParser(description='Assistive Gym Vector Env Benchmark')
+parser.add_argument('--env', default='ScratchItchPR2-v0',
+                    help='Environment to benchmark (default: ScratchItchPR2-v0)')
+parser.add_argument('--num-envs', nargs='+', type=int, default=[1, 2, 4, 8],
+                    help='Numbers of parallel envs to benchmark (default: 1 2 4 8)')
+parser.add_argument('--steps', type=int, default=200,
+                    help='Number of timed batched steps (default: 200)')
+args = parser.parse_args()
+
+def throughput(vector_type, num_envs):
+    start = time.time()
+    env = assistive_gym.vector.make(args.env, num_envs=num_envs, seed=0, vector_type=vector_type)
+    env.reset()
+    startup = time.time() - start
+    actions = np.random.RandomState(0).uniform(-1, 1, size=(args.steps, num_envs) + env.action_space.shape)
+    start = time.time()
+    for t in range(args.steps):
+        env.step(actions[t])
+    elapsed = time.time() - start
+    env.close()
+    return startup, args.steps * num_envs / elapsed
+
+print('%-10s %22s %22s %8s' % ('Envs', 'Subproc (startup, steps/s)', 'Batched (startup, steps/s)', 'Speedup'))
+for num_envs in args.num_envs:
+    subproc_startup, subproc = throughput('subproc', num_envs)
+    batched_startup, batched = throughput('batched', num_envs)
+    print('%-10d %9.2fs %10.1f/s %9.2fs %10.1f/s %7.2fx' % (num_envs, subproc_startup, subproc, batched_startup, batched, batched / subproc))
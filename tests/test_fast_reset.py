@@ -0,0 +1,22 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+p = pytest.importorskip('pybullet')
+gym = pytest.importorskip('gym')
+import assistive_gym
+
+@pytest.mark.parametrize('env_id', ['FeedingPR2-v0', 'DrinkingPR2-v0'])
+def test_repeated_fast_resets(env_id):
+    # Pooled particles are part of the snapshot, so every restore after the first must succeed and keep the body count fixed
+    env = gym.make(env_id, fast_reset=True)
+    env.seed(0)
+    bodies = []
+    for _ in range(4):
+        obs = env.reset()
+        assert np.all(np.isfinite(obs))
+        bodies.append(p.getNumBodies(physicsClientId=env.unwrapped.id))
+        for _ in range(5):
+            obs, reward, done, info = env.step(env.action_space.sample())
+            assert np.all(np.isfinite(obs))
+    env.close()
+    assert len(set(bodies[1:])) == 1
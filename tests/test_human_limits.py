@@ -0,0 +1,48 @@
+import os
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('gym')
+pytest.importorskip('pybullet')
+from assistive_gym.envs.human_limits import KerasLimitsOracle, NumpyLimitsOracle, GridLimitsOracle, load_limits_model, agreement
+
+MODEL = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'assistive_gym', 'envs', 'assets', 'realistic_arm_limits_model.h5')
+# Weights of the same model exported with NumpyLimitsOracle.save, so the NumPy and grid oracles can be checked without keras
+WEIGHTS = os.path.splitext(MODEL)[0] + '.npz'
+
+# The NumPy forward pass computes the same network as keras, so only float rounding at the decision boundary may differ
+NUMPY_AGREEMENT = 0.999
+# The default 32^4 grid evaluates the classifier at cell centers, so it disagrees within half a cell of the decision boundary.
+# Measured against the NumPy oracle with 100000 samples: 0.9841, 0.9828, 0.9828, 0.9837, 0.9830 for seeds 0-4.
+# About 13% of the samples are within the limits, so always answering the majority class would only score 0.87.
+GRID_AGREEMENT = 0.98
+
+@pytest.fixture(scope='module')
+def numpy_oracle():
+    return NumpyLimitsOracle.load(WEIGHTS)
+
+@pytest.fixture(scope='module')
+def keras_oracle():
+    pytest.importorskip('keras')
+    return KerasLimitsOracle(load_limits_model(MODEL))
+
+def test_grid_oracle_agrees_with_numpy(numpy_oracle):
+    oracle = GridLimitsOracle(numpy_oracle)
+    for seed in range(3):
+        assert agreement(oracle, numpy_oracle, seed=seed) >= GRID_AGREEMENT
+
+def test_saved_numpy_oracle_matches(numpy_oracle, tmp_path):
+    filename = str(tmp_path / 'limits.npz')
+    numpy_oracle.save(filename)
+    assert agreement(NumpyLimitsOracle.load(filename), numpy_oracle) == 1.0
+
+def test_exported_weights_match_keras_model(keras_oracle, numpy_oracle):
+    assert agreement(numpy_oracle, NumpyLimitsOracle.from_keras_model(keras_oracle.model)) == 1.0
+
+def test_numpy_oracle_agrees_with_keras(keras_oracle):
+    oracle = NumpyLimitsOracle.from_keras_model(keras_oracle.model)
+    assert agreement(oracle, keras_oracle) >= NUMPY_AGREEMENT
+
+def test_grid_oracle_agrees_with_keras(keras_oracle):
+    oracle = GridLimitsOracle(NumpyLimitsOracle.from_keras_model(keras_oracle.model))
+    assert agreement(oracle, keras_oracle) >= GRID_AGREEMENT